@@ -0,0 +1,166 @@
+"""
+EXPLAIN regression check for DatabaseService queries
+
+Seeds a scratch PostgreSQL database with the CSV exports in this repository,
+calls every read method of DatabaseService, EXPLAINs each SELECT it issued with
+sequential scans disabled, and exits 1 if any plan still needs one, i.e. no
+index can serve that query shape.
+
+    python analysis/scripts/check_query_plans.py --database-url postgresql://postgres@localhost/seo_explain
+
+The database is dropped and re-seeded, so never point this at NEON. The same
+check runs under pytest as tests/test_query_plans.py when QUERY_PLAN_DATABASE_URL
+names such a scratch database (skipped otherwise).
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from backend.models.database import Base
+from backend.models.keyword import Keyword  # noqa: F401  (registers the tables)
+from backend.services.bulk_loader import clean_keywords_frame
+from backend.services.competitor_rollups import ROLLUP_VIEWS
+from backend.services.database_service import DatabaseService
+from backend.services.pagination import DATABASE_CURSOR, encode_cursor
+from backend.services.result_cache import result_cache
+
+from migrate_competitor_data import TOKYO_WEEKENDER_SITE, extract_site_name_from_filename
+
+SEED_SOURCES = ["data/raw/*.csv", "csv/*.csv"]
+SAMPLE_COMPETITOR = "www.gotokyo.org"
+
+# Read paths of the dashboard: (method, args, kwargs)
+QUERIES = [
+    ("get_keywords_summary", (), {}),
+    ("get_performance_analysis", (), {}),
+    ("search_keywords", (100, 50, "Informational", "Japan", 100, "Sitelinks"), {}),
+    ("get_available_locations", (), {}),
+    ("get_competitors_summary", (), {}),
+    ("get_competitor_keywords", (SAMPLE_COMPETITOR,), {}),
+    ("get_competitor_opportunities", (), {}),
+    ("get_competitor_vs_tw_comparison", (SAMPLE_COMPETITOR,), {}),
+    ("get_competitor_matrix", (), {"min_volume": 100, "gaps_only": True}),
+    ("get_position_distribution", (), {}),
+    ("get_high_performance_keywords", (), {}),
+    ("get_improvement_opportunities", (), {}),
+    ("get_serp_features_analysis", (), {}),
+    ("get_keywords_with_filters", (), {"min_volume": 100, "cursor": encode_cursor(DATABASE_CURSOR, 10, 5, 1)}),
+    ("get_new_content_recommendations", (), {}),
+    ("get_content_improvement_recommendations", (), {}),
+    ("get_topic_cluster_recommendations", (), {}),
+]
+
+def seed_database(engine):
+    """Recreate the schema and load every CSV export in the repository"""
+    with engine.begin() as connection:
+        for view, _, _ in reversed(ROLLUP_VIEWS):
+            connection.execute(text(f"DROP MATERIALIZED VIEW IF EXISTS {view}"))
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    db = sessionmaker(bind=engine)()
+    try:
+        service = DatabaseService(db)
+        for pattern in SEED_SOURCES:
+            for csv_file in sorted(project_root.glob(pattern)):
+                site_name = extract_site_name_from_filename(csv_file.name)
+                competitor_site = None if site_name == TOKYO_WEEKENDER_SITE else site_name
+                frame = clean_keywords_frame(pd.read_csv(csv_file), competitor_site)
+                service.bulk_load_keywords(frame, competitor_site=competitor_site, cleaned=True)
+                print(f"🌱 Seeded {len(frame):,} rows from {csv_file.name}")
+        service.refresh_competitor_rollups()
+        service.refresh_topic_clusters()
+    finally:
+        db.close()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE"))
+
+def capture_selects(engine, method, args, kwargs) -> List[Tuple[str, object]]:
+    """Run one service method and return the SELECT statements it executed"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    db = sessionmaker(bind=engine)()
+    try:
+        getattr(DatabaseService(db), method)(*args, **kwargs)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+def sequential_scans(plan: Dict) -> List[str]:
+    """Relations read by Seq Scan nodes anywhere in a JSON plan"""
+    scans = []
+    if plan.get("Node Type") == "Seq Scan":
+        scans.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        scans.extend(sequential_scans(child))
+    return scans
+
+def explain_statements(engine, statements) -> List[Tuple[str, List[str]]]:
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SET enable_seqscan = off")
+        results = []
+        for statement, parameters in statements:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = cursor.fetchone()[0][0]["Plan"]
+            results.append((statement, sequential_scans(plan)))
+        connection.rollback()
+        return results
+    finally:
+        connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if any DatabaseService query needs a sequential scan")
+    parser.add_argument("--database-url", required=True,
+                        help="Scratch local PostgreSQL database (dropped and re-seeded)")
+    parser.add_argument("--no-seed", action="store_true",
+                        help="Reuse the data already loaded by a previous run")
+    args = parser.parse_args()
+
+    # Every method must reach the database, not a result cached by an earlier run
+    result_cache.max_entries = 0
+
+    engine = create_engine(args.database_url)
+    if not args.no_seed:
+        seed_database(engine)
+
+    failures = 0
+    for method, method_args, method_kwargs in QUERIES:
+        statements = capture_selects(engine, method, method_args, method_kwargs)
+        if not statements:
+            print(f"⚠️ {method}: no SELECT captured")
+            failures += 1
+            continue
+        plans = explain_statements(engine, statements)
+        for statement, scans in plans:
+            if scans:
+                failures += 1
+                first_line = " ".join(statement.split())[:120]
+                print(f"❌ {method}: sequential scan on {', '.join(sorted(set(scans)))}\n   {first_line}")
+        if not any(scans for _, scans in plans):
+            print(f"✅ {method}: {len(statements)} statement(s) served by indexes")
+
+    if failures:
+        print(f"\n❌ {failures} query plan(s) fell back to a sequential scan")
+        sys.exit(1)
+    print("\n🎉 Every DatabaseService query is served by an index")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,24 @@
 """
 Tokyo Weekender キーワードデータ処理スクリプト
 """
+import argparse
 import pandas as pd
 import numpy as np
 import json
+import sys
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 import logging
 
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.append(str(project_root))
+
+from backend.services.columnar_cache import read_keywords_export
+from backend.services.ingest_manifest import IngestManifest
+from backend.services.position_distribution import DEFAULT_POSITION_BUCKETS, position_distribution_frame
+from backend.services.serp_features import serp_feature_mask, serp_feature_stats_frame
+
 # ログ設定
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,15 +26,16 @@ logger = logging.getLogger(__name__)
 class KeywordDataProcessor:
     """キーワードデータの処理・分析クラス"""
     
-    def __init__(self, data_path: str):
+    def __init__(self, data_path: str, position_buckets=DEFAULT_POSITION_BUCKETS):
         self.data_path = Path(data_path)
+        self.position_buckets = position_buckets
         self.df = None
         self.processed_data = {}
         
     def load_data(self) -> pd.DataFrame:
-        """CSVデータを読み込み"""
+        """CSVデータを読み込み（型付きParquetキャッシュを優先）"""
         try:
-            self.df = pd.read_csv(self.data_path)
+            self.df = read_keywords_export(self.data_path)
             logger.info(f"データを読み込みました: {len(self.df)} 行")
             return self.df
         except Exception as e:
@@ -68,25 +80,8 @@ class KeywordDataProcessor:
         analysis['total_traffic'] = self.df['Organic traffic'].sum()
         analysis['avg_position'] = self.df['Current position'].mean()
         
-        # 順位別分析
-        position_ranges = {
-            'top_3': (1, 3),
-            'top_10': (4, 10),
-            'top_20': (11, 20),
-            'top_50': (21, 50),
-            'not_ranking': (51, 999)
-        }
-        
-        position_analysis = {}
-        for name, (min_pos, max_pos) in position_ranges.items():
-            mask = (self.df['Current position'] >= min_pos) & (self.df['Current position'] <= max_pos)
-            keywords_in_range = self.df[mask]
-            position_analysis[name] = {
-                'count': len(keywords_in_range),
-                'percentage': len(keywords_in_range) / len(self.df) * 100,
-                'total_volume': keywords_in_range['Volume'].sum(),
-                'total_traffic': keywords_in_range['Organic traffic'].sum()
-            }
+        # 順位別分析（DatabaseService.get_position_distribution(all_sites=False) と同じ集計）
+        position_analysis = position_distribution_frame(self.df, self.position_buckets)
         
         analysis['position_distribution'] = position_analysis
         
@@ -150,27 +145,17 @@ class KeywordDataProcessor:
         }
     
     def analyze_serp_features(self) -> Dict:
-        """SERP機能分析"""
+        """SERP機能分析
+
+        キーは SERP_FEATURES の全機能（18種）と、一覧にない機能を持つキーワードを数える
+        "Other" の計19個。値はそれぞれ count / percentage / avg_volume / avg_position / total_traffic。
+        """
         if self.df is None:
             raise ValueError("データが処理されていません")
         
-        # SERP機能の分析
-        serp_analysis = {}
-        
-        # SERP機能を持つキーワードの抽出
-        serp_features = ['Sitelinks', 'People also ask', 'Local pack', 'Thumbnail', 'Video preview', 'Knowledge panel', 'AI Overview', 'Shopping']
-        
-        for feature in serp_features:
-            mask = self.df['SERP features'].str.contains(feature, na=False)
-            feature_keywords = self.df[mask]
-            
-            serp_analysis[feature] = {
-                'count': len(feature_keywords),
-                'percentage': len(feature_keywords) / len(self.df) * 100,
-                'avg_volume': feature_keywords['Volume'].mean(),
-                'avg_position': feature_keywords['Current position'].mean(),
-                'total_traffic': feature_keywords['Organic traffic'].sum()
-            }
+        # SERP機能をビットマスク化し、全機能を一括集計（DatabaseService と同じ集計）
+        masks = serp_feature_mask(self.df['SERP features'])
+        serp_analysis = serp_feature_stats_frame(self.df.assign(**{'SERP features mask': masks}))
         
         return serp_analysis
     
@@ -228,16 +213,29 @@ class KeywordDataProcessor:
 
 def main():
     """メイン処理"""
+    parser = argparse.ArgumentParser(description="Tokyo Weekender キーワードデータ分析")
+    parser.add_argument("--force", action="store_true",
+                        help="入力データに変更がなくても再分析する")
+    args = parser.parse_args()
+    
     # データファイルのパス
     data_file = "data/raw/www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv"
     output_file = "data/processed/tokyo_weekender_analysis.json"
     
+    # 入力が前回の分析から変わっていなければスキップ
+    manifest = IngestManifest()
+    manifest_target = f"analysis:{output_file}"
+    if not args.force and Path(output_file).exists() and manifest.is_unchanged(data_file, manifest_target):
+        print("⏭️ 入力データに変更がないため分析をスキップしました。再分析は --force を指定してください")
+        return
+    
     # データ処理の実行
     processor = KeywordDataProcessor(data_file)
     result = processor.process_all()
     
     # 結果の保存
     processor.save_processed_data(output_file)
+    manifest.record(data_file, manifest_target, result['summary_stats']['total_keywords'])
     
     # サマリー表示
     print("\n=== Tokyo Weekender 分析結果サマリー ===")
@@ -1,16 +1,24 @@
-import pandas as pd
-import json
-from pathlib import Path
-from typing import Dict, List
-import sys
+import argparse
+import glob
 import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
 
 # Add project root to path
 project_root = Path(__file__).parent.parent.parent
 sys.path.append(str(project_root))
 
-from backend.models.database import SessionLocal, engine
+from backend.models.database import SessionLocal, database_identity, engine
 from backend.models.keyword import Keyword
+from backend.services.bulk_loader import clean_keywords_frame, summarize_keywords_frame
+from backend.services.database_service import DatabaseService
+from backend.services.ingest_manifest import IngestManifest
+from backend.services.result_cache import current_dataset_generation
 
 # Competitor site mappings
 COMPETITOR_SITES = {
@@ -20,130 +28,232 @@ COMPETITOR_SITES = {
     "www.gotokyo.org": "Go Tokyo"
 }
 
-def safe_get(data, key, default=None):
-    """Safely get value from data, handling NaN values"""
-    value = data.get(key, default)
-    if pd.isna(value) if hasattr(pd, 'isna') else (value is None or str(value).lower() == 'nan'):
-        return default
-    return value
+# Our own exports are loaded by migrate_to_neon.py, not as a competitor
+TOKYO_WEEKENDER_SITE = "www.tokyoweekender.com"
+
+# Ahrefs export names start with the domain, e.g. "www.japan.travel-en-organic-keywords-..."
+SITE_NAME_PATTERN = re.compile(r"^([a-z0-9.-]+?\.[a-z]{2,})[-_]", re.IGNORECASE)
+
+DEFAULT_DB_CONNECTIONS = int(os.getenv("INGEST_DB_CONNECTIONS", "4"))
 
 def extract_site_name_from_filename(filename: str) -> str:
     """Extract site name from CSV filename"""
-    if "tokyocheapo.com" in filename:
-        return "tokyocheapo.com"
-    elif "japan.travel" in filename:
-        return "www.japan.travel"
-    elif "timeout.jp" in filename:
-        return "www.timeout.jp"
-    elif "gotokyo.org" in filename:
-        return "www.gotokyo.org"
+    match = SITE_NAME_PATTERN.match(Path(filename).name)
+    return match.group(1).lower() if match else "unknown"
+
+def resolve_csv_files(sources: List[str]) -> List[str]:
+    """Expand directories and glob patterns into competitor CSV files"""
+    csv_files = []
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            matches = sorted(str(p) for p in path.glob("*.csv"))
+        elif glob.has_magic(source):
+            matches = sorted(glob.glob(source))
+        else:
+            matches = [source]
+
+        for csv_file in matches:
+            if extract_site_name_from_filename(csv_file) == TOKYO_WEEKENDER_SITE:
+                continue
+            if csv_file not in csv_files:
+                csv_files.append(csv_file)
+    return csv_files
+
+def parse_competitor_export(csv_file: str) -> Tuple[str, pd.DataFrame, Dict]:
+    """Read and clean one export; runs in a worker process"""
+    site_name = extract_site_name_from_filename(csv_file)
+    df = pd.read_csv(csv_file)
+
+    # Clean all columns once, then reduce the typed frame
+    frame = clean_keywords_frame(df, competitor_site=site_name)
+    stats = summarize_keywords_frame(frame)
+    return site_name, frame, stats
+
+def write_competitor_frame(site_name: str, frame: pd.DataFrame, mode: str = "replace") -> Dict:
+    """Write one cleaned competitor frame on its own database connection"""
+    db = SessionLocal()
+    try:
+        service = DatabaseService(db)
+        if mode == "delta":
+            return service.delta_load_keywords(frame, competitor_site=site_name, cleaned=True)
+        return service.bulk_load_keywords(frame, competitor_site=site_name, cleaned=True)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def print_site_result(site_name: str, stats: Dict, load: Dict, mode: str):
+    """Print the outcome of one competitor load"""
+    display_name = COMPETITOR_SITES.get(site_name, site_name)
+    print(f"🏢 {site_name} ({display_name})")
+    if mode == "delta":
+        print(f"   ✅ Applied delta: {load['inserted']} inserted, {load['updated']} updated, "
+              f"{load['deleted']} deleted, {load['unchanged']} unchanged "
+              f"({load['rows_per_second']:,.0f} rows/sec)")
     else:
-        return "unknown"
+        print(f"   ✅ Successfully migrated {load['rows']} keywords "
+              f"({load['rows_per_second']:,.0f} rows/sec, {load['method']})")
+
+    # Note: Competitor site statistics will be calculated dynamically
+    print(f"   📈 Total traffic: {stats['total_traffic']:,}")
+    print(f"   📊 Total volume: {stats['total_volume']:,}")
+    print(f"   📍 Average position: {stats['avg_position']:.1f}")
 
-def migrate_competitor_data(csv_file: str):
+def migrate_competitor_data(csv_file: str, mode: str = "replace"):
     """Migrate competitor data from CSV to database"""
     print(f"🔄 Processing {csv_file}...")
-    
+
     try:
-        # Read CSV file
-        df = pd.read_csv(csv_file)
-        print(f"   📊 Loaded {len(df)} records")
-        
-        # Extract site name from filename
-        site_name = extract_site_name_from_filename(csv_file)
-        display_name = COMPETITOR_SITES.get(site_name, site_name)
-        
-        print(f"   🏢 Site: {site_name} ({display_name})")
-        
-        # Create database session
-        db = SessionLocal()
-        
-        try:
-            # Clear existing data for this competitor
-            db.query(Keyword).filter(Keyword.competitor_site == site_name).delete()
-            
-            # Prepare data for bulk insert
-            keywords = []
-            total_traffic = 0
-            total_volume = 0
-            position_sum = 0
-            position_count = 0
-            
-            for _, row in df.iterrows():
-                # Handle NaN values and convert to appropriate types
-                keyword = Keyword(
-                    competitor_site=site_name,
-                    keyword=str(safe_get(row, 'Keyword', '')),
-                    country_code=str(safe_get(row, 'Country code', '')),
-                    location=str(safe_get(row, 'Location', '')),
-                    entities=str(safe_get(row, 'Entities', '')),
-                    serp_features=str(safe_get(row, 'SERP features', '')),
-                    volume=int(float(safe_get(row, 'Volume', 0) or 0)),
-                    keyword_difficulty=float(safe_get(row, 'KD', 0) or 0),
-                    cpc=float(safe_get(row, 'CPC', 0) or 0),
-                    organic_traffic=int(float(safe_get(row, 'Organic traffic', 0) or 0)),
-                    paid_traffic=int(float(safe_get(row, 'Paid traffic', 0) or 0)),
-                    current_position=int(float(safe_get(row, 'Current position', 999) or 999)) if safe_get(row, 'Current position') else 999,
-                    current_url=str(safe_get(row, 'Current URL', '')),
-                    current_url_inside=bool(safe_get(row, 'Current URL inside', False)),
-                    navigational=bool(safe_get(row, 'Navigational', False)),
-                    informational=bool(safe_get(row, 'Informational', False)),
-                    commercial=bool(safe_get(row, 'Commercial', False)),
-                    transactional=bool(safe_get(row, 'Transactional', False)),
-                    branded=bool(safe_get(row, 'Branded', False)),
-                    local=bool(safe_get(row, 'Local', False))
-                )
-                keywords.append(keyword)
-                
-                # Calculate site statistics
-                total_traffic += keyword.organic_traffic
-                total_volume += keyword.volume
-                if keyword.current_position < 999:
-                    position_sum += keyword.current_position
-                    position_count += 1
-            
-            # Bulk insert
-            db.add_all(keywords)
-            
-            # Note: Competitor site statistics will be calculated dynamically
-            
-            db.commit()
-            
-            print(f"   ✅ Successfully migrated {len(keywords)} keywords")
-            print(f"   📈 Total traffic: {total_traffic:,}")
-            print(f"   📊 Total volume: {total_volume:,}")
-            print(f"   📍 Average position: {position_sum / position_count if position_count > 0 else 0:.1f}")
-            
-        except Exception as e:
-            db.rollback()
-            print(f"   ❌ Database error: {e}")
-            raise
-        finally:
-            db.close()
-            
+        site_name, frame, stats = parse_competitor_export(csv_file)
+        print(f"   📊 Loaded {len(frame)} records")
+        load = write_competitor_frame(site_name, frame, mode)
+        print_site_result(site_name, stats, load, mode)
+
     except Exception as e:
         print(f"   ❌ Migration error: {e}")
         raise
 
-def main():
-    """Main processing function"""
-    csv_files = [
-        "csv/tokyocheapo.com-organic-keywords-subdomains_2025-09-26_06-53-48.csv",
-        "csv/www.japan.travel-en-organic-keywords-path-a_2025-09-26_06-54-29.csv",
-        "csv/www.timeout.jp-tokyo-organic-keywords-path_2025-09-26_06-48-49.csv",
-        "csv/www.gotokyo.org-jp-index.html-organic-keywor_2025-09-26_06-47-14.csv"
-    ]
-    
-    print("🚀 Starting competitor data migration...")
-    
-    print("✅ Database tables ready")
-    
+def manifest_target(site_name: str) -> str:
+    """Manifest target for a competitor's keyword rows"""
+    return f"keywords:{site_name}"
+
+def group_files_by_site(csv_files: List[str]) -> Dict[str, List[str]]:
+    """Exports per competitor site, in input order"""
+    groups: Dict[str, List[str]] = {}
     for csv_file in csv_files:
-        if Path(csv_file).exists():
-            migrate_competitor_data(csv_file)
+        groups.setdefault(extract_site_name_from_filename(csv_file), []).append(csv_file)
+    return groups
+
+def dataset_generation():
+    """Current dataset generation of the target database (None if unreadable)"""
+    with SessionLocal() as db:
+        return current_dataset_generation(db)
+
+def filter_unchanged_files(csv_files: List[str], manifest: IngestManifest) -> List[str]:
+    """Drop sites whose exports were all loaded with identical content
+
+    A site is reloaded as a whole, so one changed export brings its unchanged
+    siblings along (a replace load would otherwise drop their rows).
+    """
+    changed = []
+    generation = dataset_generation()
+    for site_name, site_files in group_files_by_site(csv_files).items():
+        target = manifest_target(site_name)
+        if all(manifest.is_unchanged(csv_file, target, generation) for csv_file in site_files):
+            for csv_file in site_files:
+                print(f"⏭️ Unchanged since last load, skipping: {csv_file}")
         else:
-            print(f"❌ File not found: {csv_file}")
-    
+            changed.extend(site_files)
+    return changed
+
+def combine_site_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """One frame per site; a keyword repeated across exports keeps its first row"""
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True).drop_duplicates(['keyword', 'country_code'])
+
+def migrate_competitor_files(csv_files: List[str], mode: str = "replace", workers: int = None,
+                             db_connections: int = DEFAULT_DB_CONNECTIONS,
+                             manifest: IngestManifest = None) -> List[str]:
+    """Parse and clean exports in a process pool and write them through a bounded set of connections
+
+    Each site is written once, from all of its exports combined: a load
+    replaces (or delta-syncs) the site's rows, so loading a site's files
+    separately would let the last one win.
+    """
+    failed = []
+    site_files = group_files_by_site(csv_files)
+    parsed: Dict[str, Optional[List[Tuple[str, pd.DataFrame]]]] = {site_name: [] for site_name in site_files}
+    with ProcessPoolExecutor(max_workers=workers) as parsers, \
+            ThreadPoolExecutor(max_workers=db_connections) as writers:
+        parse_futures = {parsers.submit(parse_competitor_export, csv_file): csv_file for csv_file in csv_files}
+        write_futures = {}
+
+        for future in as_completed(parse_futures):
+            csv_file = parse_futures[future]
+            site_name = extract_site_name_from_filename(csv_file)
+            if parsed[site_name] is None:
+                continue  # Another export of this site failed to parse
+            try:
+                _, frame, _ = future.result()
+                print(f"📊 Parsed {csv_file}: {len(frame)} records")
+                parsed[site_name].append((csv_file, frame))
+            except Exception as e:
+                print(f"❌ Parse error in {csv_file}: {e}")
+                failed.append(csv_file)
+                # Loading the rest would drop this export's rows; leave the site as it is
+                failed.extend(other for other in site_files[site_name] if other != csv_file)
+                parsed[site_name] = None
+                continue
+
+            if len(parsed[site_name]) == len(site_files[site_name]):
+                frame = combine_site_frames([site_frame for _, site_frame in parsed[site_name]])
+                stats = summarize_keywords_frame(frame)
+                write_future = writers.submit(write_competitor_frame, site_name, frame, mode)
+                write_futures[write_future] = (site_name, stats)
+
+        for future in as_completed(write_futures):
+            site_name, stats = write_futures[future]
+            try:
+                print_site_result(site_name, stats, future.result(), mode)
+                if manifest:
+                    generation = dataset_generation()
+                    for csv_file in site_files[site_name]:
+                        manifest.record(csv_file, manifest_target(site_name), stats['total_keywords'], generation)
+            except Exception as e:
+                print(f"❌ Database error for {site_name}: {e}")
+                failed.extend(site_files[site_name])
+
+    return sorted(set(failed), key=csv_files.index)
+
+def refresh_rollups():
+    """Refresh the materialized competitor rollups and topic clusters once all writers are done"""
+    db = SessionLocal()
+    try:
+        service = DatabaseService(db)
+        seconds = service.refresh_competitor_rollups()
+        print(f"🔄 Refreshed competitor rollups ({seconds:.1f}s)")
+        clusters = service.refresh_topic_clusters()
+        print(f"🧩 Refreshed topic clusters ({clusters} clusters)")
+    finally:
+        db.close()
+
+def main():
+    """Main processing function"""
+    parser = argparse.ArgumentParser(description="Migrate competitor keyword exports to the database")
+    parser.add_argument("sources", nargs="*", default=["csv"],
+                        help="CSV files, directories or glob patterns (default: csv/)")
+    parser.add_argument("--mode", choices=["replace", "delta"], default="replace",
+                        help="replace: reload every row / delta: write only changed rows")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parser processes (default: CPU count)")
+    parser.add_argument("--db-connections", type=int, default=DEFAULT_DB_CONNECTIONS,
+                        help="Concurrent database writers (default: INGEST_DB_CONNECTIONS or 4)")
+    parser.add_argument("--force", action="store_true",
+                        help="Reload files even if they are unchanged since the last run")
+    args = parser.parse_args()
+
+    csv_files = resolve_csv_files(args.sources)
+    missing = [csv_file for csv_file in csv_files if not Path(csv_file).exists()]
+    for csv_file in missing:
+        print(f"❌ File not found: {csv_file}")
+    csv_files = [csv_file for csv_file in csv_files if csv_file not in missing]
+
+    manifest = IngestManifest(database=database_identity())
+    if not args.force:
+        csv_files = filter_unchanged_files(csv_files, manifest)
+
+    print(f"🚀 Starting competitor data migration ({len(csv_files)} files)...")
+
+    failed = migrate_competitor_files(csv_files, args.mode, args.workers, args.db_connections, manifest)
+    if len(failed) < len(csv_files):
+        refresh_rollups()
+    if failed:
+        print(f"⚠️ {len(failed)} file(s) failed: {', '.join(failed)}")
+        sys.exit(1)
+
     print("🎉 Competitor data migration completed!")
 
 if __name__ == "__main__":
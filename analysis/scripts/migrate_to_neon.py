@@ -1,10 +1,11 @@
 """
 CSVデータをNEONデータベースに移行するスクリプト
 """
+import argparse
 import pandas as pd
 import json
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Optional
 import sys
 import os
 
@@ -12,9 +13,15 @@ import os
 project_root = Path(__file__).parent.parent.parent
 sys.path.append(str(project_root))
 
-from backend.models.database import SessionLocal, engine
+from backend.models.database import SessionLocal, database_identity, engine
 from backend.models.keyword import Keyword, Base
 from backend.services.database_service import DatabaseService
+from backend.services.ingest_manifest import IngestManifest
+from backend.services.result_cache import current_dataset_generation
+from backend.services.streaming_ingest import stream_csv_to_keywords
+
+# Manifest target for Tokyo Weekender's own keyword rows
+MANIFEST_TARGET = "keywords:tokyoweekender"
 
 def create_tables():
     """Create all tables in the database"""
@@ -25,34 +32,52 @@ def create_tables():
         print(f"❌ テーブル作成エラー: {e}")
         raise
 
-def load_csv_data(csv_path: str) -> List[Dict]:
-    """Load CSV data and convert to list of dictionaries"""
-    try:
-        df = pd.read_csv(csv_path)
-        print(f"📊 CSVデータを読み込みました: {len(df)} 行")
-        
-        # Convert to list of dictionaries
-        data = df.to_dict('records')
-        return data
-    except Exception as e:
-        print(f"❌ CSV読み込みエラー: {e}")
-        raise
+def print_chunk_progress(chunk: Dict):
+    """Print progress after each committed chunk"""
+    print(f"📦 チャンク {chunk['chunk']}: {chunk['rows']:,} 行をコミット "
+          f"(累計 {chunk['rows_done']:,} 行, {chunk['percent']:.1f}%)")
 
-def migrate_data(csv_path: str):
-    """Migrate CSV data to NEON database"""
+def migrate_data(csv_path: str, mode: str = "replace", memory_limit_mb: Optional[int] = None,
+                 chunk_rows: Optional[int] = None, resume: bool = True, force: bool = False):
+    """Migrate CSV data to NEON database chunk by chunk"""
+    manifest = IngestManifest(database=database_identity())
+    with SessionLocal() as db:
+        generation = current_dataset_generation(db)
+    if not force and manifest.is_unchanged(csv_path, MANIFEST_TARGET, generation):
+        entry = manifest.get(csv_path, MANIFEST_TARGET)
+        print(f"⏭️ 前回の取り込みから変更がないためスキップしました "
+              f"({entry['row_count']:,} 行, {entry['loaded_at']})。再取り込みは --force を指定してください")
+        return
+    
     try:
         # Create tables
         create_tables()
         
-        # Load CSV data
-        keywords_data = load_csv_data(csv_path)
-        
-        # Insert data using database service
+        # Stream CSV data into the database
         db = SessionLocal()
         try:
             service = DatabaseService(db)
-            inserted_count = service.bulk_insert_keywords(keywords_data)
-            print(f"✅ {inserted_count} 件のキーワードデータを挿入しました")
+            stats = stream_csv_to_keywords(db, csv_path, mode=mode, memory_limit_mb=memory_limit_mb,
+                                           chunk_rows=chunk_rows, resume=resume,
+                                           on_chunk=print_chunk_progress)
+            if stats['resumed']:
+                print("↩️ 前回中断したチャンクから再開しました")
+            if mode == "delta":
+                print(f"✅ 差分を反映しました: 追加 {stats['inserted']} / 更新 {stats['updated']} / "
+                      f"削除 {stats['deleted']} / 変更なし {stats['unchanged']} "
+                      f"({stats['rows_per_second']:,.0f} 行/秒)")
+            else:
+                print(f"✅ {stats['rows']} 件のキーワードデータを挿入しました "
+                      f"({stats['chunks']} チャンク, {stats['rows_per_second']:,.0f} 行/秒)")
+            manifest.record(csv_path, MANIFEST_TARGET, stats['rows'], current_dataset_generation(db))
+            
+            # 競合比較のロールアップを最新のキーワードで再計算
+            seconds = service.refresh_competitor_rollups()
+            print(f"🔄 競合ロールアップを更新しました ({seconds:.1f} 秒)")
+            
+            # トピッククラスターの割り当てと集計を再計算
+            clusters = service.refresh_topic_clusters()
+            print(f"🧩 トピッククラスターを更新しました ({clusters} クラスター)")
             
             # Get and display summary
             summary = service.get_keywords_summary()
@@ -72,6 +97,19 @@ def migrate_data(csv_path: str):
 
 def main():
     """メイン処理 - 新しいグローバルデータを使用"""
+    parser = argparse.ArgumentParser(description="CSVデータをNEONデータベースに移行")
+    parser.add_argument("--mode", choices=["replace", "delta"], default="replace",
+                        help="replace: 全件入れ替え / delta: 変更のあった行のみ反映")
+    parser.add_argument("--memory-limit-mb", type=int, default=None,
+                        help="1チャンクあたりのメモリ上限 (MB, 既定: INGEST_MEMORY_LIMIT_MB)")
+    parser.add_argument("--chunk-rows", type=int, default=None,
+                        help="固定チャンク行数 (指定しない場合はメモリ上限から自動調整)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="中断した進捗を破棄して最初から取り込む")
+    parser.add_argument("--force", action="store_true",
+                        help="前回から変更のないファイルも再取り込みする")
+    args = parser.parse_args()
+    
     csv_file = "csv/www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv"
     
     if not Path(csv_file).exists():
@@ -79,7 +117,7 @@ def main():
         return
     
     print("🚀 Tokyo Weekender グローバルデータをNEONデータベースに移行開始...")
-    migrate_data(csv_file)
+    migrate_data(csv_file, args.mode, args.memory_limit_mb, args.chunk_rows, not args.no_resume, args.force)
     print("✅ グローバルデータ移行完了!")
 
 if __name__ == "__main__":
@@ -1,28 +1,30 @@
 """
 Tokyo Weekender SEO Analysis Dashboard - FastAPI Backend with NEON Database
 """
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
-import json
-import pandas as pd
 from typing import Dict, List, Optional
 import uvicorn
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Import database components
-from backend.models.database import get_db, engine, Base
-from backend.services.database_service import DatabaseService
-
-def get_db_safe():
-    """Safe database dependency that handles connection errors"""
-    try:
-        db = next(get_db())
-        return db
-    except Exception as e:
-        print(f"Database connection failed: {e}")
-        return None
+from backend.models.database import get_async_db, get_pool_stats, engine, Base, SessionLocal, AsyncSessionLocal
+from backend.services.analysis_file import AnalysisFileCache
+from backend.services.async_database_service import AsyncDatabaseService
+from backend.services.bulk_loader import clean_keywords_frame
+from backend.services.columnar_cache import read_keywords_export
+from backend.services.competitor_rollups import create_competitor_rollups
+from backend.services.conditional_requests import ERROR_CACHE_CONTROL, cache_policy, is_not_modified, validator_headers
+from backend.services.fallback_engine import FallbackKeywordEngine
+from backend.services.job_runner import job_runner
+from backend.services.keyword_export import EXPORT_MEDIA_TYPES, open_keyword_export
+from backend.services.keyword_search import keyword_index
+from backend.services.pagination import FILE_CURSOR, decode_cursor
+from backend.services.result_cache import result_cache
 
 app = FastAPI(
     title="Tokyo Weekender SEO Dashboard API",
@@ -43,10 +45,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    """データ世代に基づくETag/Last-Modified付与と304応答（DBクエリ・シリアライズ前に判定）"""
+    cache_control = cache_policy(request.url.path) if request.method == "GET" else None
+    if cache_control is None:
+        return await call_next(request)
+
+    # The generation is re-read at most every RESULT_CACHE_GENERATION_CHECK_SECONDS
+    version = result_cache.fresh_version()
+    if version is None:
+        async with AsyncSessionLocal() as db:
+            version = await db.run_sync(result_cache.version)
+    if version is None:
+        return await call_next(request)
+
+    headers = validator_headers(version, request.url.path, request.url.query, cache_control)
+    if is_not_modified(request.headers, headers):
+        return Response(status_code=304, headers=headers)
+
+    response = await call_next(request)
+    # Only bodies read from the database belong to the generation; CSV/JSON fallbacks get no validators
+    if response.status_code == 200 and getattr(request.state, "database_response", False):
+        response.headers.update(headers)
+    elif getattr(request.state, "query_errors", False):
+        # An empty result standing in for a failed query must not be reused by clients
+        response.headers["Cache-Control"] = ERROR_CACHE_CONTROL
+    return response
+
+def database_response(request: Request, body, service: Optional[AsyncDatabaseService] = None):
+    """Mark a response as built from the database, the only kind conditional_get versions
+
+    Not when a query of the service failed and its method returned an empty fallback
+    (like cached_result, which does not store such results).
+    """
+    if service is not None and service.query_errors:
+        request.state.query_errors = True
+    else:
+        request.state.database_response = True
+    return body
+
 # データファイルのパス
 DATA_PATH = Path("data/processed")
 RAW_DATA_PATH = Path("data/raw")
 
+# Tokyo Weekender export used when the database is unavailable (first existing file wins)
+TW_KEYWORDS_EXPORT = "www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv"
+TW_KEYWORDS_EXPORT_FILES = [RAW_DATA_PATH / TW_KEYWORDS_EXPORT, Path("csv") / TW_KEYWORDS_EXPORT]
+fallback_keywords = FallbackKeywordEngine(TW_KEYWORDS_EXPORT_FILES)
+
+# Processed analysis, parsed once and reloaded when data_processor rewrites it
+analysis_file = AnalysisFileCache(DATA_PATH / "tokyo_weekender_analysis.json")
+
 @app.on_event("startup")
 async def startup_event():
     """アプリケーション起動時の処理"""
@@ -57,12 +107,20 @@ async def startup_event():
     # データベーステーブルの作成（開発環境用）
     try:
         Base.metadata.create_all(bind=engine)
+        if engine.dialect.name == "postgresql":
+            with engine.begin() as connection:
+                create_competitor_rollups(connection)
         print("✅ データベーステーブルが準備されました")
     except Exception as e:
         print(f"⚠️ データベース接続エラー: {e}")
         print("NEONデータベースの設定を確認してください")
         print("⚠️ アプリケーションはCSVフォールバックモードで動作します")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """アプリケーション終了時の処理"""
+    job_runner.shutdown()
+
 @app.get("/")
 async def root():
     """ルートエンドポイント"""
@@ -86,45 +144,49 @@ async def test_endpoint():
         "version": "1.0.0"
     }
 
+@app.get("/api/internal/pool-stats")
+async def pool_stats():
+    """データベース接続プールの統計（チェックアウト待ち時間・接続数・接続レイテンシ）"""
+    return get_pool_stats()
+
+@app.get("/api/internal/cache-stats")
+async def cache_stats():
+    """集計結果キャッシュの統計（ヒット・ミス・追い出し件数とデータ世代）"""
+    return result_cache.stats()
+
 @app.get("/api/analysis/summary")
-async def get_analysis_summary(db: Session = Depends(get_db)):
+async def get_analysis_summary(request: Request, db: AsyncSession = Depends(get_async_db)):
     """分析サマリーの取得（NEONデータベースから）"""
     try:
-        service = DatabaseService(db)
-        summary = service.get_keywords_summary()
-        return summary
+        service = AsyncDatabaseService(db)
+        summary = await service.get_keywords_summary()
+        return database_response(request, summary, service)
     
     except Exception as e:
         # Fallback to JSON file if database fails
         try:
-            analysis_file = DATA_PATH / "tokyo_weekender_analysis.json"
             if analysis_file.exists():
-                with open(analysis_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                return data.get('summary_stats', {})
+                return Response(content=analysis_file.section('summary_stats'), media_type="application/json")
         except:
             pass
         
         raise HTTPException(status_code=500, detail=f"データ取得エラー: {str(e)}")
 
 @app.get("/api/analysis/performance")
-async def get_performance_analysis(db: Session = Depends(get_db)):
+async def get_performance_analysis(request: Request, db: AsyncSession = Depends(get_async_db)):
     """パフォーマンス分析の取得（NEONデータベースから）"""
     try:
-        service = DatabaseService(db)
-        performance_data = service.get_performance_analysis()
+        service = AsyncDatabaseService(db)
+        performance_data = await service.get_performance_analysis()
         # Convert numpy types to ensure JSON serialization
         converted_data = service.convert_numpy_types(performance_data)
-        return converted_data
+        return database_response(request, converted_data, service)
     
     except Exception as e:
         # Fallback to JSON file if database fails
         try:
-            analysis_file = DATA_PATH / "tokyo_weekender_analysis.json"
             if analysis_file.exists():
-                with open(analysis_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                return data.get('performance_analysis', {})
+                return Response(content=analysis_file.section('performance_analysis'), media_type="application/json")
         except:
             pass
         
@@ -134,15 +196,10 @@ async def get_performance_analysis(db: Session = Depends(get_db)):
 async def get_content_gaps():
     """コンテンツギャップ分析の取得"""
     try:
-        analysis_file = DATA_PATH / "tokyo_weekender_analysis.json"
-        
         if not analysis_file.exists():
             raise HTTPException(status_code=404, detail="分析データが見つかりません")
         
-        with open(analysis_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        return data.get('content_gaps', {})
+        return Response(content=analysis_file.section('content_gaps'), media_type="application/json")
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"データ取得エラー: {str(e)}")
@@ -151,324 +208,316 @@ async def get_content_gaps():
 async def get_serp_analysis():
     """SERP機能分析の取得"""
     try:
-        analysis_file = DATA_PATH / "tokyo_weekender_analysis.json"
-        
         if not analysis_file.exists():
             raise HTTPException(status_code=404, detail="分析データが見つかりません")
         
-        with open(analysis_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        return data.get('serp_analysis', {})
+        return Response(content=analysis_file.section('serp_analysis'), media_type="application/json")
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"データ取得エラー: {str(e)}")
 
 @app.get("/api/keywords")
 async def get_keywords(
+    request: Request,
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
     min_volume: Optional[int] = None,
     max_position: Optional[int] = None,
-    intent: Optional[str] = None
+    intent: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """キーワードデータの取得（フィルタリング対応）"""
+    """キーワードデータの取得（フィルタリング対応）
+    
+    next_cursor を cursor に渡すと次のページを取得（offset より深いページで高速）
+    カーソルは発行元（データベース / CSV）のリストでのみ有効
+    """
+    # Try database first
     try:
-        csv_file = RAW_DATA_PATH / "www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv"
-        
-        if not csv_file.exists():
-            raise HTTPException(status_code=404, detail="キーワードデータが見つかりません")
-        
-        df = pd.read_csv(csv_file)
-        
-        # フィルタリング
-        if min_volume is not None:
-            df = df[df['Volume'] >= min_volume]
-        
-        if max_position is not None:
-            df = df[df['Current position'] <= max_position]
-        
-        if intent is not None:
-            if intent in df.columns:
-                df = df[df[intent] == True]
-        
-        # Traffic順（降順）、Position順（昇順）でソート
-        df = df.sort_values(['Organic traffic', 'Current position'], ascending=[False, True])
-        
-        # ページネーション
-        total = len(df)
-        df = df.iloc[offset:offset + limit]
-        
-        return {
-            "keywords": df.to_dict('records'),
-            "total": total,
-            "limit": limit,
-            "offset": offset
-        }
+        service = AsyncDatabaseService(db)
+        keywords = await service.get_keywords_with_filters(min_volume, max_position, intent, limit, offset, cursor)
+        return database_response(request, keywords, service)
+    except ValueError as e:
+        # Malformed cursor, or one issued by the CSV fallback
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Database keywords failed: {e}")
+    
+    try:
+        page_cursor = decode_cursor(cursor, FILE_CURSOR) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Fallback to CSV data (resident copy, reloaded only when the export changes)
+    try:
+        return await run_in_threadpool(
+            fallback_keywords.list_keywords, min_volume, max_position, intent, limit, offset, page_cursor
+        )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"データ取得エラー: {str(e)}")
 
 @app.get("/api/keywords/search")
 async def search_keywords(
+    request: Request,
     min_volume: int = 100,
     max_position: int = 50,
     intent: str = "",
     location: str = "",
-    limit: int = 100
+    limit: int = 100,
+    serp_feature: str = "",
+    db: AsyncSession = Depends(get_async_db)
 ):
     """キーワード検索（フィルター条件付き）"""
     # Try database first
-    db = get_db_safe()
-    if db:
-        try:
-            service = DatabaseService(db)
-            keywords = service.search_keywords(min_volume, max_position, intent, location, limit)
-            return keywords
-        except Exception as e:
-            print(f"Database search failed: {e}")
+    try:
+        service = AsyncDatabaseService(db)
+        keywords = await service.search_keywords(min_volume, max_position, intent, location, limit, serp_feature)
+        return database_response(request, keywords, service)
+    except Exception as e:
+        print(f"Database search failed: {e}")
     
-    # Fallback to CSV data
+    # Fallback to CSV data (resident copy, reloaded only when the export changes)
     try:
-        # Try multiple CSV files
-        csv_files = [
-            RAW_DATA_PATH / "www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv",
-            Path("csv/www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv"),
-            Path("data/raw/www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv")
-        ]
-        
-        csv_file = None
-        for file_path in csv_files:
-            if file_path.exists():
-                csv_file = file_path
-                break
-        
-        if not csv_file:
-            raise HTTPException(status_code=404, detail="キーワードデータが見つかりません")
-        
-        df = pd.read_csv(csv_file)
-        
-        # Apply filters
-        if min_volume > 0:
-            df = df[df['Volume'] >= min_volume]
-        
-        if max_position > 0:
-            df = df[df['Current position'] <= max_position]
-        
-        if intent:
-            if intent in df.columns:
-                df = df[df[intent] == True]
-        
-        if location:
-            df = df[df['Location'] == location]
-        
-        # Sort and limit
-        df = df.sort_values(['Organic traffic', 'Current position'], ascending=[False, True])
-        df = df.head(limit)
-        
-        return df.to_dict('records')
+        return await run_in_threadpool(
+            fallback_keywords.search, min_volume, max_position, intent, location, limit, serp_feature
+        )
         
     except Exception as csv_error:
         raise HTTPException(status_code=500, detail=f"キーワード検索に失敗: CSV fallback failed: {str(csv_error)}")
 
+@app.get("/api/keywords/export")
+async def export_keywords(
+    request: Request,
+    format: str = "csv",
+    min_volume: int = 100,
+    max_position: int = 50,
+    intent: str = "",
+    location: str = "",
+    serp_feature: str = "",
+    limit: int = 0
+):
+    """フィルター済みキーワードのエクスポート（CSV / NDJSON、サーバーサイドカーソルでストリーミング）"""
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"未対応の形式です: {format}（csv または ndjson）")
+    
+    try:
+        # The generator owns this session and closes it once the stream ends
+        chunks = await open_keyword_export(
+            AsyncSessionLocal(), format, min_volume, max_position, intent, location, serp_feature, limit
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"エクスポートに失敗: {str(e)}")
+    
+    return database_response(request, StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="keywords.{format}"'}
+    ))
+
+@app.get("/api/keywords/text-search")
+async def text_search_keywords(q: str, limit: int = 20, fuzzy: bool = False, site: str = ""):
+    """キーワードの部分一致・あいまい検索（日本語・英語対応の n-gram インデックス）"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="検索キーワードを指定してください")
+
+    def load_csv_keywords():
+        for file_path in TW_KEYWORDS_EXPORT_FILES:
+            if file_path.exists():
+                return clean_keywords_frame(read_keywords_export(file_path), None)
+        raise FileNotFoundError("キーワードデータが見つかりません")
+
+    try:
+        # The first build and database syncs are blocking; keep them off the event loop
+        await run_in_threadpool(keyword_index.ensure_current, SessionLocal, load_csv_keywords)
+        return {
+            "query": q,
+            "results": keyword_index.search(q, limit, fuzzy, site),
+            "index": keyword_index.stats(),
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"キーワード検索に失敗: {str(e)}")
+
 @app.get("/api/keywords/locations")
-async def get_available_locations():
+async def get_available_locations(request: Request, db: AsyncSession = Depends(get_async_db)):
     """利用可能な国・地域リストの取得"""
     # Try database first
-    db = get_db_safe()
-    if db:
-        try:
-            service = DatabaseService(db)
-            locations = service.get_available_locations()
-            return locations
-        except Exception as e:
-            print(f"Database locations failed: {e}")
+    try:
+        service = AsyncDatabaseService(db)
+        locations = await service.get_available_locations()
+        return database_response(request, locations, service)
+    except Exception as e:
+        print(f"Database locations failed: {e}")
     
-    # Fallback to CSV data
+    # Fallback to CSV data (locations are aggregated once per load of the export)
     try:
-        # Try multiple CSV files
-        csv_files = [
-            RAW_DATA_PATH / "www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv",
-            Path("csv/www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv"),
-            Path("data/raw/www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv")
-        ]
-        
-        csv_file = None
-        for file_path in csv_files:
-            if file_path.exists():
-                csv_file = file_path
-                break
-        
-        if not csv_file:
-            raise HTTPException(status_code=404, detail="キーワードデータが見つかりません")
-        
-        df = pd.read_csv(csv_file)
-        
-        # Get unique locations with counts
-        location_counts = df['Location'].value_counts().head(10)
-        locations = []
-        
-        for location, count in location_counts.items():
-            if pd.notna(location) and location != '':
-                total_traffic = df[df['Location'] == location]['Organic traffic'].sum()
-                locations.append({
-                    'location': location,
-                    'keyword_count': int(count),
-                    'total_traffic': int(total_traffic) if pd.notna(total_traffic) else 0
-                })
-        
-        return locations
+        return await run_in_threadpool(fallback_keywords.locations)
         
     except Exception as csv_error:
         raise HTTPException(status_code=500, detail=f"国・地域リストの取得に失敗: CSV fallback failed: {str(csv_error)}")
 
 @app.get("/api/competitors/summary")
-async def get_competitors_summary(db: Session = Depends(get_db)):
+async def get_competitors_summary(request: Request, db: AsyncSession = Depends(get_async_db)):
     """競合サイトの概要取得"""
     try:
-        service = DatabaseService(db)
-        summary = service.get_competitors_summary()
-        return summary
+        service = AsyncDatabaseService(db)
+        summary = await service.get_competitors_summary()
+        return database_response(request, summary, service)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"競合概要の取得に失敗: {str(e)}")
 
 @app.get("/api/competitors/{competitor_site}/keywords")
 async def get_competitor_keywords(
+    request: Request,
     competitor_site: str,
     min_volume: int = 100,
     max_position: int = 50,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """特定競合サイトのキーワード取得"""
     try:
-        service = DatabaseService(db)
-        keywords = service.get_competitor_keywords(competitor_site, min_volume, max_position, limit)
-        return keywords
+        service = AsyncDatabaseService(db)
+        keywords = await service.get_competitor_keywords(competitor_site, min_volume, max_position, limit)
+        return database_response(request, keywords, service)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"競合キーワードの取得に失敗: {str(e)}")
 
 @app.get("/api/competitors/opportunities")
 async def get_competitor_opportunities(
+    request: Request,
     min_volume: int = 100,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """競合機会キーワードの取得"""
     try:
-        service = DatabaseService(db)
-        opportunities = service.get_competitor_opportunities(min_volume, limit)
-        return opportunities
+        service = AsyncDatabaseService(db)
+        opportunities = await service.get_competitor_opportunities(min_volume, limit)
+        return database_response(request, opportunities, service)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"競合機会の取得に失敗: {str(e)}")
 
+@app.get("/api/competitors/matrix")
+async def get_competitor_matrix(
+    request: Request,
+    sites: str = "",
+    min_volume: int = 0,
+    gaps_only: bool = False,
+    limit: int = 100,
+    offset: int = 0,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """全競合サイトとTokyo Weekenderの順位マトリクス（キーワードごとに1行）"""
+    try:
+        service = AsyncDatabaseService(db)
+        site_list = [site.strip() for site in sites.split(",") if site.strip()] or None
+        matrix = await service.get_competitor_matrix(site_list, min_volume, gaps_only, limit, offset)
+        return database_response(request, matrix, service)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"競合マトリクスの取得に失敗: {str(e)}")
+
 @app.get("/api/competitors/{competitor_site}/comparison")
 async def get_competitor_comparison(
+    request: Request,
     competitor_site: str,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """競合サイトとTokyo Weekenderの詳細比較"""
     try:
-        service = DatabaseService(db)
-        comparison = service.get_competitor_vs_tw_comparison(competitor_site, limit)
-        return comparison
+        service = AsyncDatabaseService(db)
+        comparison = await service.get_competitor_vs_tw_comparison(competitor_site, limit)
+        return database_response(request, comparison, service)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"競合比較の取得に失敗: {str(e)}")
 
 @app.get("/api/keywords/top-performing")
-async def get_top_performing_keywords(limit: int = 20, db: Session = Depends(get_db)):
+async def get_top_performing_keywords(request: Request, limit: int = 20, db: AsyncSession = Depends(get_async_db)):
     """高パフォーマンスキーワードの取得（NEONデータベースから）"""
     try:
-        service = DatabaseService(db)
-        keywords = service.get_high_performance_keywords(limit)
-        return keywords
+        service = AsyncDatabaseService(db)
+        keywords = await service.get_high_performance_keywords(limit)
+        return database_response(request, keywords, service)
     
     except Exception as e:
         # Fallback to JSON file if database fails
         try:
-            analysis_file = DATA_PATH / "tokyo_weekender_analysis.json"
             if analysis_file.exists():
-                with open(analysis_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                high_performance = data.get('performance_analysis', {}).get('high_performance_keywords', [])
-                return high_performance[:limit]
+                body = analysis_file.section_list('performance_analysis', 'high_performance_keywords', limit)
+                return Response(content=body, media_type="application/json")
         except:
             pass
         
         raise HTTPException(status_code=500, detail=f"データ取得エラー: {str(e)}")
 
 @app.get("/api/keywords/improvement-opportunities")
-async def get_improvement_opportunities(limit: int = 20, db: Session = Depends(get_db)):
+async def get_improvement_opportunities(request: Request, limit: int = 20, db: AsyncSession = Depends(get_async_db)):
     """改善機会キーワードの取得（NEONデータベースから）"""
     try:
-        service = DatabaseService(db)
-        keywords = service.get_improvement_opportunities(limit)
-        return keywords
+        service = AsyncDatabaseService(db)
+        keywords = await service.get_improvement_opportunities(limit)
+        return database_response(request, keywords, service)
     
     except Exception as e:
         # Fallback to JSON file if database fails
         try:
-            analysis_file = DATA_PATH / "tokyo_weekender_analysis.json"
             if analysis_file.exists():
-                with open(analysis_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                opportunities = data.get('performance_analysis', {}).get('improvement_opportunities', [])
-                return opportunities[:limit]
+                body = analysis_file.section_list('performance_analysis', 'improvement_opportunities', limit)
+                return Response(content=body, media_type="application/json")
         except:
             pass
         
         raise HTTPException(status_code=500, detail=f"データ取得エラー: {str(e)}")
 
-@app.post("/api/analysis/refresh")
+@app.post("/api/analysis/refresh", status_code=202)
 async def refresh_analysis():
-    """分析データの再計算"""
+    """分析データの再計算（バックグラウンドジョブとして実行）"""
     try:
-        # データ処理スクリプトの実行
-        import subprocess
-        import sys
-        
         script_path = Path("analysis/scripts/data_processor.py")
-        result = subprocess.run([sys.executable, str(script_path)], 
-                              capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            raise HTTPException(status_code=500, detail=f"分析実行エラー: {result.stderr}")
-        
-        return {"message": "分析データが更新されました", "output": result.stdout}
+        job, created = job_runner.submit_script("analysis_refresh", script_path)
+        message = "分析データの更新を開始しました" if created else "分析データの更新は既に実行中です"
+        return {"message": message, "job_id": job["job_id"], "status": job["status"]}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"分析更新エラー: {str(e)}")
 
-@app.post("/api/database/migrate")
-async def migrate_csv_to_database(db: Session = Depends(get_db)):
-    """CSVデータをNEONデータベースに移行"""
+def _after_ingest():
+    """Ingest job finished in this process: pick up the new data without waiting for the check intervals"""
+    keyword_index.mark_stale()
+    result_cache.mark_stale()
+
+@app.post("/api/database/migrate", status_code=202)
+async def migrate_csv_to_database():
+    """CSVデータをNEONデータベースに移行（バックグラウンドジョブとして実行）"""
     try:
-        import subprocess
-        import sys
-        
         script_path = Path("analysis/scripts/migrate_to_neon.py")
-        result = subprocess.run([sys.executable, str(script_path)], 
-                              capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            raise HTTPException(status_code=500, detail=f"移行エラー: {result.stderr}")
-        
-        return {"message": "データベースへの移行が完了しました", "output": result.stdout}
+        job, created = job_runner.submit_script("database_migrate", script_path, on_success=_after_ingest)
+        message = "データベースへの移行を開始しました" if created else "データベースへの移行は既に実行中です"
+        return {"message": message, "job_id": job["job_id"], "status": job["status"]}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"移行エラー: {str(e)}")
 
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """バックグラウンドジョブの状態・進捗・ログの取得（どのワーカーで実行中のジョブでも可）"""
+    job = await run_in_threadpool(job_runner.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    return job
+
 @app.get("/api/database/status")
-async def database_status(db: Session = Depends(get_db)):
+async def database_status(db: AsyncSession = Depends(get_async_db)):
     """データベース接続状態の確認"""
     try:
-        service = DatabaseService(db)
-        summary = service.get_keywords_summary()
+        service = AsyncDatabaseService(db)
+        summary = await service.get_keywords_summary()
         return {
             "status": "connected",
             "message": "NEONデータベースに正常に接続されています",
@@ -482,25 +531,25 @@ async def database_status(db: Session = Depends(get_db)):
         }
 
 @app.get("/api/content/recommendations")
-async def get_content_recommendations(db: Session = Depends(get_db)):
+async def get_content_recommendations(request: Request, db: AsyncSession = Depends(get_async_db)):
     """Content recommendations based on keyword analysis"""
     try:
-        service = DatabaseService(db)
+        service = AsyncDatabaseService(db)
         
         # 新規コンテンツ提案
-        new_content = service.get_new_content_recommendations(limit=8)
+        new_content = await service.get_new_content_recommendations(limit=8)
         
         # 既存コンテンツ改善
-        improvements = service.get_content_improvement_recommendations(limit=12)
+        improvements = await service.get_content_improvement_recommendations(limit=12)
         
         # トピッククラスター
-        topic_clusters = service.get_topic_cluster_recommendations(limit=3)
+        topic_clusters = await service.get_topic_cluster_recommendations(limit=3)
         
         # サマリー統計
         total_potential_traffic = sum(item.get('potential_traffic', 0) for item in new_content)
         priority = 'High' if total_potential_traffic > 20000 else 'Medium' if total_potential_traffic > 10000 else 'Low'
         
-        return {
+        return database_response(request, {
             "summary": {
                 "new_content_proposals": len(new_content),
                 "improvement_proposals": len(improvements),
@@ -510,7 +559,7 @@ async def get_content_recommendations(db: Session = Depends(get_db)):
             "new_content": new_content,
             "improvements": improvements,
             "topic_clusters": topic_clusters
-        }
+        }, service)
         
     except Exception as e:
         # Fallback to mock data if database fails
@@ -2,10 +2,14 @@
 Database configuration and connection setup for NEON PostgreSQL
 """
 import os
-from sqlalchemy import create_engine, MetaData
+import threading
+import time
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,19 +27,206 @@ if not DATABASE_URL:
     
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-# Create engine with connection pooling for serverless
+# Connection pool settings
+#   queue:    keep warm connections in a QueuePool (default)
+#   null:     open a new connection per checkout (NullPool)
+#   external: rely on an external pooler such as NEON's pgbouncer endpoint;
+#             no app-side pool and no startup options, which the pooler rejects
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+# NEON suspends idle computes; recycle before the server drops the connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+if DB_POOL_MODE not in ("queue", "null", "external"):
+    raise ValueError(f"Unknown DB_POOL_MODE: {DB_POOL_MODE}")
+
+
+class PoolStats:
+    """Checkout wait, active connection and connect latency counters for one engine's pool"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.active = 0
+        self.connects = 0
+        self.connect_total = 0.0
+        self.connect_max = 0.0
+
+    def record_checkout_wait(self, seconds: float):
+        with self.lock:
+            self.checkouts += 1
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+
+    def record_connect(self, seconds: float):
+        with self.lock:
+            self.connects += 1
+            self.connect_total += seconds
+            self.connect_max = max(self.connect_max, seconds)
+
+    def snapshot(self, pool) -> dict:
+        with self.lock:
+            stats = {
+                "mode": DB_POOL_MODE,
+                "pool_class": type(pool).__name__,
+                "active_connections": self.active,
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": self.checkout_wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+                "checkout_wait_max_ms": self.checkout_wait_max * 1000,
+                "connects": self.connects,
+                "connect_latency_avg_ms": self.connect_total / self.connects * 1000 if self.connects else 0.0,
+                "connect_latency_max_ms": self.connect_max * 1000,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "idle_connections": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return stats
+
+
+# Scripts use the sync engine, API handlers the async engine
+pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+class _TimedCheckout:
+    """Pool mixin timing how long each checkout waits for a connection"""
+
+    stats: PoolStats
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.stats.record_checkout_wait(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    stats = pool_stats
+
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    stats = pool_stats
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+class TimedAsyncNullPool(_TimedCheckout, NullPool):
+    stats = async_pool_stats
+
+
+def _pool_args(queue_pool_class, null_pool_class) -> dict:
+    if DB_POOL_MODE == "queue":
+        return {
+            "poolclass": queue_pool_class,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        }
+    return {"poolclass": null_pool_class}
+
+
+def _instrument(sync_engine, stats: PoolStats):
+    """Feed connect latency and active connection counts into stats"""
+
+    @event.listens_for(sync_engine, "do_connect")
+    def _start_connect_timer(dialect, conn_rec, cargs, cparams):
+        conn_rec.info["connect_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "connect")
+    def _record_connect(dbapi_connection, connection_record):
+        started = connection_record.info.pop("connect_started", None)
+        if started is not None:
+            stats.record_connect(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "checkout")
+    def _record_checkout(dbapi_connection, connection_record, connection_proxy):
+        with stats.lock:
+            stats.active += 1
+
+    @event.listens_for(sync_engine, "checkin")
+    def _record_checkin(dbapi_connection, connection_record):
+        with stats.lock:
+            stats.active = max(stats.active - 1, 0)
+
+
+connect_args = {"sslmode": "require"}  # Required for NEON
+if DB_POOL_MODE != "external":
+    connect_args["options"] = "-c timezone=utc"
+
 engine = create_engine(
     DATABASE_URL,
-    poolclass=NullPool,  # Use NullPool for serverless environments like NEON
     echo=False,  # Set to True for SQL query logging
-    connect_args={
-        "sslmode": "require",  # Required for NEON
-        "options": "-c timezone=utc"
-    }
+    connect_args=connect_args,
+    **_pool_args(TimedQueuePool, TimedNullPool)
+)
+_instrument(engine, pool_stats)
+
+
+def _async_database_url(database_url: str):
+    """asyncpg URL plus its sslmode; asyncpg takes neither sslmode nor channel_binding as URL options"""
+    url = make_url(database_url)
+    if url.get_backend_name() != "postgresql":
+        return url, None
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", "require")
+    query.pop("channel_binding", None)
+    return url.set(drivername="postgresql+asyncpg", query=query), sslmode
+
+
+ASYNC_DATABASE_URL, ASYNC_SSLMODE = _async_database_url(DATABASE_URL)
+
+async_connect_args = {"ssl": ASYNC_SSLMODE} if ASYNC_SSLMODE else {}
+async_engine_args = {}
+if DB_POOL_MODE == "external":
+    # pgbouncer in transaction mode cannot keep server-side prepared statements
+    async_connect_args["statement_cache_size"] = 0
+    async_engine_args["prepared_statement_cache_size"] = 0
+else:
+    async_connect_args["server_settings"] = {"timezone": "utc"}
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    connect_args=async_connect_args,
+    **async_engine_args,
+    **_pool_args(TimedAsyncQueuePool, TimedAsyncNullPool)
 )
+_instrument(async_engine.sync_engine, async_pool_stats)
+
+
+def database_identity(url=DATABASE_URL) -> str:
+    """backend://host:port/database of a URL (string or sqlalchemy URL), without credentials
 
-# Create session factory
+    Tells apart the databases a manifest or shared cache may have been filled from.
+    """
+    parsed = make_url(url)
+    host = parsed.host or parsed.query.get('host', '')
+    return f"{parsed.get_backend_name()}://{host}:{parsed.port or ''}/{parsed.database or ''}"
+
+
+def get_pool_stats() -> dict:
+    """Current pool metrics for the internal stats endpoint"""
+    return {
+        "async": async_pool_stats.snapshot(async_engine.pool),
+        "sync": pool_stats.snapshot(engine.pool),
+    }
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Create base class for models
 Base = declarative_base()
@@ -50,3 +241,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """Dependency to get an async database session for the API handlers"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,7 +1,7 @@
 """
 Keyword data models for Tokyo Weekender SEO analysis
 """
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, Index
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, Text, Index, ForeignKey
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -16,6 +16,9 @@ class Keyword(Base):
     location = Column(String(100))
     entities = Column(Text)
     serp_features = Column(Text)
+    serp_features_mask = Column(Integer, default=0)  # Bitmask over SERP_FEATURES (+ the Other bit), set at ingest
+    keyword_key = Column(Text)  # NFKC + casefold, whitespace removed; set at ingest
+    keyword_hash = Column(BigInteger)  # 64-bit hash of keyword_key, the cross-site join key
     volume = Column(Integer, default=0)
     keyword_difficulty = Column(Float, default=0.0)
     cpc = Column(Float, default=0.0)
@@ -34,16 +37,40 @@ class Keyword(Base):
     branded = Column(Boolean, default=False)
     local = Column(Boolean, default=False)
     
+    # Content hash of the cleaned export row, used by delta ingest
+    row_hash = Column(BigInteger)
+    
     # Timestamps
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Indexes for better query performance
     __table_args__ = (
+        # One row per keyword/country per site; NULL site (Tokyo Weekender) is treated as a value
+        Index('uq_keywords_site_keyword_country', 'competitor_site', 'keyword', 'country_code',
+              unique=True, postgresql_nulls_not_distinct=True),
         Index('ix_keywords_volume_position', 'volume', 'current_position'),
         Index('ix_keywords_intent', 'informational', 'commercial', 'transactional'),
         Index('ix_keywords_position_range', 'current_position'),
         Index('ix_keywords_updated', 'updated'),
+        # Keyset pagination order of the keyword listing
+        Index('ix_keywords_traffic_position_id', organic_traffic.desc(), current_position, id),
+        # Tokyo Weekender rows joined to competitor rows on the normalized keyword hash
+        Index('ix_keywords_tw_keyword_hash', 'keyword_hash', postgresql_where=competitor_site.is_(None),
+              postgresql_include=['current_position', 'organic_traffic']),
+        # Tokyo Weekender position filters (improvement recommendations)
+        Index('ix_keywords_tw_position_volume', 'current_position', 'volume',
+              postgresql_where=competitor_site.is_(None)),
+        # Per-site listings sorted by traffic
+        Index('ix_keywords_site_traffic_volume', 'competitor_site', organic_traffic.desc(), volume.desc()),
+        # Competitor rows by volume (new content recommendations)
+        Index('ix_keywords_competitor_volume', volume.desc(), 'keyword_difficulty',
+              postgresql_where=competitor_site.isnot(None)),
+        # Narrow covering indexes for whole-table aggregates (index-only scans instead of
+        # reading the wide heap rows)
+        Index('ix_keywords_serp_aggregates', 'competitor_site', 'serp_features_mask',
+              postgresql_include=['volume', 'current_position', 'organic_traffic']),
+        Index('ix_keywords_location_traffic', 'location', postgresql_include=['organic_traffic', 'id']),
     )
     
     def __repr__(self):
@@ -132,3 +159,71 @@ class ContentRecommendation(Base):
     
     def __repr__(self):
         return f"<ContentRecommendation(id={self.id}, type='{self.recommendation_type}', keyword='{self.keyword}')>"
+
+class KeywordCluster(Base):
+    """Topic cluster of each Tokyo Weekender keyword, recomputed after every ingest"""
+    __tablename__ = "keyword_clusters"
+    
+    keyword_id = Column(Integer, ForeignKey('keywords.id', ondelete='CASCADE'), primary_key=True)
+    cluster_name = Column(String(100), nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<KeywordCluster(keyword_id={self.keyword_id}, cluster='{self.cluster_name}')>"
+
+class TopicClusterStat(Base):
+    """Per-cluster aggregates behind the topic cluster recommendations"""
+    __tablename__ = "topic_cluster_stats"
+    
+    cluster_name = Column(String(100), primary_key=True)
+    primary_keyword = Column(String(255))
+    supporting_keywords = Column(Text)  # JSON list
+    keyword_count = Column(Integer, default=0)
+    total_volume = Column(BigInteger, default=0)
+    avg_position = Column(Float)
+    total_traffic = Column(BigInteger, default=0)
+    refreshed_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (
+        Index('ix_topic_cluster_stats_volume', total_volume.desc()),
+    )
+    
+    def __repr__(self):
+        return f"<TopicClusterStat(cluster='{self.cluster_name}', keywords={self.keyword_count})>"
+
+class DatasetGeneration(Base):
+    """Single-row counter bumped by every ingest; keys the API result cache"""
+    __tablename__ = "dataset_generation"
+    
+    id = Column(Integer, primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=0)
+    bumped_at = Column(DateTime, default=func.now())
+    
+    def __repr__(self):
+        return f"<DatasetGeneration(generation={self.generation})>"
+
+class BackgroundJob(Base):
+    """Background script run, shared by every API worker process"""
+    __tablename__ = "background_jobs"
+    
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False)  # 'queued', 'running', 'succeeded', 'failed'
+    progress = Column(Float)
+    returncode = Column(Integer)
+    error = Column(Text)
+    logs = Column(Text)  # Last lines of output, newline-separated
+    created_at = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # Refreshed while active; a stale one means its worker died
+    
+    __table_args__ = (
+        # At most one queued/running job per kind across all workers: the per-kind lock
+        Index('uq_background_jobs_active_kind', 'kind', unique=True,
+              postgresql_where=status.in_(['queued', 'running']),
+              sqlite_where=status.in_(['queued', 'running'])),
+        Index('ix_background_jobs_created', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f"<BackgroundJob(id='{self.id}', kind='{self.kind}', status='{self.status}')>"
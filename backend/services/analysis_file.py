@@ -0,0 +1,96 @@
+"""
+Parsed, pre-serialized copy of data/processed/tokyo_weekender_analysis.json
+"""
+import json
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Same encoding as FastAPI's JSONResponse, so bytes served from here match a normal response
+JSON_OPTIONS = {'ensure_ascii': False, 'allow_nan': False, 'indent': None, 'separators': (',', ':')}
+
+
+def encode_json(value: Any) -> bytes:
+    return json.dumps(value, **JSON_OPTIONS).encode('utf-8')
+
+
+def _finite(value: Any) -> Any:
+    """NaN/Infinity (written by pandas into the file) -> None, which JSON responses can carry"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_finite(item) for item in value]
+    return value
+
+
+class _Snapshot:
+    """One parse of the file: the object, its section bodies and per-item list encodings"""
+
+    def __init__(self, signature: Tuple[int, int], data: Dict[str, Any]):
+        self.signature = signature
+        self.data = data
+        self.sections: Dict[str, bytes] = {}
+        self.items: Dict[Tuple[str, str], List[bytes]] = {}
+
+
+class AnalysisFileCache:
+    """Keeps the analysis file parsed in memory, re-reading it only when its mtime or size changes
+
+    Section bodies are encoded once per file version and served as ready-to-send
+    bytes. Lists inside a section are kept as per-item encodings, so a
+    '[:limit]' slice is a join of cached bytes rather than a new dump.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def _signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)  # FileNotFoundError when the file is missing
+        return stat.st_size, stat.st_mtime_ns
+
+    def _current(self) -> _Snapshot:
+        signature = self._signature()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.signature != signature:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = _finite(json.load(f))
+                # Keyed on the stat taken before reading, so a write during the read triggers another reload
+                snapshot = _Snapshot(signature, data)
+                self._snapshot = snapshot
+            return snapshot
+
+    def data(self) -> Dict[str, Any]:
+        """The parsed file (shared; do not modify)"""
+        return self._current().data
+
+    def section(self, name: str) -> bytes:
+        """JSON body of data[name] ({} when absent)"""
+        snapshot = self._current()
+        body = snapshot.sections.get(name)
+        if body is None:
+            body = encode_json(snapshot.data.get(name, {}))
+            snapshot.sections[name] = body
+        return body
+
+    def section_list(self, name: str, key: str, limit: Optional[int] = None) -> bytes:
+        """JSON body of data[name][key][:limit] ([] when absent)"""
+        snapshot = self._current()
+        items = snapshot.items.get((name, key))
+        if items is None:
+            items = [encode_json(item) for item in snapshot.data.get(name, {}).get(key, [])]
+            snapshot.items[(name, key)] = items
+        selected = items if limit is None else items[:limit]
+        return b'[' + b','.join(selected) + b']'
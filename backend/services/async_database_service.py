@@ -0,0 +1,43 @@
+"""
+Async counterpart of DatabaseService for the FastAPI handlers
+"""
+import functools
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.services.database_service import DatabaseService
+
+
+class AsyncDatabaseService:
+    """Exposes every DatabaseService method as a coroutine
+
+    Each call runs the synchronous implementation through AsyncSession.run_sync,
+    so queries go over asyncpg and yield to the event loop while waiting on NEON
+    instead of blocking it. query_errors adds up DatabaseService.query_errors
+    over every call, so a handler can tell a fallback result from real data.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.query_errors = 0
+
+    # Pure helper, no database access
+    convert_numpy_types = DatabaseService.convert_numpy_types
+
+    def __getattr__(self, name: str):
+        method = getattr(DatabaseService, name)
+        if name.startswith('_') or not callable(method):
+            raise AttributeError(name)
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            def run(session):
+                service = DatabaseService(session)
+                try:
+                    return method(service, *args, **kwargs)
+                finally:
+                    self.query_errors += service.query_errors
+
+            return await self.db.run_sync(run)
+
+        return call
@@ -0,0 +1,406 @@
+"""
+Bulk loading helpers for Ahrefs keyword exports
+"""
+import csv
+import hashlib
+import io
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Column, Index, MetaData, Table, bindparam, func, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+
+from backend.models.keyword import Keyword
+from backend.services.serp_features import serp_feature_mask
+
+# Ahrefs CSV column -> keywords table column
+TEXT_COLUMNS = {
+    'Keyword': 'keyword',
+    'Country code': 'country_code',
+    'Location': 'location',
+    'Entities': 'entities',
+    'SERP features': 'serp_features',
+    'Current URL': 'current_url',
+}
+
+INTEGER_COLUMNS = {
+    'Volume': 'volume',
+    'Organic traffic': 'organic_traffic',
+    'Paid traffic': 'paid_traffic',
+}
+
+FLOAT_COLUMNS = {
+    'KD': 'keyword_difficulty',
+    'CPC': 'cpc',
+}
+
+BOOLEAN_COLUMNS = {
+    'Current URL inside': 'current_url_inside',
+    'Navigational': 'navigational',
+    'Informational': 'informational',
+    'Commercial': 'commercial',
+    'Transactional': 'transactional',
+    'Branded': 'branded',
+    'Local': 'local',
+}
+
+# Column order used for COPY / INSERT into the keywords table
+KEYWORD_COLUMNS = (
+    ['competitor_site']
+    + list(TEXT_COLUMNS.values())
+    + list(INTEGER_COLUMNS.values())
+    + list(FLOAT_COLUMNS.values())
+    + ['current_position']
+    + list(BOOLEAN_COLUMNS.values())
+    + ['serp_features_mask', 'keyword_key', 'keyword_hash', 'row_hash', 'updated', 'created_at', 'updated_at']
+)
+
+# Natural key of a keyword row within one site
+KEY_COLUMNS = ['keyword', 'country_code']
+
+# Columns that feed row_hash; the Ahrefs crawl timestamp is left out so
+# re-crawls with identical metrics are not rewritten by delta ingest
+HASH_COLUMNS = (
+    list(TEXT_COLUMNS.values())
+    + list(INTEGER_COLUMNS.values())
+    + list(FLOAT_COLUMNS.values())
+    + ['current_position']
+    + list(BOOLEAN_COLUMNS.values())
+)
+
+NOT_RANKING_POSITION = 999
+COPY_BATCH_ROWS = 50000
+INSERT_BATCH_ROWS = 5000
+
+
+def _numeric(df: pd.DataFrame, column: str) -> pd.Series:
+    """Coerce a column to float, treating missing columns and bad values as 0"""
+    if column not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[column], errors='coerce').fillna(0)
+
+
+def parse_boolean(df: pd.DataFrame, column: str) -> pd.Series:
+    """Cast a column to bool; 'true'/'false' strings are honoured, other values count as set"""
+    if column not in df.columns:
+        return pd.Series(False, index=df.index)
+    values = df[column]
+    if values.dtype == bool:
+        return values
+    text = values.astype(str).str.strip().str.lower()
+    return values.notna() & ~text.isin(['', 'false', '0', 'nan', 'none'])
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Cross-site match key: NFKC + casefold with whitespace removed ('東京 観光' == '東京観光')"""
+    return ''.join(unicodedata.normalize('NFKC', str(keyword)).casefold().split())
+
+
+def stable_hash(text: str) -> int:
+    """Signed 64-bit BLAKE2b digest of a string (fits BIGINT)
+
+    Stored hashes are compared with ones computed by later ingests, so they must
+    not depend on the pandas, NumPy or Python version (unlike hash_pandas_object).
+    """
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def keyword_join_keys(keywords: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Normalized keyword and its signed 64-bit hash, the column pair sites are joined on"""
+    keys = keywords.map(normalize_keyword)
+    return keys, keys.map(stable_hash).astype(np.int64)
+
+
+def clean_keywords_frame(df: pd.DataFrame, competitor_site: Optional[str] = None) -> pd.DataFrame:
+    """Convert a raw Ahrefs export into a typed frame matching the keywords table"""
+    now = datetime.utcnow()
+    frame = pd.DataFrame(index=df.index)
+    frame['competitor_site'] = competitor_site
+
+    for source, target in TEXT_COLUMNS.items():
+        if source in df.columns:
+            frame[target] = df[source].astype(object).fillna('').astype(str)
+        else:
+            frame[target] = ''
+
+    for source, target in INTEGER_COLUMNS.items():
+        frame[target] = _numeric(df, source).astype(np.int64)
+
+    for source, target in FLOAT_COLUMNS.items():
+        frame[target] = _numeric(df, source).astype(np.float64)
+
+    # Missing or zero positions mean the keyword is not ranking
+    position = _numeric(df, 'Current position').astype(np.int64)
+    frame['current_position'] = position.where(position != 0, NOT_RANKING_POSITION)
+
+    for source, target in BOOLEAN_COLUMNS.items():
+        frame[target] = parse_boolean(df, source).astype(bool)
+
+    frame['serp_features_mask'] = serp_feature_mask(frame['serp_features'])
+    frame['keyword_key'], frame['keyword_hash'] = keyword_join_keys(frame['keyword'])
+
+    if 'Updated' in df.columns:
+        frame['updated'] = pd.to_datetime(df['Updated'], errors='coerce').fillna(now)
+    else:
+        frame['updated'] = now
+    frame['created_at'] = now
+    frame['updated_at'] = now
+
+    # The unique key allows one row per keyword/country; keep the first occurrence
+    frame = frame.drop_duplicates(KEY_COLUMNS)
+    frame['row_hash'] = hash_keywords_frame(frame)
+
+    return frame[KEYWORD_COLUMNS].reset_index(drop=True)
+
+
+def hash_keywords_frame(frame: pd.DataFrame) -> pd.Series:
+    """64-bit content hash of each cleaned row (stable_hash of its HASH_COLUMNS values)
+
+    Values are rendered in a fixed text form first: integers and booleans as
+    digits, floats as their IEEE-754 bits, so the hash never depends on how a
+    library version formats numbers.
+    """
+    parts = []
+    for column in HASH_COLUMNS:
+        values = frame[column]
+        if column in FLOAT_COLUMNS.values():
+            values = pd.Series(values.to_numpy(dtype=np.float64).view(np.int64), index=frame.index)
+        elif column in BOOLEAN_COLUMNS.values():
+            values = values.astype(np.int8)
+        parts.append(values.astype(str))
+    rows = parts[0].str.cat(parts[1:], sep='\x1f')
+    return rows.map(stable_hash).astype(np.int64)
+
+
+def summarize_keywords_frame(frame: pd.DataFrame) -> Dict[str, Any]:
+    """Per-site totals computed with NumPy reductions over a cleaned frame"""
+    traffic = frame['organic_traffic'].to_numpy(dtype=np.int64)
+    volume = frame['volume'].to_numpy(dtype=np.int64)
+    position = frame['current_position'].to_numpy(dtype=np.int64)
+    ranking = position < NOT_RANKING_POSITION
+    ranking_count = int(np.count_nonzero(ranking))
+
+    return {
+        'total_keywords': len(frame),
+        'total_traffic': int(np.sum(traffic)),
+        'total_volume': int(np.sum(volume)),
+        'ranking_keywords': ranking_count,
+        'avg_position': float(np.sum(position, where=ranking) / ranking_count) if ranking_count else 0.0,
+    }
+
+
+class _CSVStream(io.TextIOBase):
+    """File-like reader that renders a frame to CSV batch by batch for COPY FROM STDIN"""
+
+    def __init__(self, frame: pd.DataFrame, batch_rows: int = COPY_BATCH_ROWS):
+        self._batches = self._render(frame, batch_rows)
+        self._buffer = ''
+
+    @staticmethod
+    def _render(frame: pd.DataFrame, batch_rows: int) -> Iterator[str]:
+        for start in range(0, len(frame), batch_rows):
+            yield frame.iloc[start:start + batch_rows].to_csv(
+                index=False, header=False, na_rep='\\N', quoting=csv.QUOTE_MINIMAL
+            )
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            batch = next(self._batches, None)
+            if batch is None:
+                break
+            self._buffer += batch
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def keyword_stage_table(name: str) -> Table:
+    """Table with the loaded columns and unique key of keywords, to build a site's rows in before a swap"""
+    columns = Keyword.__table__.columns
+    return Table(
+        name, MetaData(),
+        *[Column(column, columns[column].type) for column in KEYWORD_COLUMNS],
+        Index(f'uq_{name}_key', 'competitor_site', *KEY_COLUMNS, unique=True, postgresql_nulls_not_distinct=True),
+    )
+
+
+def copy_keywords(connection, frame: pd.DataFrame, skip_existing: bool = False, table: Optional[Table] = None) -> str:
+    """Write a cleaned frame into keywords (or a keyword_stage_table); COPY on PostgreSQL, executemany elsewhere
+
+    With skip_existing=True rows whose key is already stored are left alone
+    (PostgreSQL stages the COPY in a temp table and inserts ON CONFLICT DO NOTHING;
+    other databases look the keys up first).
+    """
+    if frame.empty:
+        return 'none'
+
+    table = Keyword.__table__ if table is None else table
+    table_name = table.name
+    columns = ', '.join(KEYWORD_COLUMNS)
+    if connection.dialect.name == 'postgresql':
+        target = table_name
+        if skip_existing:
+            target = f'{table_name}_stage'
+            connection.execute(text(
+                f"CREATE TEMP TABLE IF NOT EXISTS {target} ON COMMIT DROP AS "
+                f"SELECT {columns} FROM {table_name} WITH NO DATA"
+            ))
+        sql = f"COPY {target} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(sql, _CSVStream(frame))
+        finally:
+            cursor.close()
+        if skip_existing:
+            key = ', '.join(['competitor_site'] + KEY_COLUMNS)
+            connection.execute(text(
+                f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {target} "
+                f"ON CONFLICT ({key}) DO NOTHING"
+            ))
+            connection.execute(text(f"TRUNCATE {target}"))
+        return 'copy'
+
+    if skip_existing:
+        frame = _drop_existing_keys(connection, frame, table)
+    for start in range(0, len(frame), INSERT_BATCH_ROWS):
+        batch: List[Dict] = frame.iloc[start:start + INSERT_BATCH_ROWS].to_dict('records')
+        connection.execute(table.insert(), batch)
+    return 'executemany'
+
+
+def _drop_existing_keys(connection, frame: pd.DataFrame, table: Table) -> pd.DataFrame:
+    """Rows of a cleaned frame whose (site, keyword, country) is neither stored nor repeated earlier in the frame"""
+    frame = frame.drop_duplicates(['competitor_site'] + KEY_COLUMNS)
+    stored_rows = []
+    for competitor_site, site_frame in frame.groupby(frame['competitor_site'].fillna(''), sort=False):
+        keywords = site_frame['keyword'].unique().tolist()
+        query = select(table.c.keyword, table.c.country_code).where(site_filter(table, competitor_site or None))
+        for start in range(0, len(keywords), INSERT_BATCH_ROWS):
+            batch = keywords[start:start + INSERT_BATCH_ROWS]
+            stored_rows.extend(
+                (competitor_site, keyword, country_code)
+                for keyword, country_code in connection.execute(query.where(table.c.keyword.in_(batch)))
+            )
+    if not stored_rows:
+        return frame
+    stored = pd.MultiIndex.from_tuples(stored_rows)
+    keys = pd.MultiIndex.from_arrays([frame['competitor_site'].fillna(''), frame['keyword'], frame['country_code']])
+    return frame[~keys.isin(stored)]
+
+
+def site_filter(table, competitor_site: Optional[str]):
+    """WHERE clause selecting one site's rows (NULL = Tokyo Weekender)"""
+    if competitor_site:
+        return table.c.competitor_site == competitor_site
+    return table.c.competitor_site.is_(None)
+
+
+def plan_keyword_delta(connection, frame: pd.DataFrame, competitor_site: Optional[str] = None,
+                       delete_missing: bool = True) -> Dict[str, Any]:
+    """Compare incoming row hashes with stored ones and split the frame into inserts, updates and deletes
+
+    With delete_missing=False only stored rows sharing a keyword with the frame
+    are compared, so a chunk of a larger export never deletes rows outside it.
+    """
+    table = Keyword.__table__
+    query = select(
+        table.c.id,
+        table.c.keyword,
+        table.c.country_code,
+        func.coalesce(table.c.row_hash, 0).label('row_hash'),
+        table.c.row_hash.is_(None).label('missing_hash'),
+    ).where(site_filter(table, competitor_site))
+
+    if delete_missing:
+        stored_rows = connection.execute(query).fetchall()
+    else:
+        keywords = frame['keyword'].unique().tolist()
+        stored_rows = []
+        for start in range(0, len(keywords), INSERT_BATCH_ROWS):
+            batch = keywords[start:start + INSERT_BATCH_ROWS]
+            stored_rows.extend(connection.execute(query.where(table.c.keyword.in_(batch))).fetchall())
+    stored = pd.DataFrame(stored_rows, columns=['id', 'keyword', 'country_code', 'row_hash', 'missing_hash'])
+
+    # Rows loaded before the unique key existed may repeat a key; drop the extras
+    duplicated = stored.duplicated(KEY_COLUMNS).to_numpy()
+    duplicate_ids = stored.loc[duplicated, 'id'].astype(np.int64).tolist()
+    stored = stored[~duplicated].reset_index(drop=True)
+
+    stored_ids = stored['id'].to_numpy(dtype=np.int64)
+    stored_hashes = stored['row_hash'].to_numpy(dtype=np.int64)
+    missing_hashes = stored['missing_hash'].to_numpy(dtype=bool)
+
+    positions = pd.MultiIndex.from_frame(stored[KEY_COLUMNS]).get_indexer(
+        pd.MultiIndex.from_frame(frame[KEY_COLUMNS])
+    )
+    is_new = positions < 0
+    matched = positions[~is_new]
+
+    changed = np.zeros(len(frame), dtype=bool)
+    changed[~is_new] = missing_hashes[matched] | (
+        stored_hashes[matched] != frame['row_hash'].to_numpy(dtype=np.int64)[~is_new]
+    )
+
+    still_present = np.zeros(len(stored), dtype=bool)
+    still_present[matched] = True
+    deleted_ids = stored_ids[~still_present].tolist() if delete_missing else []
+
+    return {
+        'inserts': frame[is_new],
+        'updates': frame[changed].assign(id=stored_ids[positions[changed]]),
+        'deleted_ids': deleted_ids + duplicate_ids,
+        'matched_ids': stored_ids[matched],
+        'unchanged': int(len(matched) - changed.sum()),
+    }
+
+
+def upsert_keywords(connection, inserts: pd.DataFrame, updates: pd.DataFrame) -> str:
+    """Write new and changed rows; INSERT ... ON CONFLICT on PostgreSQL, INSERT plus UPDATE by id elsewhere"""
+    if inserts.empty and updates.empty:
+        return 'none'
+
+    table = Keyword.__table__
+    if connection.dialect.name == 'postgresql':
+        statement = postgresql_insert(table)
+        # created_at keeps the original load time of the keyword
+        statement = statement.on_conflict_do_update(
+            index_elements=['competitor_site'] + KEY_COLUMNS,
+            set_={
+                column: statement.excluded[column]
+                for column in KEYWORD_COLUMNS
+                if column not in ['competitor_site', 'created_at'] + KEY_COLUMNS
+            },
+        )
+        rows = pd.concat([inserts[KEYWORD_COLUMNS], updates[KEYWORD_COLUMNS]])
+        for start in range(0, len(rows), INSERT_BATCH_ROWS):
+            batch: List[Dict] = rows.iloc[start:start + INSERT_BATCH_ROWS].to_dict('records')
+            connection.execute(statement, batch)
+        return 'upsert'
+
+    copy_keywords(connection, inserts[KEYWORD_COLUMNS])
+
+    update_columns = [column for column in KEYWORD_COLUMNS if column != 'created_at']
+    statement = (
+        table.update()
+        .where(table.c.id == bindparam('row_id'))
+        .values({column: bindparam(f'new_{column}') for column in update_columns})
+    )
+    for start in range(0, len(updates), INSERT_BATCH_ROWS):
+        batch = updates.iloc[start:start + INSERT_BATCH_ROWS]
+        records = batch[update_columns].add_prefix('new_').assign(row_id=batch['id']).to_dict('records')
+        connection.execute(statement, records)
+    return 'update'
+
+
+def delete_keywords(connection, ids: List[int]) -> None:
+    """Delete rows by primary key in batches"""
+    table = Keyword.__table__
+    for start in range(0, len(ids), INSERT_BATCH_ROWS):
+        connection.execute(table.delete().where(table.c.id.in_(ids[start:start + INSERT_BATCH_ROWS])))
@@ -0,0 +1,99 @@
+"""
+Typed Parquet cache of Ahrefs CSV exports
+"""
+import os
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from backend.services.bulk_loader import parse_boolean
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Without pyarrow every read falls back to the CSV
+    pa = None
+    pq = None
+
+COLUMNAR_SUFFIX = '.parquet'
+PARQUET_COMPRESSION = 'zstd'
+
+# Metadata key holding the size and mtime of the CSV a cache was built from
+SOURCE_METADATA_KEY = b'source_csv'
+
+NUMERIC_EXPORT_COLUMNS = ['Volume', 'KD', 'CPC', 'Organic traffic', 'Paid traffic', 'Current position']
+CATEGORICAL_EXPORT_COLUMNS = ['Country code', 'Location']
+INTENT_EXPORT_COLUMNS = ['Navigational', 'Informational', 'Commercial', 'Transactional', 'Branded', 'Local']
+
+
+def columnar_path(csv_path: Path) -> Path:
+    """Parquet sibling of an export, e.g. foo.csv -> foo.parquet"""
+    return Path(csv_path).with_suffix(COLUMNAR_SUFFIX)
+
+
+def _source_signature(csv_path: Path) -> bytes:
+    stat = Path(csv_path).stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode()
+
+
+def type_export_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Give a raw export numeric metrics, categorical country/location and boolean intents"""
+    for column in NUMERIC_EXPORT_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    for column in CATEGORICAL_EXPORT_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in INTENT_EXPORT_COLUMNS:
+        if column in df.columns:
+            df[column] = parse_boolean(df, column)
+    return df
+
+
+def is_columnar_current(csv_path: Path) -> bool:
+    """True when the Parquet sibling was built from the CSV as it is now"""
+    cache_path = columnar_path(csv_path)
+    if pq is None or not cache_path.exists():
+        return False
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except (OSError, pa.ArrowException):
+        return False
+    return metadata.get(SOURCE_METADATA_KEY) == _source_signature(csv_path)
+
+
+def convert_export(csv_path: Path) -> Optional[Path]:
+    """Parse an export once and write its typed, compressed Parquet sibling"""
+    if pq is None:
+        return None
+
+    csv_path = Path(csv_path)
+    signature = _source_signature(csv_path)
+    df = type_export_frame(pd.read_csv(csv_path))
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_METADATA_KEY] = signature
+    table = table.replace_schema_metadata(metadata)
+
+    cache_path = columnar_path(csv_path)
+    temp_path = cache_path.with_suffix(f"{COLUMNAR_SUFFIX}.{os.getpid()}.tmp")
+    pq.write_table(table, temp_path, compression=PARQUET_COMPRESSION)
+    temp_path.replace(cache_path)
+    return cache_path
+
+
+def read_keywords_export(csv_path: Path) -> pd.DataFrame:
+    """Load an Ahrefs export, preferring its Parquet sibling and rebuilding it when the CSV changed"""
+    csv_path = Path(csv_path)
+    if pq is None:
+        return type_export_frame(pd.read_csv(csv_path))
+
+    try:
+        if not is_columnar_current(csv_path):
+            convert_export(csv_path)
+        return pd.read_parquet(columnar_path(csv_path))
+    except (OSError, pa.ArrowException) as e:
+        print(f"Columnar cache unavailable for {csv_path}: {e}")
+        return type_export_frame(pd.read_csv(csv_path))
@@ -0,0 +1,76 @@
+"""
+Keyword x site position matrix: Tokyo Weekender next to every competitor in one pass
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, or_, select, text
+
+from backend.models.keyword import Keyword
+
+# Same gap definition as the competitor_opportunities rollup
+GAP_POSITION = 20
+
+
+def competitor_sites(db) -> List[str]:
+    """Competitor sites ordered by total traffic (competitor_site_totals rollup)"""
+    rows = db.execute(text("""
+        SELECT competitor_site
+        FROM competitor_site_totals
+        ORDER BY total_traffic DESC
+    """)).fetchall()
+    return [row[0] for row in rows]
+
+
+def competitor_matrix_query(db, sites: Optional[List[str]] = None, min_volume: int = 0,
+                            gaps_only: bool = False, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+    """One row per keyword with Tokyo Weekender's and each competitor's best position
+
+    Rows are grouped on keyword_hash and keyword_key, so spellings that differ only in width, case
+    or spacing land in the same row (shown under the alphabetically first one).
+
+    A single scan of keywords feeds one hash aggregate that pivots every site into
+    its own column (MIN(position) FILTER per site), instead of one self-join per
+    competitor. Rows come back as compact lists in the order of 'columns'; a
+    position is None when the site has no row for the keyword. 'total' is the
+    number of matching keywords across all pages.
+    """
+    sites = sites if sites is not None else competitor_sites(db)
+    position = Keyword.current_position
+    site = Keyword.competitor_site
+    is_competitor = site.in_(sites) if sites else site.isnot(None)
+
+    tw_position = func.min(position).filter(site.is_(None))
+    best_competitor_position = func.min(position).filter(is_competitor)
+    site_positions = [func.min(position).filter(site == name).label(f'site_{i}') for i, name in enumerate(sites)]
+    volume = func.max(Keyword.volume)
+
+    query = (
+        select(
+            func.min(Keyword.keyword).label('keyword'),
+            volume.label('volume'),
+            tw_position.label('tw_position'),
+            *site_positions,
+            func.count().over().label('total'),
+        )
+        .where(or_(site.is_(None), is_competitor))
+        .group_by(Keyword.keyword_hash, Keyword.keyword_key)
+        .having(func.count(site).filter(is_competitor) > 0)
+    )
+    if min_volume > 0:
+        # On the grouped volume, so a keyword's low-volume rows (often Tokyo Weekender's) stay in it
+        query = query.having(volume >= min_volume)
+    if gaps_only:
+        query = query.having(best_competitor_position <= GAP_POSITION).having(
+            func.coalesce(tw_position, 999) > GAP_POSITION
+        )
+    query = query.order_by(volume.desc(), Keyword.keyword_hash, Keyword.keyword_key).limit(limit).offset(offset)
+
+    rows = db.execute(query).fetchall()
+    total = int(rows[0][-1]) if rows else 0
+    next_offset = offset + len(rows) if offset + len(rows) < total else None
+    return {
+        'columns': ['keyword', 'volume', 'tw_position'] + list(sites),
+        'rows': [[row[0], int(row[1] or 0)] + list(row[2:-1]) for row in rows],
+        'total': total,
+        'next_offset': next_offset,
+    }
@@ -0,0 +1,119 @@
+"""
+Materialized competitor rollups, refreshed at the end of each ingest
+"""
+from sqlalchemy import text
+
+# Per-site totals behind /api/competitors/summary
+COMPETITOR_SITE_TOTALS_SQL = """
+    SELECT
+        competitor_site,
+        COUNT(*) AS total_keywords,
+        SUM(organic_traffic) AS total_traffic,
+        AVG(CASE WHEN current_position < 999 THEN current_position END) AS avg_position,
+        SUM(volume) AS total_volume
+    FROM keywords
+    WHERE competitor_site IS NOT NULL
+    GROUP BY competitor_site
+"""
+
+# One Tokyo Weekender row per normalized keyword (its best position). Joined on the
+# hash and the key itself, so a competitor row never fans out over several TW rows
+# and a 64-bit hash collision never pairs two different keywords.
+TW_BEST_KEYWORDS_SQL = """
+    SELECT id, keyword_hash, keyword_key, current_position, organic_traffic, current_url
+    FROM (
+        SELECT
+            id, keyword_hash, keyword_key, current_position, organic_traffic, current_url,
+            ROW_NUMBER() OVER (
+                PARTITION BY keyword_hash, keyword_key
+                ORDER BY current_position ASC, organic_traffic DESC, id ASC
+            ) AS key_rank
+        FROM keywords
+        WHERE competitor_site IS NULL
+    ) ranked
+    WHERE key_rank = 1
+"""
+
+# Every competitor keyword joined to Tokyo Weekender's row for the same normalized keyword
+COMPETITOR_TW_KEYWORDS_SQL = f"""
+    SELECT
+        c.id AS competitor_keyword_id,
+        COALESCE(t.id, 0) AS tw_keyword_id,
+        c.competitor_site,
+        c.keyword,
+        c.volume,
+        c.current_position AS competitor_position,
+        c.organic_traffic AS competitor_traffic,
+        c.current_url AS competitor_url,
+        c.keyword_difficulty,
+        c.cpc,
+        c.serp_features,
+        c.informational,
+        c.commercial,
+        c.transactional,
+        c.navigational,
+        c.branded,
+        c.local,
+        COALESCE(t.current_position, 999) AS tw_position,
+        COALESCE(t.organic_traffic, 0) AS tw_traffic,
+        t.current_url AS tw_url
+    FROM keywords c
+    LEFT JOIN ({TW_BEST_KEYWORDS_SQL}) t ON t.keyword_hash = c.keyword_hash AND t.keyword_key = c.keyword_key
+    WHERE c.competitor_site IS NOT NULL
+"""
+
+# Keywords where a competitor is in the top 20 and Tokyo Weekender is not
+COMPETITOR_OPPORTUNITIES_SQL = """
+    SELECT
+        competitor_keyword_id,
+        tw_keyword_id,
+        keyword,
+        competitor_site,
+        volume,
+        competitor_position,
+        competitor_traffic,
+        competitor_url,
+        tw_position,
+        tw_traffic
+    FROM competitor_tw_keywords
+    WHERE competitor_position <= 20
+    AND tw_position > 20
+"""
+
+# (view, definition, indexes); listed in dependency order. REFRESH ... CONCURRENTLY
+# needs a unique index on each view, so readers are never blocked by a refresh.
+ROLLUP_VIEWS = [
+    ('competitor_site_totals', COMPETITOR_SITE_TOTALS_SQL, [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_site_totals_site "
+        "ON competitor_site_totals (competitor_site)",
+        "CREATE INDEX IF NOT EXISTS ix_competitor_site_totals_traffic "
+        "ON competitor_site_totals (total_traffic DESC)",
+    ]),
+    ('competitor_tw_keywords', COMPETITOR_TW_KEYWORDS_SQL, [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_tw_keywords_ids "
+        "ON competitor_tw_keywords (competitor_keyword_id, tw_keyword_id)",
+        "CREATE INDEX IF NOT EXISTS ix_competitor_tw_keywords_site_traffic "
+        "ON competitor_tw_keywords (competitor_site, competitor_traffic DESC, volume DESC)",
+    ]),
+    ('competitor_opportunities', COMPETITOR_OPPORTUNITIES_SQL, [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_opportunities_ids "
+        "ON competitor_opportunities (competitor_keyword_id, tw_keyword_id)",
+        "CREATE INDEX IF NOT EXISTS ix_competitor_opportunities_volume "
+        "ON competitor_opportunities (volume DESC, competitor_traffic DESC)",
+    ]),
+]
+
+
+def create_competitor_rollups(connection):
+    """Create the rollup views and their indexes if they do not exist yet"""
+    for view, definition, indexes in ROLLUP_VIEWS:
+        connection.execute(text(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS {definition}"))
+        for index in indexes:
+            connection.execute(text(index))
+
+
+def refresh_competitor_rollups(connection):
+    """Rebuild the rollups from the current keyword rows without blocking readers"""
+    create_competitor_rollups(connection)
+    for view, _, _ in ROLLUP_VIEWS:
+        connection.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"))
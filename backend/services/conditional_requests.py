@@ -0,0 +1,94 @@
+"""
+ETag / Last-Modified validators for read endpoints, derived from the dataset generation
+"""
+import hashlib
+import os
+import re
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from backend.services.result_cache import DatasetVersion
+
+# Responses must change when a deploy changes their shape even if the data did not
+ETAG_SALT = os.getenv("RENDER_GIT_COMMIT", "")
+
+# Summaries may be reused briefly without asking; keyword lists always revalidate
+SUMMARY_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=3600"
+LIST_CACHE_CONTROL = "public, no-cache"
+# Database answers that fell back to an empty result after a query error
+ERROR_CACHE_CONTROL = "no-store"
+
+# Read endpoints whose body is a pure function of the URL and the database contents.
+# Endpoints served from files or process state (content-gaps, serp-features,
+# text-search, jobs, status, internal stats) are left out.
+CACHE_POLICIES: List[Tuple[Pattern, str]] = [
+    (re.compile(r'^/api/analysis/(summary|performance)$'), SUMMARY_CACHE_CONTROL),
+    (re.compile(r'^/api/competitors/summary$'), SUMMARY_CACHE_CONTROL),
+    (re.compile(r'^/api/keywords/locations$'), SUMMARY_CACHE_CONTROL),
+    (re.compile(r'^/api/content/recommendations$'), SUMMARY_CACHE_CONTROL),
+    (re.compile(r'^/api/keywords(/search|/export|/top-performing|/improvement-opportunities)?$'), LIST_CACHE_CONTROL),
+    (re.compile(r'^/api/competitors/(opportunities|matrix)$'), LIST_CACHE_CONTROL),
+    (re.compile(r'^/api/competitors/[^/]+/(keywords|comparison)$'), LIST_CACHE_CONTROL),
+]
+
+
+def cache_policy(path: str) -> Optional[str]:
+    """Cache-Control value for a path, or None when the path is not versioned"""
+    for pattern, cache_control in CACHE_POLICIES:
+        if pattern.match(path):
+            return cache_control
+    return None
+
+
+def dataset_etag(version: DatasetVersion, path: str, query: str) -> str:
+    """Weak ETag for one URL at one dataset generation"""
+    digest = hashlib.blake2b(f'{ETAG_SALT}|{path}?{query}'.encode('utf-8'), digest_size=8).hexdigest()
+    return f'W/"{version[0]}-{digest}"'
+
+
+def last_modified(version: DatasetVersion) -> Optional[str]:
+    """HTTP date of the last ingest (bumped_at is stored as UTC)"""
+    bumped_at = version[1]
+    if bumped_at is None:
+        return None
+    return format_datetime(bumped_at.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def validator_headers(version: DatasetVersion, path: str, query: str, cache_control: str) -> Dict[str, str]:
+    headers = {'ETag': dataset_etag(version, path, query), 'Cache-Control': cache_control}
+    modified = last_modified(version)
+    if modified:
+        headers['Last-Modified'] = modified
+    return headers
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison against an If-None-Match list"""
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == opaque:
+            return True
+    return False
+
+
+def is_not_modified(request_headers, response_headers: Dict[str, str]) -> bool:
+    """True when the client's validators still match (If-None-Match wins over If-Modified-Since)"""
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, response_headers['ETag'])
+
+    if_modified_since = request_headers.get('if-modified-since')
+    modified = response_headers.get('Last-Modified')
+    if not if_modified_since or not modified:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return parsedate_to_datetime(modified) <= since
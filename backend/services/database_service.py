@@ -2,19 +2,36 @@
 Database service for keyword data operations
 """
 import json
+import time
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from backend.models.database import get_db
 from backend.models.keyword import Keyword, CompetitorKeyword, AnalysisResult, ContentRecommendation
+from backend.services.bulk_loader import (
+    clean_keywords_frame, copy_keywords, delete_keywords, plan_keyword_delta, upsert_keywords
+)
+from backend.services.competitor_matrix import competitor_matrix_query
+from backend.services.competitor_rollups import TW_BEST_KEYWORDS_SQL, refresh_competitor_rollups
+from backend.services.keyword_export import keyword_record, search_filters, search_order
+from backend.services.pagination import (
+    DATABASE_CURSOR, after_cursor, decode_cursor, encode_cursor, keyword_listing_order
+)
+from backend.services.position_distribution import (
+    DEFAULT_POSITION_BUCKETS, PositionBuckets, position_distribution_query
+)
+from backend.services.result_cache import bump_dataset_generation, cached_result
+from backend.services.serp_features import serp_feature_stats_query
+from backend.services.topic_clusters import refresh_topic_clusters
 
 class DatabaseService:
     """Service class for database operations"""
     
     def __init__(self, db: Session):
         self.db = db
+        self.query_errors = 0  # Queries that fell back to an empty result (see cached_result)
     
     def convert_numpy_types(self, obj):
         """Convert numpy types to Python native types for JSON serialization"""
@@ -32,55 +49,97 @@ class DatabaseService:
             return [self.convert_numpy_types(item) for item in obj]
         return obj
     
-    def bulk_insert_keywords(self, keywords_data: List[Dict]) -> int:
+    def bulk_insert_keywords(self, keywords_data: Union[List[Dict], pd.DataFrame]) -> int:
         """Bulk insert keywords data"""
+        df = keywords_data if isinstance(keywords_data, pd.DataFrame) else pd.DataFrame(keywords_data)
+        stats = self.bulk_load_keywords(df)
+        return stats['rows']
+    
+    def bulk_load_keywords(self, df: pd.DataFrame, competitor_site: Optional[str] = None, replace: bool = True,
+                           cleaned: bool = False) -> Dict[str, Any]:
+        """Clean an Ahrefs export in vectorized form and stream it into keywords"""
         try:
-            # Clear existing data
-            self.db.query(Keyword).delete()
+            start = time.perf_counter()
+            # Pass cleaned=True when the frame already came from clean_keywords_frame
+            frame = df if cleaned else clean_keywords_frame(df, competitor_site)
             
-            # Prepare data for bulk insert
-            keywords = []
-            for data in keywords_data:
-                # Handle NaN values and convert to appropriate types
-                def safe_get(key, default=None):
-                    value = data.get(key, default)
-                    if pd.isna(value) if hasattr(pd, 'isna') else (value is None or str(value).lower() == 'nan'):
-                        return default
-                    return value
-                
-                keyword = Keyword(
-                    keyword=str(safe_get('Keyword', '')),
-                    country_code=str(safe_get('Country code', '')),
-                    location=str(safe_get('Location', '')),
-                    entities=str(safe_get('Entities', '')),
-                    serp_features=str(safe_get('SERP features', '')),
-                    volume=int(float(safe_get('Volume', 0) or 0)),
-                    keyword_difficulty=float(safe_get('KD', 0) or 0),
-                    cpc=float(safe_get('CPC', 0) or 0),
-                    organic_traffic=int(float(safe_get('Organic traffic', 0) or 0)),
-                    paid_traffic=int(float(safe_get('Paid traffic', 0) or 0)),
-                    current_position=int(float(safe_get('Current position', 999) or 999)) if safe_get('Current position') else 999,
-                    current_url=str(safe_get('Current URL', '')),
-                    current_url_inside=bool(safe_get('Current URL inside', False)),
-                    navigational=bool(safe_get('Navigational', False)),
-                    informational=bool(safe_get('Informational', False)),
-                    commercial=bool(safe_get('Commercial', False)),
-                    transactional=bool(safe_get('Transactional', False)),
-                    branded=bool(safe_get('Branded', False)),
-                    local=bool(safe_get('Local', False))
-                )
-                keywords.append(keyword)
-            
-            # Bulk insert
-            self.db.add_all(keywords)
+            if replace:
+                # Clear existing data for this site only (NULL = Tokyo Weekender)
+                site_filter = Keyword.competitor_site == competitor_site if competitor_site else Keyword.competitor_site.is_(None)
+                self.db.query(Keyword).filter(site_filter).delete(synchronize_session=False)
+            
+            method = copy_keywords(self.db.connection(), frame)
+            bump_dataset_generation(self.db.connection())
+            self.db.commit()
+            
+            elapsed = time.perf_counter() - start
+            return {
+                'rows': len(frame),
+                'seconds': elapsed,
+                'rows_per_second': len(frame) / elapsed if elapsed > 0 else 0.0,
+                'method': method
+            }
+            
+        except Exception as e:
+            self.db.rollback()
+            raise e
+    
+    def delta_load_keywords(self, df: pd.DataFrame, competitor_site: Optional[str] = None,
+                            cleaned: bool = False) -> Dict[str, Any]:
+        """Apply only the inserts, updates and deletes needed to make one site's rows match an export"""
+        try:
+            start = time.perf_counter()
+            frame = df if cleaned else clean_keywords_frame(df, competitor_site)
+            connection = self.db.connection()
+            
+            delta = plan_keyword_delta(connection, frame, competitor_site)
+            delete_keywords(connection, delta['deleted_ids'])
+            method = upsert_keywords(connection, delta['inserts'], delta['updates'])
+            bump_dataset_generation(self.db.connection())
+            self.db.commit()
+            
+            elapsed = time.perf_counter() - start
+            return {
+                'rows': len(frame),
+                'inserted': len(delta['inserts']),
+                'updated': len(delta['updates']),
+                'deleted': len(delta['deleted_ids']),
+                'unchanged': delta['unchanged'],
+                'seconds': elapsed,
+                'rows_per_second': len(frame) / elapsed if elapsed > 0 else 0.0,
+                'method': method
+            }
+            
+        except Exception as e:
+            self.db.rollback()
+            raise e
+    
+    def refresh_competitor_rollups(self) -> float:
+        """Refresh the materialized competitor rollups after an ingest; returns seconds taken"""
+        try:
+            start = time.perf_counter()
+            refresh_competitor_rollups(self.db.connection())
+            bump_dataset_generation(self.db.connection())
             self.db.commit()
+            return time.perf_counter() - start
             
-            return len(keywords)
+        except Exception as e:
+            self.db.rollback()
+            raise e
+    
+    def refresh_topic_clusters(self) -> int:
+        """Recompute topic cluster membership and aggregates after an ingest; returns clusters stored"""
+        try:
+            clusters = refresh_topic_clusters(self.db.connection())
+            bump_dataset_generation(self.db.connection())
+            self.db.commit()
+            return clusters
             
         except Exception as e:
             self.db.rollback()
             raise e
     
+    @cached_result
     def get_keywords_summary(self) -> Dict[str, Any]:
         """Get keywords summary statistics"""
         try:
@@ -110,6 +169,7 @@ class DatabaseService:
                 'top_performing_keywords': top_performing
             }
         except Exception as e:
+            self.query_errors += 1
             print(f"Keywords summary error: {e}")
             return {
                 'total_keywords': 0,
@@ -119,6 +179,7 @@ class DatabaseService:
                 'top_performing_keywords': 0
             }
     
+    @cached_result
     def get_performance_analysis(self) -> Dict:
         """Get performance analysis data"""
         try:
@@ -146,22 +207,11 @@ class DatabaseService:
                     'total_traffic': int(row[2]) if row[2] is not None else 0
                 }
             
-            # SERP features analysis
-            serp_stats = self.db.execute(text("""
-                SELECT serp_features, COUNT(*) as count
-                FROM keywords 
-                WHERE serp_features IS NOT NULL AND serp_features != ''
-                GROUP BY serp_features
-            """)).fetchall()
-            
-            serp_features = {}
-            for row in serp_stats:
-                if row[0]:  # Only process non-empty SERP features
-                    features = row[0].split(', ')
-                    for feature in features:
-                        feature = feature.strip()
-                        if feature:
-                            serp_features[feature] = serp_features.get(feature, 0) + int(row[1])
+            # SERP features analysis (one pass over the ingest-time bitmask)
+            serp_stats = serp_feature_stats_query(self.db, all_sites=True)
+            serp_features = {
+                feature: stats['count'] for feature, stats in serp_stats.items() if stats['count'] > 0
+            }
             
             return {
                 'position_distribution': position_distribution,
@@ -169,72 +219,24 @@ class DatabaseService:
             }
             
         except Exception as e:
+            self.query_errors += 1
             print(f"Performance analysis error: {e}")
             return {
                 'position_distribution': {},
                 'serp_features': {}
             }
     
-    def search_keywords(self, min_volume: int = 100, max_position: int = 50, intent: str = "", location: str = "", limit: int = 100) -> List[Dict]:
+    def search_keywords(self, min_volume: int = 100, max_position: int = 50, intent: str = "", location: str = "", limit: int = 100,
+                        serp_feature: str = "") -> List[Dict]:
         """Search keywords with filters"""
         try:
-            # Build query
-            query = self.db.query(Keyword)
-            
-            # Apply filters
-            if min_volume > 0:
-                query = query.filter(Keyword.volume >= min_volume)
-            
-            if max_position > 0:
-                query = query.filter(Keyword.current_position <= max_position)
-            
-            if intent:
-                # Map intent string to boolean field
-                intent_map = {
-                    'Informational': Keyword.informational,
-                    'Commercial': Keyword.commercial,
-                    'Transactional': Keyword.transactional,
-                    'Navigational': Keyword.navigational,
-                    'Branded': Keyword.branded,
-                    'Local': Keyword.local
-                }
-                if intent in intent_map:
-                    query = query.filter(intent_map[intent] == True)
-            
-            if location:
-                query = query.filter(Keyword.location == location)
-            
-            # Order by traffic and position
-            query = query.order_by(Keyword.organic_traffic.desc(), Keyword.current_position.asc())
-            
-            # Limit results
-            results = query.limit(limit).all()
-            
-            # Convert to dictionary format
-            keywords = []
-            for keyword in results:
-                keywords.append({
-                    'Keyword': keyword.keyword,
-                    'Country code': keyword.country_code,
-                    'Location': keyword.location,
-                    'Entities': keyword.entities,
-                    'SERP features': keyword.serp_features,
-                    'Volume': keyword.volume,
-                    'KD': keyword.keyword_difficulty,
-                    'CPC': keyword.cpc,
-                    'Organic traffic': keyword.organic_traffic,
-                    'Paid traffic': keyword.paid_traffic,
-                    'Current position': keyword.current_position,
-                    'Current URL': keyword.current_url,
-                    'Current URL inside': keyword.current_url_inside,
-                    'Updated': keyword.updated.isoformat() if keyword.updated else None,
-                    'Navigational': keyword.navigational,
-                    'Informational': keyword.informational,
-                    'Commercial': keyword.commercial,
-                    'Transactional': keyword.transactional,
-                    'Branded': keyword.branded,
-                    'Local': keyword.local
-                })
+            query = (
+                self.db.query(Keyword)
+                .filter(*search_filters(min_volume, max_position, intent, location, serp_feature))
+                .order_by(*search_order())  # Order by traffic and position
+                .limit(limit)
+            )
+            keywords = [keyword_record(keyword) for keyword in query.all()]
             
             return keywords
             
@@ -242,6 +244,7 @@ class DatabaseService:
             print(f"Keyword search error: {e}")
             return []
     
+    @cached_result
     def get_available_locations(self) -> List[Dict]:
         """Get list of available countries/regions with keyword counts"""
         try:
@@ -266,23 +269,23 @@ class DatabaseService:
             return locations
             
         except Exception as e:
+            self.query_errors += 1
             print(f"Get locations error: {e}")
             return []
     
+    @cached_result
     def get_competitors_summary(self) -> Dict:
         """Get competitors summary"""
         try:
-            # Get competitor sites and their statistics
+            # Get competitor sites and their statistics (competitor_site_totals rollup)
             competitors = self.db.execute(text("""
                 SELECT 
                     competitor_site,
-                    COUNT(*) as total_keywords,
-                    SUM(organic_traffic) as total_traffic,
-                    AVG(CASE WHEN current_position < 999 THEN current_position END) as avg_position,
-                    SUM(volume) as total_volume
-                FROM keywords 
-                WHERE competitor_site IS NOT NULL
-                GROUP BY competitor_site
+                    total_keywords,
+                    total_traffic,
+                    avg_position,
+                    total_volume
+                FROM competitor_site_totals
                 ORDER BY total_traffic DESC
             """)).fetchall()
             
@@ -320,6 +323,7 @@ class DatabaseService:
             }
             
         except Exception as e:
+            self.query_errors += 1
             print(f"Competitors summary error: {e}")
             return {
                 "competitors": [],
@@ -379,42 +383,21 @@ class DatabaseService:
     def get_competitor_opportunities(self, min_volume: int = 100, limit: int = 100) -> List[Dict]:
         """Get competitor opportunity keywords (keywords where competitors rank well but Tokyo Weekender doesn't)"""
         try:
-            # Find keywords where competitors rank well (position <= 20) but Tokyo Weekender doesn't rank or ranks poorly
+            # Keywords where competitors rank well (position <= 20) but Tokyo Weekender doesn't rank or ranks poorly,
+            # precomputed in the competitor_opportunities rollup
             opportunities = self.db.execute(text("""
-                WITH competitor_good_keywords AS (
-                    SELECT 
-                        keyword,
-                        competitor_site,
-                        volume,
-                        current_position as competitor_position,
-                        organic_traffic as competitor_traffic,
-                        current_url as competitor_url
-                    FROM keywords 
-                    WHERE competitor_site IS NOT NULL 
-                    AND current_position <= 20 
-                    AND volume >= :min_volume
-                ),
-                tokyo_weekender_keywords AS (
-                    SELECT 
-                        keyword,
-                        current_position as tw_position,
-                        organic_traffic as tw_traffic
-                    FROM keywords 
-                    WHERE competitor_site IS NULL
-                )
                 SELECT 
-                    c.keyword,
-                    c.competitor_site,
-                    c.volume,
-                    c.competitor_position,
-                    c.competitor_traffic,
-                    c.competitor_url,
-                    COALESCE(t.tw_position, 999) as tw_position,
-                    COALESCE(t.tw_traffic, 0) as tw_traffic
-                FROM competitor_good_keywords c
-                LEFT JOIN tokyo_weekender_keywords t ON c.keyword = t.keyword
-                WHERE COALESCE(t.tw_position, 999) > 20
-                ORDER BY c.volume DESC, c.competitor_traffic DESC
+                    keyword,
+                    competitor_site,
+                    volume,
+                    competitor_position,
+                    competitor_traffic,
+                    competitor_url,
+                    tw_position,
+                    tw_traffic
+                FROM competitor_opportunities
+                WHERE volume >= :min_volume
+                ORDER BY volume DESC, competitor_traffic DESC
                 LIMIT :limit
             """), {"min_volume": min_volume, "limit": limit}).fetchall()
             
@@ -438,62 +421,43 @@ class DatabaseService:
             print(f"Competitor opportunities error: {e}")
             return []
     
+    def get_competitor_matrix(self, sites: Optional[List[str]] = None, min_volume: int = 0,
+                              gaps_only: bool = False, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        """Tokyo Weekender's position next to every competitor's, one row per keyword"""
+        try:
+            return competitor_matrix_query(self.db, sites, min_volume, gaps_only, limit, offset)
+            
+        except Exception as e:
+            print(f"Error getting competitor matrix: {e}")
+            raise e
+    
     def get_competitor_vs_tw_comparison(self, competitor_site: str, limit: int = 100) -> List[Dict]:
         """Get detailed comparison between competitor and Tokyo Weekender for top keywords"""
         try:
-            # Get competitor's top keywords with Tokyo Weekender comparison
+            # Get competitor's top keywords with Tokyo Weekender comparison (competitor_tw_keywords rollup)
             comparison_data = self.db.execute(text("""
-                WITH competitor_top_keywords AS (
-                    SELECT 
-                        keyword,
-                        volume,
-                        current_position as competitor_position,
-                        organic_traffic as competitor_traffic,
-                        current_url as competitor_url,
-                        keyword_difficulty,
-                        cpc,
-                        serp_features,
-                        informational,
-                        commercial,
-                        transactional,
-                        navigational,
-                        branded,
-                        local
-                    FROM keywords 
-                    WHERE competitor_site = :competitor_site
-                    ORDER BY organic_traffic DESC, volume DESC
-                    LIMIT :limit
-                ),
-                tokyo_weekender_keywords AS (
-                    SELECT 
-                        keyword,
-                        current_position as tw_position,
-                        organic_traffic as tw_traffic,
-                        current_url as tw_url
-                    FROM keywords 
-                    WHERE competitor_site IS NULL
-                )
                 SELECT 
-                    c.keyword,
-                    c.volume,
-                    c.competitor_position,
-                    c.competitor_traffic,
-                    c.competitor_url,
-                    c.keyword_difficulty,
-                    c.cpc,
-                    c.serp_features,
-                    c.informational,
-                    c.commercial,
-                    c.transactional,
-                    c.navigational,
-                    c.branded,
-                    c.local,
-                    COALESCE(t.tw_position, 999) as tw_position,
-                    COALESCE(t.tw_traffic, 0) as tw_traffic,
-                    t.tw_url
-                FROM competitor_top_keywords c
-                LEFT JOIN tokyo_weekender_keywords t ON c.keyword = t.keyword
-                ORDER BY c.competitor_traffic DESC, c.volume DESC
+                    keyword,
+                    volume,
+                    competitor_position,
+                    competitor_traffic,
+                    competitor_url,
+                    keyword_difficulty,
+                    cpc,
+                    serp_features,
+                    informational,
+                    commercial,
+                    transactional,
+                    navigational,
+                    branded,
+                    local,
+                    tw_position,
+                    tw_traffic,
+                    tw_url
+                FROM competitor_tw_keywords
+                WHERE competitor_site = :competitor_site
+                ORDER BY competitor_traffic DESC, volume DESC
+                LIMIT :limit
             """), {"competitor_site": competitor_site, "limit": limit}).fetchall()
             
             comparison_results = []
@@ -544,42 +508,12 @@ class DatabaseService:
         else:
             return "same"  # Same position
     
-    def get_position_distribution(self) -> Dict[str, Dict]:
-        """Get position distribution analysis"""
+    @cached_result
+    def get_position_distribution(self, competitor_site: Optional[str] = None, all_sites: bool = True,
+                                  position_buckets: PositionBuckets = DEFAULT_POSITION_BUCKETS) -> Dict[str, Dict]:
+        """Get position distribution analysis (every site's keywords unless one site is selected)"""
         try:
-            position_ranges = {
-                'top_3': (1, 3),
-                'top_10': (4, 10),
-                'top_20': (11, 20),
-                'top_50': (21, 50),
-                'not_ranking': (51, 999)
-            }
-            
-            distribution = {}
-            total_keywords = self.db.query(Keyword).count()
-            
-            for name, (min_pos, max_pos) in position_ranges.items():
-                if name == 'not_ranking':
-                    keywords_in_range = self.db.query(Keyword).filter(
-                        Keyword.current_position >= min_pos
-                    ).all()
-                else:
-                    keywords_in_range = self.db.query(Keyword).filter(
-                        Keyword.current_position >= min_pos,
-                        Keyword.current_position <= max_pos
-                    ).all()
-                
-                total_volume = sum(k.volume for k in keywords_in_range)
-                total_traffic = sum(k.organic_traffic for k in keywords_in_range)
-                
-                distribution[name] = {
-                    'count': len(keywords_in_range),
-                    'percentage': len(keywords_in_range) / total_keywords * 100 if total_keywords > 0 else 0,
-                    'total_volume': total_volume,
-                    'total_traffic': total_traffic
-                }
-            
-            return distribution
+            return position_distribution_query(self.db, competitor_site, all_sites, position_buckets)
             
         except Exception as e:
             raise e
@@ -631,37 +565,12 @@ class DatabaseService:
         except Exception as e:
             raise e
     
-    def get_serp_features_analysis(self) -> Dict[str, Dict]:
-        """Get SERP features analysis"""
+    @cached_result
+    def get_serp_features_analysis(self, competitor_site: Optional[str] = None,
+                                   all_sites: bool = True) -> Dict[str, Dict]:
+        """Get SERP features analysis (every site's keywords unless one site is selected)"""
         try:
-            serp_features = [
-                'Sitelinks', 'People also ask', 'Local pack', 'Thumbnail',
-                'Video preview', 'Knowledge panel', 'AI Overview', 'Shopping'
-            ]
-            
-            analysis = {}
-            total_keywords = self.db.query(Keyword).count()
-            
-            for feature in serp_features:
-                # Use SQL LIKE for pattern matching
-                keywords_with_feature = self.db.execute(text(f"""
-                    SELECT COUNT(*) as count, 
-                           AVG(volume) as avg_volume,
-                           AVG(current_position) as avg_position,
-                           SUM(organic_traffic) as total_traffic
-                    FROM keywords 
-                    WHERE serp_features LIKE :feature_pattern
-                """), {"feature_pattern": f"%{feature}%"}).fetchone()
-                
-                analysis[feature] = {
-                    'count': keywords_with_feature.count if keywords_with_feature else 0,
-                    'percentage': (keywords_with_feature.count / total_keywords * 100) if total_keywords > 0 and keywords_with_feature else 0,
-                    'avg_volume': float(keywords_with_feature.avg_volume) if keywords_with_feature and keywords_with_feature.avg_volume else 0,
-                    'avg_position': float(keywords_with_feature.avg_position) if keywords_with_feature and keywords_with_feature.avg_position else 0,
-                    'total_traffic': keywords_with_feature.total_traffic if keywords_with_feature else 0
-                }
-            
-            return analysis
+            return serp_feature_stats_query(self.db, competitor_site, all_sites)
             
         except Exception as e:
             raise e
@@ -689,9 +598,17 @@ class DatabaseService:
                                 max_position: Optional[int] = None,
                                 intent: Optional[str] = None,
                                 limit: int = 100,
-                                offset: int = 0) -> Dict[str, Any]:
-        """Get keywords with filters"""
+                                offset: int = 0,
+                                cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Get keywords with filters, ordered by traffic then position
+        
+        Pass the previous page's next_cursor to continue the listing; keyset
+        pagination stays fast on deep pages where offset has to skip every
+        earlier row. total is only counted for the first page. A malformed
+        cursor, or one issued by the CSV fallback, raises ValueError.
+        """
         try:
+            page_cursor = decode_cursor(cursor, DATABASE_CURSOR) if cursor else None
             query = self.db.query(Keyword)
             
             if min_volume is not None:
@@ -704,10 +621,21 @@ class DatabaseService:
                 query = query.filter(getattr(Keyword, intent.lower()) == True)
             
             # Get total count
-            total = query.count()
+            total = query.count() if page_cursor is None else None
             
             # Apply pagination
-            keywords = query.offset(offset).limit(limit).all()
+            query = query.order_by(*keyword_listing_order())
+            if page_cursor is not None:
+                query = query.filter(after_cursor(page_cursor))
+            elif offset:
+                query = query.offset(offset)
+            rows = query.limit(limit + 1).all()
+            keywords = rows[:limit]
+            
+            next_cursor = None
+            if len(rows) > limit and keywords:
+                last = keywords[-1]
+                next_cursor = encode_cursor(DATABASE_CURSOR, last.organic_traffic, last.current_position, last.id)
             
             return {
                 'keywords': [
@@ -729,29 +657,27 @@ class DatabaseService:
                 ],
                 'total': total,
                 'limit': limit,
-                'offset': offset
+                'offset': offset,
+                'next_cursor': next_cursor
             }
             
         except Exception as e:
             raise e
     
+    @cached_result
     def get_new_content_recommendations(self, limit: int = 8) -> List[Dict]:
         """新規コンテンツ提案の生成"""
         try:
             # 高ボリューム + 中難易度 + 未ランキングまたは低ポジションのキーワードを分析
-            recommendations = self.db.execute(text("""
+            recommendations = self.db.execute(text(f"""
                 WITH competitor_keywords AS (
-                    SELECT DISTINCT keyword, volume, keyword_difficulty
+                    SELECT DISTINCT keyword, keyword_hash, keyword_key, volume, keyword_difficulty
                     FROM keywords 
                     WHERE competitor_site IS NOT NULL
                     AND volume > 1000
                     AND keyword_difficulty < 40
                 ),
-                tokyo_weekender_keywords AS (
-                    SELECT keyword, current_position, organic_traffic, current_url
-                    FROM keywords 
-                    WHERE competitor_site IS NULL
-                )
+                tokyo_weekender_keywords AS ({TW_BEST_KEYWORDS_SQL})
                 SELECT 
                     c.keyword,
                     c.volume,
@@ -760,7 +686,8 @@ class DatabaseService:
                     COALESCE(t.organic_traffic, 0) as organic_traffic,
                     t.current_url
                 FROM competitor_keywords c
-                LEFT JOIN tokyo_weekender_keywords t ON c.keyword = t.keyword
+                LEFT JOIN tokyo_weekender_keywords t
+                    ON c.keyword_hash = t.keyword_hash AND c.keyword_key = t.keyword_key
                 WHERE COALESCE(t.current_position, 999) > 20  -- 未ランキングまたは低ポジション
                 ORDER BY c.volume DESC, c.keyword_difficulty ASC
                 LIMIT :limit
@@ -791,9 +718,11 @@ class DatabaseService:
             return content_recommendations
             
         except Exception as e:
+            self.query_errors += 1
             print(f"New content recommendations error: {e}")
             return []
     
+    @cached_result
     def get_content_improvement_recommendations(self, limit: int = 12) -> List[Dict]:
         """既存コンテンツ改善提案の生成"""
         try:
@@ -838,42 +767,26 @@ class DatabaseService:
             return improvement_recommendations
             
         except Exception as e:
+            self.query_errors += 1
             print(f"Content improvement recommendations error: {e}")
             return []
     
+    @cached_result
     def get_topic_cluster_recommendations(self, limit: int = 3) -> List[Dict]:
         """トピッククラスター提案の生成"""
         try:
-            # 関連キーワードのグループ化とクラスター分析
+            # クラスターの割り当てと集計はインジェスト時に topic_cluster_stats へ保存済み
             clusters = self.db.execute(text("""
-                WITH keyword_groups AS (
-                    SELECT 
-                        CASE 
-                            WHEN keyword ILIKE '%tokyo%' AND keyword ILIKE '%food%' THEN 'Tokyo Food & Dining'
-                            WHEN keyword ILIKE '%tokyo%' AND keyword ILIKE '%transport%' THEN 'Tokyo Transportation'
-                            WHEN keyword ILIKE '%tokyo%' AND keyword ILIKE '%hotel%' THEN 'Tokyo Accommodation'
-                            WHEN keyword ILIKE '%tokyo%' AND keyword ILIKE '%shopping%' THEN 'Tokyo Shopping'
-                            WHEN keyword ILIKE '%tokyo%' AND keyword ILIKE '%nightlife%' THEN 'Tokyo Nightlife'
-                            ELSE 'Other'
-                        END as cluster_name,
-                        keyword,
-                        volume,
-                        current_position,
-                        organic_traffic
-                    FROM keywords 
-                    WHERE competitor_site IS NULL
-                    AND volume > 100
-                )
                 SELECT 
                     cluster_name,
-                    COUNT(*) as keyword_count,
-                    SUM(volume) as total_volume,
-                    AVG(current_position) as avg_position,
-                    SUM(organic_traffic) as total_traffic
-                FROM keyword_groups
-                WHERE cluster_name != 'Other'
-                GROUP BY cluster_name
-                HAVING COUNT(*) >= 5  -- 最低5つのキーワード
+                    keyword_count,
+                    total_volume,
+                    avg_position,
+                    total_traffic,
+                    primary_keyword,
+                    supporting_keywords
+                FROM topic_cluster_stats
+                WHERE keyword_count >= 5  -- 最低5つのキーワード
                 ORDER BY total_volume DESC
                 LIMIT :limit
             """), {"limit": limit}).fetchall()
@@ -881,14 +794,14 @@ class DatabaseService:
             topic_clusters = []
             for row in clusters:
                 cluster_name = row[0]
-                supporting_keywords = self._get_supporting_keywords(cluster_name)
+                supporting_keywords = json.loads(row[6]) if row[6] else []
                 content_pieces = min(8, max(4, row[1] // 2))  # キーワード数に基づくコンテンツ数
                 potential_traffic = int(row[4] * 1.5) if row[4] else 0  # 推定トラフィック増加
                 priority = self._calculate_cluster_priority(row[2], row[3])
                 
                 topic_clusters.append({
                     'cluster_name': cluster_name,
-                    'primary_keyword': self._get_primary_keyword(cluster_name),
+                    'primary_keyword': row[5],
                     'supporting_keywords': supporting_keywords,
                     'content_pieces': content_pieces,
                     'potential_traffic': potential_traffic,
@@ -898,6 +811,7 @@ class DatabaseService:
             return topic_clusters
             
         except Exception as e:
+            self.query_errors += 1
             print(f"Topic cluster recommendations error: {e}")
             return []
     
@@ -1008,17 +922,6 @@ class DatabaseService:
         """Generate page title from keyword"""
         return f'{keyword.title()} - Tokyo Weekender'
     
-    def _get_supporting_keywords(self, cluster_name: str) -> List[str]:
-        """Get supporting keywords for a cluster"""
-        cluster_keywords = {
-            'Tokyo Food & Dining': ['tokyo ramen', 'tokyo sushi', 'tokyo street food', 'tokyo izakaya', 'tokyo dessert'],
-            'Tokyo Transportation': ['tokyo metro', 'tokyo train', 'tokyo bus', 'tokyo taxi', 'tokyo airport transfer'],
-            'Tokyo Accommodation': ['tokyo ryokan', 'tokyo capsule hotel', 'tokyo budget accommodation', 'tokyo luxury hotels', 'tokyo business hotels'],
-            'Tokyo Shopping': ['tokyo shopping districts', 'tokyo department stores', 'tokyo markets', 'tokyo souvenirs', 'tokyo fashion'],
-            'Tokyo Nightlife': ['tokyo bars', 'tokyo clubs', 'tokyo izakaya', 'tokyo karaoke', 'tokyo entertainment']
-        }
-        return cluster_keywords.get(cluster_name, [])
-    
     def _calculate_cluster_priority(self, total_volume: int, avg_position: float) -> str:
         """Calculate cluster priority"""
         if total_volume > 10000 and avg_position > 15:
@@ -1027,14 +930,3 @@ class DatabaseService:
             return 'Medium'
         else:
             return 'Low'
-    
-    def _get_primary_keyword(self, cluster_name: str) -> str:
-        """Get primary keyword for a cluster"""
-        primary_keywords = {
-            'Tokyo Food & Dining': 'tokyo food',
-            'Tokyo Transportation': 'tokyo transportation',
-            'Tokyo Accommodation': 'tokyo hotels',
-            'Tokyo Shopping': 'tokyo shopping',
-            'Tokyo Nightlife': 'tokyo nightlife'
-        }
-        return primary_keywords.get(cluster_name, 'tokyo guide')
@@ -0,0 +1,175 @@
+"""
+Resident, pre-sorted copy of the Tokyo Weekender export for the CSV fallback mode
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.services.columnar_cache import INTENT_EXPORT_COLUMNS, read_keywords_export
+from backend.services.pagination import FILE_CURSOR, Cursor, encode_cursor
+from backend.services.serp_features import SERP_FEATURE_BITS, serp_feature_mask
+
+# Same cut as the database path's location list
+LOCATION_LIMIT = 10
+
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Rows as JSON-ready dicts (NaN -> None)"""
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+class _Snapshot:
+    """One load of the export, sorted once into listing order
+
+    Rows are kept in (traffic desc, position asc, file row asc) order, the order
+    of both the listing cursor and the search, so every query is a boolean mask
+    over flat arrays followed by taking the first matches; nothing is sorted
+    per request. The file row number stays as the index (the cursor id).
+    """
+
+    def __init__(self, signature: Tuple[int, int], df: pd.DataFrame):
+        self.signature = signature
+        traffic = df['Organic traffic'].fillna(0).to_numpy(dtype=np.float64)
+        position = df['Current position'].fillna(999).to_numpy(dtype=np.float64)
+        row_id = np.arange(len(df), dtype=np.int64)
+        order = np.lexsort((row_id, position, -traffic))
+
+        self.frame = df.iloc[order]
+        self.traffic = traffic[order]
+        self.position = position[order]
+        self.row_id = row_id[order]
+        # Filters compare against NaN-preserving copies, like the frame filters they replace
+        self.volume = df['Volume'].to_numpy(dtype=np.float64)[order]
+        self.raw_position = df['Current position'].to_numpy(dtype=np.float64)[order]
+        self.intents = {
+            column: df[column].fillna(False).to_numpy(dtype=bool)[order]
+            for column in INTENT_EXPORT_COLUMNS if column in df.columns
+        }
+        location = df['Location'].astype('category')
+        self.location_codes = location.cat.codes.to_numpy()[order]
+        self.location_lookup = {name: code for code, name in enumerate(location.cat.categories)}
+        self.serp_mask = serp_feature_mask(df['SERP features']).to_numpy()[order]
+        self.locations = self._location_totals(df)
+
+    @staticmethod
+    def _location_totals(df: pd.DataFrame) -> List[Dict[str, Any]]:
+        totals = (
+            df.groupby('Location', observed=True)['Organic traffic']
+            .agg(['size', 'sum'])
+            .sort_values('size', ascending=False, kind='stable')
+            .head(LOCATION_LIMIT)
+        )
+        return [
+            {'location': location, 'keyword_count': int(count), 'total_traffic': int(traffic) if pd.notna(traffic) else 0}
+            for location, (count, traffic) in zip(totals.index, totals.itertuples(index=False))
+            if location != ''
+        ]
+
+    def mask(self, min_volume: Optional[float] = None, max_position: Optional[float] = None, intent: str = "",
+             location: str = "", serp_feature: str = "") -> np.ndarray:
+        mask = np.ones(len(self.frame), dtype=bool)
+        if min_volume is not None:
+            mask &= self.volume >= min_volume
+        if max_position is not None:
+            mask &= self.raw_position <= max_position
+        if intent in self.intents:
+            mask &= self.intents[intent]
+        if location:
+            code = self.location_lookup.get(location)
+            if code is None:
+                mask[:] = False
+            else:
+                mask &= self.location_codes == code
+        if serp_feature in SERP_FEATURE_BITS:
+            mask &= (self.serp_mask & SERP_FEATURE_BITS[serp_feature]) != 0
+        return mask
+
+    def after(self, cursor: Cursor) -> np.ndarray:
+        last_traffic, last_position, last_id = cursor
+        return (
+            (self.traffic < last_traffic)
+            | ((self.traffic == last_traffic) & (self.position > last_position))
+            | ((self.traffic == last_traffic) & (self.position == last_position) & (self.row_id > last_id))
+        )
+
+    def cursor_at(self, index: int) -> str:
+        return encode_cursor(FILE_CURSOR, self.traffic[index], self.position[index], self.row_id[index])
+
+
+class FallbackKeywordEngine:
+    """Answers the keyword endpoints from memory while the database is unavailable
+
+    The export is loaded once (typed via the Parquet cache) and reloaded only
+    when the first existing candidate file changes size or mtime.
+    """
+
+    def __init__(self, candidates: Sequence[Path]):
+        self.candidates = [Path(path) for path in candidates]
+        self._snapshot: Optional[_Snapshot] = None
+        self._path: Optional[Path] = None
+        self._lock = threading.Lock()
+
+    def _source(self) -> Tuple[Path, Tuple[int, int]]:
+        for path in self.candidates:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            return path, (stat.st_size, stat.st_mtime_ns)
+        raise FileNotFoundError("キーワードデータが見つかりません")
+
+    def _current(self) -> _Snapshot:
+        path, signature = self._source()
+        snapshot = self._snapshot
+        if snapshot is not None and self._path == path and snapshot.signature == signature:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or self._path != path or snapshot.signature != signature:
+                snapshot = _Snapshot(signature, read_keywords_export(path))
+                self._snapshot, self._path = snapshot, path
+            return snapshot
+
+    def list_keywords(self, min_volume: Optional[int] = None, max_position: Optional[int] = None,
+                      intent: Optional[str] = None, limit: int = 100, offset: int = 0,
+                      cursor: Optional[Cursor] = None) -> Dict[str, Any]:
+        """Same response as the database listing: offset or keyset pages in traffic order"""
+        snapshot = self._current()
+        mask = snapshot.mask(min_volume, max_position, intent or "")
+        total = int(mask.sum()) if cursor is None else None
+        if cursor is not None:
+            mask &= snapshot.after(cursor)
+            offset_rows = 0
+        else:
+            offset_rows = offset
+
+        matches = np.flatnonzero(mask)
+        page = matches[offset_rows:offset_rows + limit]
+        next_cursor = None
+        if 0 < limit and len(matches) > offset_rows + limit:
+            next_cursor = snapshot.cursor_at(page[-1])
+
+        return {
+            "keywords": _records(snapshot.frame.iloc[page]),
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": next_cursor
+        }
+
+    def search(self, min_volume: int = 100, max_position: int = 50, intent: str = "", location: str = "",
+               limit: int = 100, serp_feature: str = "") -> List[Dict[str, Any]]:
+        """Filtered keywords ordered by traffic, then position"""
+        snapshot = self._current()
+        mask = snapshot.mask(min_volume if min_volume > 0 else None, max_position if max_position > 0 else None,
+                             intent, location, serp_feature)
+        rows = np.flatnonzero(mask)[:max(limit, 0)]
+        return _records(snapshot.frame.iloc[rows])
+
+    def locations(self) -> List[Dict[str, Any]]:
+        """Top locations by keyword count with their traffic, precomputed at load"""
+        return [dict(location) for location in self._current().locations]
@@ -0,0 +1,124 @@
+"""
+Manifest of ingested exports, used to skip inputs that have not changed
+"""
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked updates
+    fcntl = None
+
+MANIFEST_PATH = Path(os.getenv(
+    "INGEST_MANIFEST_PATH",
+    str(Path(os.getenv("INGEST_STATE_DIR", "data/ingest_state")) / "manifest.json")
+))
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """JSON sidecar recording path, size, mtime, SHA-256, row count and target of each loaded file
+
+    Entries are kept per database (see database_identity), and each records the
+    dataset generation after its load: a generation that went backwards means
+    the database was reset or restored, so the file is loaded again.
+    """
+
+    def __init__(self, path: Optional[Path] = None, database: str = ""):
+        self.path = Path(path) if path else MANIFEST_PATH
+        self.database = database
+        self.entries: Dict[str, Dict] = self._read()
+
+    def _key(self, csv_path: Path, target: str) -> str:
+        return f"{self.database}|{target}:{Path(csv_path).resolve()}"
+
+    def _read(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except (OSError, ValueError):
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        """Serialise read-modify-write cycles between concurrent ingest scripts"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix('.lock'), 'w') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write(self):
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.entries}, f, ensure_ascii=False, indent=2)
+        temp_path.replace(self.path)
+
+    def get(self, csv_path: Path, target: str) -> Optional[Dict]:
+        return self.entries.get(self._key(csv_path, target))
+
+    def is_unchanged(self, csv_path: Path, target: str, generation: Optional[int] = None) -> bool:
+        """True when the file was already loaded into target with identical content
+
+        Size and mtime are compared first; the file is only hashed when the
+        size matches but the mtime moved (e.g. a re-download of the same export).
+        For database targets, pass the current dataset generation: None (it could
+        not be read) or one older than the recorded load never counts as unchanged.
+        """
+        entry = self.get(csv_path, target)
+        if not entry or not Path(csv_path).exists():
+            return False
+        # Database loads record a generation; outputs that are not in the database (the analysis JSON) do not
+        if entry.get('generation') is not None and (generation is None or generation < entry['generation']):
+            return False
+
+        stat = Path(csv_path).stat()
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return True
+        if file_sha256(Path(csv_path)) != entry['sha256']:
+            return False
+
+        self.record(csv_path, target, entry['row_count'], entry['generation'], sha256=entry['sha256'])
+        return True
+
+    def record(self, csv_path: Path, target: str, row_count: int, generation: Optional[int] = None,
+               sha256: Optional[str] = None):
+        """Store a successful load and persist the manifest"""
+        stat = Path(csv_path).stat()
+        entry = {
+            'path': str(Path(csv_path).resolve()),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256 or file_sha256(Path(csv_path)),
+            'row_count': int(row_count),
+            'target': target,
+            'database': self.database,
+            'generation': generation,
+            'loaded_at': datetime.utcnow().isoformat(),
+        }
+        with self._locked():
+            self.entries = self._read()
+            self.entries[self._key(csv_path, target)] = entry
+            self._write()
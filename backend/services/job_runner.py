@@ -0,0 +1,323 @@
+"""
+Background jobs for long-running analysis and migration scripts, tracked in the database
+"""
+import os
+import re
+import subprocess
+import sys
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from backend.models.database import SessionLocal
+from backend.models.keyword import BackgroundJob
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# How often a worker writes progress, logs and a heartbeat for its running jobs
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "2"))
+# An active job without a heartbeat for this long lost its worker and releases the lock
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))
+# How long shutdown waits for a terminated script (and its final status write) before killing it
+JOB_TERMINATE_SECONDS = float(os.getenv("JOB_TERMINATE_SECONDS", "10"))
+MAX_LOG_LINES = 500
+MAX_FINISHED_JOBS = 50
+
+# Progress line of migrate_to_neon.print_chunk_progress:
+#   "📦 チャンク 3: 50,000 行をコミット (累計 150,000 行, 42.5%)"
+PROGRESS_PATTERN = re.compile(r"^📦 チャンク \d+: .*\(累計 [\d,]+ 行, (\d+(?:\.\d+)?)%\)$")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+def _duration(started_at: Optional[datetime], finished_at: Optional[datetime]) -> Optional[float]:
+    if started_at is None:
+        return None
+    return ((finished_at or datetime.utcnow()) - started_at).total_seconds()
+
+
+def _row_dict(row: BackgroundJob) -> Dict[str, Any]:
+    """API form of a job stored by any worker"""
+    return {
+        "job_id": row.id,
+        "kind": row.kind,
+        "status": row.status,
+        "progress": row.progress,
+        "returncode": row.returncode,
+        "error": row.error,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "started_at": row.started_at.isoformat() if row.started_at else None,
+        "finished_at": row.finished_at.isoformat() if row.finished_at else None,
+        "duration_seconds": _duration(row.started_at, row.finished_at),
+        "logs": row.logs.split("\n") if row.logs else [],
+    }
+
+
+class Job:
+    """One script run with its status, progress and captured output"""
+
+    def __init__(self, kind: str, command: List[str], on_success: Optional[Callable[[], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.command = command
+        self.on_success = on_success
+        self.status = QUEUED
+        self.progress: Optional[float] = None
+        self.returncode: Optional[int] = None
+        self.error: Optional[str] = None
+        self.logs = deque(maxlen=MAX_LOG_LINES)
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.stored = False  # Whether the job has a background_jobs row
+        self.save_lock = threading.Lock()
+        # Set under JobRunner.lock: the running script, and whether shutdown cancelled the job
+        self.process: Optional[subprocess.Popen] = None
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "returncode": self.returncode,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": _duration(self.started_at, self.finished_at),
+            "logs": list(self.logs),
+        }
+
+    def row_values(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "progress": self.progress,
+            "returncode": self.returncode,
+            "error": self.error,
+            "logs": "\n".join(self.logs),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "heartbeat_at": datetime.utcnow(),
+        }
+
+
+class JobRunner:
+    """Runs scripts on a worker pool; at most one active job per kind across all workers
+
+    The per-kind lock is a partial unique index on background_jobs (one queued or
+    running row per kind), so API workers in separate processes cannot start the
+    same migration twice, and any worker can report any job. Jobs started here
+    keep their live state in memory and are written back every
+    JOB_HEARTBEAT_SECONDS. Without a reachable database the runner falls back to
+    tracking jobs in this process only.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, session_factory=SessionLocal):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.session_factory = session_factory
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def submit_script(self, kind: str, script_path: Path, args: Optional[List[str]] = None,
+                      on_success: Optional[Callable[[], None]] = None) -> Tuple[Dict[str, Any], bool]:
+        """Queue a script run, or return the active job of the same kind
+
+        on_success is called in the worker thread once the script exits 0.
+        Returns the job (as served by /api/jobs) and whether it was newly created.
+        """
+        command = [sys.executable, "-u", str(script_path)] + (args or [])
+        job = Job(kind, command, on_success)
+        with self.lock:
+            active = self._claim(job)
+            if active is not None:
+                return active, False
+            self.jobs[job.id] = job
+            self._prune()
+            self._start_heartbeat()
+
+        self.executor.submit(self._run, job)
+        return job.to_dict(), True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job started by any worker, or None"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                return job.to_dict()
+        try:
+            with self.session_factory() as db:
+                row = db.get(BackgroundJob, job_id)
+                return _row_dict(row) if row is not None else None
+        except SQLAlchemyError as e:
+            print(f"Job store read error: {e}")
+            return None
+
+    def shutdown(self):
+        """Stop the workers, releasing every kind lock this process holds
+
+        Queued jobs are marked failed; running scripts are terminated, and their
+        worker writes the failed status before shutdown returns.
+        """
+        self._stopped.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+        queued, running = [], []
+        with self.lock:
+            for job in self.jobs.values():
+                if job.status not in ACTIVE_STATUSES:
+                    continue
+                job.cancelled = True
+                if job.status == QUEUED:
+                    job.status = FAILED
+                    job.error = "cancelled at shutdown"
+                    job.finished_at = datetime.utcnow()
+                    queued.append(job)
+                else:
+                    running.append(job)
+                    if job.process is not None:
+                        job.process.terminate()
+
+        for job in queued:
+            self._save(job)
+        for job in running:
+            if not job.done.wait(JOB_TERMINATE_SECONDS) and job.process is not None:
+                job.process.kill()
+                job.done.wait(JOB_TERMINATE_SECONDS)
+
+    def _claim(self, job: Job) -> Optional[Dict[str, Any]]:
+        """Insert the job's row, taking the kind's lock; the active job's dict if another holds it"""
+        for _ in range(2):
+            try:
+                with self.session_factory() as db:
+                    self._release_stale(db, job.kind)
+                    db.commit()
+                    db.add(BackgroundJob(id=job.id, kind=job.kind, created_at=job.created_at, **job.row_values()))
+                    db.commit()
+                job.stored = True
+                return None
+            except IntegrityError:
+                with self.session_factory() as db:
+                    row = db.query(BackgroundJob).filter(
+                        BackgroundJob.kind == job.kind, BackgroundJob.status.in_(ACTIVE_STATUSES)
+                    ).first()
+                    if row is not None:
+                        return self._local_dict(row.id) or _row_dict(row)
+                # The holder finished in between; try again
+            except SQLAlchemyError as e:
+                print(f"Job store unavailable, tracking jobs in this process only: {e}")
+                break
+
+        for local in self.jobs.values():
+            if local.kind == job.kind and local.status in ACTIVE_STATUSES:
+                return local.to_dict()
+        return None
+
+    def _local_dict(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job is not None else None
+
+    @staticmethod
+    def _release_stale(db, kind: str):
+        """Fail an active job of this kind whose worker stopped sending heartbeats"""
+        cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+        db.query(BackgroundJob).filter(
+            BackgroundJob.kind == kind,
+            BackgroundJob.status.in_(ACTIVE_STATUSES),
+            BackgroundJob.heartbeat_at < cutoff,
+        ).update({
+            BackgroundJob.status: FAILED,
+            BackgroundJob.error: "worker lost (no heartbeat)",
+            BackgroundJob.finished_at: datetime.utcnow(),
+        }, synchronize_session=False)
+
+    def _save(self, job: Job):
+        if not job.stored:
+            return
+        try:
+            # Serialised per job, so a heartbeat can never overwrite the final status with an older one
+            with job.save_lock, self.session_factory() as db:
+                db.query(BackgroundJob).filter(BackgroundJob.id == job.id).update(
+                    job.row_values(), synchronize_session=False
+                )
+                db.commit()
+        except SQLAlchemyError as e:
+            print(f"Job store write error: {e}")
+
+    def _start_heartbeat(self):
+        if self._heartbeat is None or not self._heartbeat.is_alive():
+            self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self):
+        while not self._stopped.wait(JOB_HEARTBEAT_SECONDS):
+            with self.lock:
+                active = [job for job in self.jobs.values() if job.status in ACTIVE_STATUSES]
+            for job in active:
+                self._save(job)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status not in ACTIVE_STATUSES]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job_id]
+
+    def _run(self, job: Job):
+        with self.lock:
+            # Already failed by shutdown while it waited in the queue
+            if job.cancelled:
+                return
+            job.status = RUNNING
+            job.started_at = datetime.utcnow()
+        self._save(job)
+        try:
+            process = subprocess.Popen(
+                job.command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+            )
+            with self.lock:
+                job.process = process
+                if job.cancelled:
+                    process.terminate()
+            for line in process.stdout:
+                line = line.rstrip()
+                job.logs.append(line)
+                match = PROGRESS_PATTERN.match(line)
+                if match:
+                    job.progress = min(float(match.group(1)), 100.0)
+            job.returncode = process.wait()
+
+            if job.returncode == 0:
+                job.status = SUCCEEDED
+                job.progress = 100.0
+                if job.on_success:
+                    job.on_success()
+            else:
+                job.status = FAILED
+                job.error = "terminated at shutdown" if job.cancelled else f"exit code {job.returncode}"
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            # Writing the final status releases the kind's lock
+            self._save(job)
+            job.done.set()
+
+
+job_runner = JobRunner()
@@ -0,0 +1,146 @@
+"""
+Streaming keyword export (CSV / NDJSON) over a server-side cursor
+"""
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models.keyword import Keyword
+from backend.services.serp_features import SERP_FEATURE_BITS, has_serp_feature
+
+# Rows fetched per round trip from the server-side cursor; memory stays at one batch
+EXPORT_BATCH_ROWS = 2000
+
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+INTENT_COLUMNS = {
+    'Informational': Keyword.informational,
+    'Commercial': Keyword.commercial,
+    'Transactional': Keyword.transactional,
+    'Navigational': Keyword.navigational,
+    'Branded': Keyword.branded,
+    'Local': Keyword.local,
+}
+
+# Export headers (Ahrefs names) -> keywords table column
+RECORD_COLUMNS = {
+    'Keyword': 'keyword',
+    'Country code': 'country_code',
+    'Location': 'location',
+    'Entities': 'entities',
+    'SERP features': 'serp_features',
+    'Volume': 'volume',
+    'KD': 'keyword_difficulty',
+    'CPC': 'cpc',
+    'Organic traffic': 'organic_traffic',
+    'Paid traffic': 'paid_traffic',
+    'Current position': 'current_position',
+    'Current URL': 'current_url',
+    'Current URL inside': 'current_url_inside',
+    'Updated': 'updated',
+    'Navigational': 'navigational',
+    'Informational': 'informational',
+    'Commercial': 'commercial',
+    'Transactional': 'transactional',
+    'Branded': 'branded',
+    'Local': 'local',
+}
+RECORD_HEADERS = list(RECORD_COLUMNS)
+UPDATED_INDEX = RECORD_HEADERS.index('Updated')
+
+
+def search_filters(min_volume: int = 100, max_position: int = 50, intent: str = "", location: str = "",
+                   serp_feature: str = "") -> List:
+    """WHERE clauses of the keyword search, shared by the JSON search and the export"""
+    filters = []
+    if min_volume > 0:
+        filters.append(Keyword.volume >= min_volume)
+    if max_position > 0:
+        filters.append(Keyword.current_position <= max_position)
+    if intent in INTENT_COLUMNS:
+        filters.append(INTENT_COLUMNS[intent] == True)
+    if location:
+        filters.append(Keyword.location == location)
+    if serp_feature in SERP_FEATURE_BITS:
+        filters.append(has_serp_feature(serp_feature))
+    return filters
+
+
+def search_order():
+    return [Keyword.organic_traffic.desc(), Keyword.current_position.asc()]
+
+
+def keyword_record(keyword: Keyword) -> Dict[str, Any]:
+    """Search/export record of a Keyword object"""
+    record = {header: getattr(keyword, column) for header, column in RECORD_COLUMNS.items()}
+    record['Updated'] = keyword.updated.isoformat() if keyword.updated else None
+    return record
+
+
+def _row_values(row) -> list:
+    """Values of a row selected in RECORD_COLUMNS order, by position (no per-column lookups)"""
+    values = list(row)
+    updated = values[UPDATED_INDEX]
+    values[UPDATED_INDEX] = updated.isoformat() if updated else None
+    return values
+
+
+def _encode_csv(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(RECORD_HEADERS)
+    writer.writerows(_row_values(row) for row in rows)
+    return buffer.getvalue()
+
+
+def _encode_ndjson(rows) -> str:
+    return ''.join(
+        json.dumps(dict(zip(RECORD_HEADERS, _row_values(row))), ensure_ascii=False) + '\n' for row in rows
+    )
+
+
+async def open_keyword_export(db: AsyncSession, export_format: str, min_volume: int = 100, max_position: int = 50,
+                              intent: str = "", location: str = "", serp_feature: str = "",
+                              limit: int = 0) -> AsyncIterator[str]:
+    """Start the export query and return a chunk iterator over its results
+
+    The query runs here, before the response starts, so connection errors can
+    still become an HTTP error. Rows then arrive EXPORT_BATCH_ROWS at a time
+    from a server-side cursor and are encoded batch by batch; the iterator
+    closes the session when it is exhausted or the client goes away.
+    """
+    columns = [getattr(Keyword, column) for column in RECORD_COLUMNS.values()]
+    query = (
+        select(*columns)
+        .where(*search_filters(min_volume, max_position, intent, location, serp_feature))
+        .order_by(*search_order())
+        .execution_options(yield_per=EXPORT_BATCH_ROWS)
+    )
+    if limit > 0:
+        query = query.limit(limit)
+
+    try:
+        result = await db.stream(query)
+    except Exception:
+        await db.close()
+        raise
+
+    async def chunks() -> AsyncIterator[str]:
+        try:
+            if export_format == 'csv':
+                yield _encode_csv([], header=True)
+            async for rows in result.partitions():
+                yield _encode_csv(rows) if export_format == 'csv' else _encode_ndjson(rows)
+        finally:
+            await result.close()
+            await db.close()
+
+    return chunks()
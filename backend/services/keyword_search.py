@@ -0,0 +1,336 @@
+"""
+In-process character n-gram index for substring and fuzzy keyword search
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from backend.models.keyword import Keyword
+from backend.services.bulk_loader import normalize_keyword
+
+# Seconds between checks of the database for re-ingested sites
+INDEX_CHECK_SECONDS = int(os.getenv("KEYWORD_INDEX_CHECK_SECONDS", "60"))
+# Merge incremental segments back into one once there are this many
+MAX_SEGMENTS = 8
+# Fuzzy matches must contain this share of the query's bigrams
+FUZZY_MIN_CONTAINMENT = 0.6
+
+# Marks the end of each keyword so single-character queries and final characters have a bigram
+END_OF_KEYWORD = '\x00'
+CODE_POINT_BITS = 21
+
+OWN_SITE_ALIASES = {'tokyoweekender', 'www.tokyoweekender.com'}
+
+DOCUMENT_COLUMNS = [
+    'id', 'keyword', 'competitor_site', 'country_code', 'location',
+    'volume', 'organic_traffic', 'current_position', 'current_url',
+]
+
+
+def _bigram_codes(texts: List[str]):
+    """Bigram codes of every text (with end marker) and the index of the text each came from"""
+    joined = ''.join(text + END_OF_KEYWORD for text in texts)
+    points = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    lengths = np.fromiter((len(text) + 1 for text in texts), dtype=np.int64, count=len(texts))
+    owners = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+
+    # A bigram starts at every character except each text's end marker
+    starts = np.ones(len(points), dtype=bool)
+    starts[np.cumsum(lengths) - 1] = False
+    positions = np.flatnonzero(starts)
+    codes = (points[positions] << CODE_POINT_BITS) | points[positions + 1]
+    return codes, owners[positions]
+
+
+def _query_bigrams(normalized: str) -> np.ndarray:
+    points = [ord(char) for char in normalized]
+    return np.unique([(a << CODE_POINT_BITS) | b for a, b in zip(points, points[1:])]).astype(np.int64)
+
+
+class _Segment:
+    """Immutable inverted index over one batch of documents"""
+
+    def __init__(self, doc_ids: np.ndarray, texts: List[str]):
+        codes, owners = _bigram_codes(texts)
+        docs = doc_ids[owners]
+        order = np.lexsort((docs, codes))
+        codes, docs = codes[order], docs[order]
+
+        # One posting per (bigram, document)
+        keep = np.ones(len(codes), dtype=bool)
+        keep[1:] = (codes[1:] != codes[:-1]) | (docs[1:] != docs[:-1])
+        codes, docs = codes[keep], docs[keep]
+
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+        self.grams = codes[np.r_[0, boundaries]] if len(codes) else codes
+        self.offsets = np.r_[0, boundaries, len(codes)] if len(codes) else np.zeros(1, dtype=np.int64)
+        self.postings = docs.astype(np.int32)
+        # Documents are numbered contiguously from base
+        self.base = int(doc_ids[0]) if len(doc_ids) else 0
+        self.doc_count = len(doc_ids)
+
+    def lookup(self, gram: int) -> np.ndarray:
+        i = np.searchsorted(self.grams, gram)
+        if i == len(self.grams) or self.grams[i] != gram:
+            return self.postings[:0]
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def lookup_prefix(self, point: int) -> List[np.ndarray]:
+        """Postings of every bigram starting with a character, i.e. the documents containing it"""
+        low = np.searchsorted(self.grams, point << CODE_POINT_BITS)
+        high = np.searchsorted(self.grams, (point + 1) << CODE_POINT_BITS)
+        return [self.postings[self.offsets[i]:self.offsets[i + 1]] for i in range(low, high)]
+
+
+def _contains(posting: np.ndarray, docs: np.ndarray) -> np.ndarray:
+    """Membership of docs in a sorted posting list"""
+    if not len(posting):
+        return np.zeros(len(docs), dtype=bool)
+    found = np.minimum(np.searchsorted(posting, docs), len(posting) - 1)
+    return posting[found] == docs
+
+
+class KeywordSearchIndex:
+    """Bigram inverted index over keyword rows, updated one site at a time
+
+    Each re-ingested site is appended as a new segment and its previous rows are
+    tombstoned; segments are merged back into one when they pile up. Within a
+    segment documents are numbered by descending traffic, so posting lists are
+    already in ranking order and a query can stop once it has a full page.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.documents = pd.DataFrame(columns=DOCUMENT_COLUMNS + ['normalized'])
+        self.alive = np.zeros(0, dtype=bool)
+        self.bigram_counts = np.zeros(0, dtype=np.int64)
+        self.traffic = np.zeros(0, dtype=np.int64)
+        # Column arrays read by every query
+        self.texts = np.zeros(0, dtype=object)
+        self.sites = np.zeros(0, dtype=object)
+        self.segments: List[_Segment] = []
+        self.site_signatures: Dict[Optional[str], tuple] = {}
+        self.source: Optional[str] = None
+        self.checked_at = 0.0
+
+    # -- updates -------------------------------------------------------
+
+    def replace_site(self, competitor_site: Optional[str], rows: pd.DataFrame):
+        """Swap one site's documents for a fresh set of keyword rows"""
+        rows = rows.reindex(columns=DOCUMENT_COLUMNS)
+        rows = rows.sort_values('organic_traffic', ascending=False, kind='stable').reset_index(drop=True)
+        rows['normalized'] = [normalize_keyword(keyword) for keyword in rows['keyword']]
+
+        with self.lock:
+            self._drop_site(competitor_site)
+            start = len(self.documents)
+            self.documents = pd.concat([self.documents, rows], ignore_index=True) if start else rows
+            self.alive = np.r_[self.alive, np.ones(len(rows), dtype=bool)]
+            self.bigram_counts = np.r_[self.bigram_counts, rows['normalized'].str.len().to_numpy(dtype=np.int64)]
+            self.traffic = np.r_[self.traffic, rows['organic_traffic'].fillna(0).to_numpy(dtype=np.int64)]
+            if len(rows):
+                doc_ids = np.arange(start, start + len(rows), dtype=np.int64)
+                self.segments.append(_Segment(doc_ids, list(rows['normalized'])))
+            if len(self.segments) > MAX_SEGMENTS or self.alive.sum() < len(self.alive) / 2:
+                self._compact()
+            self._refresh_columns()
+
+    def remove_site(self, competitor_site: Optional[str]):
+        with self.lock:
+            self._drop_site(competitor_site)
+            self.site_signatures.pop(competitor_site, None)
+
+    def _drop_site(self, competitor_site: Optional[str]):
+        if not len(self.documents):
+            return
+        sites = self.documents['competitor_site']
+        matches = sites.isna() if competitor_site is None else sites == competitor_site
+        self.alive[matches.to_numpy()] = False
+
+    def _compact(self):
+        """Rebuild a single segment over the live documents"""
+        keep = np.flatnonzero(self.alive)
+        keep = keep[np.argsort(-self.traffic[keep], kind='stable')]
+        self.documents = self.documents.iloc[keep].reset_index(drop=True)
+        self.bigram_counts = self.bigram_counts[keep]
+        self.traffic = self.traffic[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        doc_ids = np.arange(len(keep), dtype=np.int64)
+        self.segments = [_Segment(doc_ids, list(self.documents['normalized']))] if len(keep) else []
+
+    def _refresh_columns(self):
+        self.texts = self.documents['normalized'].to_numpy()
+        self.sites = self.documents['competitor_site'].to_numpy()
+
+    # -- sources -------------------------------------------------------
+
+    def sync_with_database(self, db: Session) -> int:
+        """Reload only the sites whose rows changed since the last sync; returns sites reloaded"""
+        signatures = {
+            row.competitor_site: (row.rows, str(row.last_update), row.last_id)
+            for row in db.execute(
+                select(
+                    Keyword.competitor_site,
+                    func.count().label('rows'),
+                    func.max(Keyword.updated_at).label('last_update'),
+                    func.max(Keyword.id).label('last_id'),
+                ).group_by(Keyword.competitor_site)
+            )
+        }
+
+        reloaded = 0
+        for competitor_site, signature in signatures.items():
+            if self.site_signatures.get(competitor_site) == signature and self.source == 'database':
+                continue
+            site_filter = (Keyword.competitor_site.is_(None) if competitor_site is None
+                           else Keyword.competitor_site == competitor_site)
+            result = db.execute(select(*[getattr(Keyword, column) for column in DOCUMENT_COLUMNS]).where(site_filter))
+            self.replace_site(competitor_site, pd.DataFrame(result.fetchall(), columns=DOCUMENT_COLUMNS))
+            self.site_signatures[competitor_site] = signature
+            reloaded += 1
+
+        for competitor_site in set(self.site_signatures) - set(signatures):
+            self.remove_site(competitor_site)
+        self.source = 'database'
+        return reloaded
+
+    def load_frame(self, rows: pd.DataFrame, source: str):
+        """Index Tokyo Weekender rows from a cleaned export (CSV fallback)"""
+        rows = rows.copy()
+        if 'id' not in rows.columns:
+            rows['id'] = np.arange(len(rows))
+        self.replace_site(None, rows)
+        self.source = source
+
+    def ensure_current(self, session_factory: Callable[[], Session],
+                       load_fallback: Optional[Callable[[], pd.DataFrame]] = None, force: bool = False):
+        """Sync with the database at most every INDEX_CHECK_SECONDS; fall back to the export if it is down"""
+        with self.lock:
+            if not force and self.checked_at and time.monotonic() - self.checked_at < INDEX_CHECK_SECONDS:
+                return
+            db = session_factory()
+            try:
+                self.sync_with_database(db)
+            except Exception as e:
+                print(f"Keyword index database sync failed: {e}")
+                if load_fallback and self.source != 'csv':
+                    self.load_frame(load_fallback(), 'csv')
+            finally:
+                db.close()
+            self.checked_at = time.monotonic()
+
+    def mark_stale(self):
+        """Force a database check on the next search (e.g. after an ingest job)"""
+        self.checked_at = 0.0
+
+    # -- queries -------------------------------------------------------
+
+    def _live(self, docs: np.ndarray, site: str) -> np.ndarray:
+        docs = docs[self.alive[docs]]
+        if not site:
+            return docs
+        sites = self.sites[docs]
+        if site in OWN_SITE_ALIASES:
+            return docs[pd.isna(sites)]
+        return docs[sites == site]
+
+    def _segment_substring(self, segment: _Segment, normalized: str, limit: int, site: str) -> np.ndarray:
+        """A segment's first `limit` live documents containing the query, scanning the rarest bigram"""
+        postings = sorted((segment.lookup(gram) for gram in _query_bigrams(normalized)), key=len)
+        lead, others = postings[0], postings[1:]
+        matched = []
+        start, window = 0, limit * 4
+        while start < len(lead) and len(matched) < limit:
+            docs = lead[start:start + window]
+            for posting in others:
+                docs = docs[_contains(posting, docs)]
+            # Bigram hits can straddle a gap; confirm the full substring
+            matched.extend(doc for doc in self._live(docs, site) if normalized in self.texts[doc])
+            start += window
+            window *= 2
+        return np.array(matched[:limit], dtype=np.int64)
+
+    def _segment_character(self, segment: _Segment, character: str, limit: int, site: str) -> np.ndarray:
+        """A segment's first `limit` live documents containing one character
+
+        Reads the head of every posting for bigrams starting with the character;
+        the page is final once no truncated posting could still hold a lower id.
+        """
+        postings = segment.lookup_prefix(ord(character))
+        window = limit * 4
+        while True:
+            heads = [posting[:window] for posting in postings]
+            docs = self._live(np.unique(np.concatenate(heads)) if heads else np.zeros(0, dtype=np.int32), site)
+            truncated = [posting[window - 1] for posting in postings if len(posting) > window]
+            if not truncated or (len(docs) >= limit and min(truncated) >= docs[limit - 1]):
+                return docs[:limit].astype(np.int64)
+            window *= 4
+
+    def _segment_fuzzy(self, segment: _Segment, grams: np.ndarray, site: str):
+        """Live documents sharing enough of the query's bigrams, with the number shared"""
+        needed = int(np.ceil(FUZZY_MIN_CONTAINMENT * len(grams)))
+        counts = np.zeros(segment.doc_count, dtype=np.int16)
+        for gram in grams:
+            counts[segment.lookup(gram) - segment.base] += 1
+        docs = np.flatnonzero(counts >= needed)
+        shared = counts[docs].astype(np.int64)
+        docs += segment.base
+        live = self._live(docs, site)
+        return live, shared[np.isin(docs, live)]
+
+    def _by_traffic(self, docs: np.ndarray) -> np.ndarray:
+        return docs[np.lexsort((docs, -self.traffic[docs]))]
+
+    def search(self, query: str, limit: int = 20, fuzzy: bool = False, site: str = "") -> List[Dict[str, Any]]:
+        """Substring matches ranked by traffic, or fuzzy matches ranked by similarity then traffic"""
+        normalized = normalize_keyword(query)
+        if not normalized or limit <= 0:
+            return []
+
+        with self.lock:
+            if fuzzy and len(normalized) > 1:
+                grams = _query_bigrams(normalized + END_OF_KEYWORD)
+                found = [self._segment_fuzzy(segment, grams, site) for segment in self.segments]
+                docs = np.concatenate([docs for docs, _ in found] or [np.zeros(0, dtype=np.int64)])
+                shared = np.concatenate([shared for _, shared in found] or [np.zeros(0, dtype=np.int64)])
+                scores = 2 * shared / (len(grams) + self.bigram_counts[docs])
+                order = np.lexsort((docs, -self.traffic[docs], -scores))[:limit]
+                docs, scores = docs[order], scores[order]
+            else:
+                if len(normalized) == 1:
+                    found = [self._segment_character(segment, normalized, limit, site) for segment in self.segments]
+                else:
+                    found = [self._segment_substring(segment, normalized, limit, site) for segment in self.segments]
+                docs = self._by_traffic(np.concatenate(found or [np.zeros(0, dtype=np.int64)]))[:limit]
+                scores = np.ones(len(docs))
+
+            rows = self.documents.iloc[docs][DOCUMENT_COLUMNS[1:]].to_dict('records')
+
+        results = []
+        for row, score in zip(rows, scores):
+            row = {column: (None if pd.isna(value) else value) for column, value in row.items()}
+            row['volume'] = int(row['volume'] or 0)
+            row['organic_traffic'] = int(row['organic_traffic'] or 0)
+            if row['current_position'] is not None:
+                row['current_position'] = int(row['current_position'])
+            row['score'] = round(float(score), 4)
+            results.append(row)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'source': self.source,
+                'documents': int(self.alive.sum()),
+                'segments': len(self.segments),
+                'sites': len(self.site_signatures),
+            }
+
+
+keyword_index = KeywordSearchIndex()
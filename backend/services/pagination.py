@@ -0,0 +1,52 @@
+"""
+Keyset pagination over the traffic-sorted keyword listing
+"""
+import base64
+import json
+from typing import Tuple
+
+from sqlalchemy import and_, or_
+
+from backend.models.keyword import Keyword
+
+# Listing order: organic_traffic DESC, current_position ASC, id ASC
+# (matches index ix_keywords_traffic_position_id)
+Cursor = Tuple[int, int, int]
+
+# What a cursor's row id refers to: keywords.id, or the row number in the CSV export.
+# The two never line up, so a cursor only continues the listing that issued it.
+DATABASE_CURSOR = 'db'
+FILE_CURSOR = 'csv'
+
+
+def encode_cursor(source: str, traffic, position, row_id) -> str:
+    """Opaque cursor pointing just past the given row of a source's listing"""
+    payload = json.dumps([source, int(traffic), int(position), int(row_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, source: str) -> Cursor:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors or ones issued by another source"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_source, traffic, position, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = int(traffic), int(position), int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if cursor_source != source:
+        raise ValueError(f"Cursor was issued by the {cursor_source} listing, not {source}: {cursor}")
+    return values
+
+
+def keyword_listing_order():
+    return [Keyword.organic_traffic.desc(), Keyword.current_position.asc(), Keyword.id.asc()]
+
+
+def after_cursor(cursor: Cursor):
+    """WHERE clause selecting rows that sort after the cursor in the listing order"""
+    traffic, position, row_id = cursor
+    return or_(
+        Keyword.organic_traffic < traffic,
+        and_(Keyword.organic_traffic == traffic, Keyword.current_position > position),
+        and_(Keyword.organic_traffic == traffic, Keyword.current_position == position, Keyword.id > row_id),
+    )
@@ -0,0 +1,94 @@
+"""
+Position distribution shared by the database service and the CSV analysis script
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, func, select
+
+from backend.models.keyword import Keyword
+from backend.services.bulk_loader import site_filter
+
+# (bucket name, min position, max position); None as max leaves the bucket open-ended
+PositionBuckets = List[Tuple[str, int, Optional[int]]]
+
+DEFAULT_POSITION_BUCKETS: PositionBuckets = [
+    ('top_3', 1, 3),
+    ('top_10', 4, 10),
+    ('top_20', 11, 20),
+    ('top_50', 21, 50),
+    ('not_ranking', 51, None),
+]
+
+
+def _build_distribution(rows: Dict[str, Dict], total_keywords: int, buckets: PositionBuckets) -> Dict[str, Dict]:
+    """Shape per-bucket aggregates identically for both engines"""
+    distribution = {}
+    for name, _, _ in buckets:
+        row = rows.get(name, {})
+        count = int(row.get('count') or 0)
+        distribution[name] = {
+            'count': count,
+            'percentage': count / total_keywords * 100 if total_keywords > 0 else 0,
+            'total_volume': int(row.get('total_volume') or 0),
+            'total_traffic': int(row.get('total_traffic') or 0),
+            'avg_position': float(row['avg_position']) if count and row.get('avg_position') is not None else 0.0,
+        }
+    return distribution
+
+
+def position_distribution_query(db, competitor_site: Optional[str] = None, all_sites: bool = False,
+                                buckets: PositionBuckets = DEFAULT_POSITION_BUCKETS) -> Dict[str, Dict]:
+    """Bucket counts, volume, traffic and average position in one grouped aggregate
+
+    One site's rows (Tokyo Weekender when competitor_site is None), or every
+    site's when all_sites is set and no competitor_site is given.
+    """
+    position = Keyword.current_position
+    bucket = case(
+        *[
+            ((position >= min_pos) if max_pos is None else position.between(min_pos, max_pos), name)
+            for name, min_pos, max_pos in buckets
+        ],
+        else_=None,
+    ).label('bucket')
+
+    grouped = select(
+        bucket,
+        func.count().label('count'),
+        func.sum(Keyword.volume).label('total_volume'),
+        func.sum(Keyword.organic_traffic).label('total_traffic'),
+        func.avg(position).label('avg_position'),
+    ).group_by(bucket)
+    if competitor_site or not all_sites:
+        grouped = grouped.where(site_filter(Keyword.__table__, competitor_site))
+
+    rows = {}
+    total_keywords = 0
+    for row in db.execute(grouped):
+        total_keywords += row.count
+        if row.bucket is not None:
+            rows[row.bucket] = row._asdict()
+    return _build_distribution(rows, total_keywords, buckets)
+
+
+def position_distribution_frame(df: pd.DataFrame, buckets: PositionBuckets = DEFAULT_POSITION_BUCKETS,
+                                position_column: str = 'Current position', volume_column: str = 'Volume',
+                                traffic_column: str = 'Organic traffic') -> Dict[str, Dict]:
+    """The same aggregate over an in-memory export"""
+    position = df[position_column]
+    conditions = [
+        (position >= min_pos) if max_pos is None else position.between(min_pos, max_pos)
+        for _, min_pos, max_pos in buckets
+    ]
+    names = np.select(conditions, [name for name, _, _ in buckets], default='')
+
+    grouped = df.groupby(names).agg(
+        count=(position_column, 'size'),
+        total_volume=(volume_column, 'sum'),
+        total_traffic=(traffic_column, 'sum'),
+        avg_position=(position_column, 'mean'),
+    )
+    rows = grouped.drop(index='', errors='ignore').to_dict('index')
+    return _build_distribution(rows, len(df), buckets)
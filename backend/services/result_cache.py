@@ -0,0 +1,240 @@
+"""
+In-process result cache for DatabaseService aggregates, keyed on the dataset generation
+"""
+import copy
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+
+from backend.models.database import DATABASE_URL, database_identity
+from backend.models.keyword import DatasetGeneration
+from backend.services.shared_cache import SharedResultStore
+
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+# How long a read of dataset_generation is trusted before asking the database again
+RESULT_CACHE_GENERATION_CHECK_SECONDS = float(os.getenv("RESULT_CACHE_GENERATION_CHECK_SECONDS", "5"))
+
+
+def bump_dataset_generation(connection):
+    """Advance the dataset generation inside the caller's ingest transaction (bumped_at in UTC)"""
+    table = DatasetGeneration.__table__
+    if connection.dialect.name == 'postgresql':
+        bumped_at = func.timezone('utc', func.now())
+        statement = postgresql_insert(table).values(id=1, generation=1, bumped_at=bumped_at)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={'generation': table.c.generation + 1, 'bumped_at': bumped_at},
+        ))
+        return
+
+    # Other databases (SQLite's CURRENT_TIMESTAMP is already UTC): update, or create the row
+    result = connection.execute(
+        table.update().where(table.c.id == 1).values(generation=table.c.generation + 1, bumped_at=func.now())
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(id=1, generation=1, bumped_at=func.now()))
+
+
+# (generation, time of the last bump)
+DatasetVersion = Tuple[int, Optional[datetime]]
+
+# Identity of the application's own database (what the HTTP middleware validates against)
+APP_DATABASE = database_identity(DATABASE_URL) if DATABASE_URL else ""
+
+
+def session_database(db) -> str:
+    """Identity of the database a session is bound to"""
+    return database_identity(db.get_bind().url)
+
+
+def read_dataset_version(db) -> DatasetVersion:
+    """Current dataset generation and bump time ((0, None) before the first ingest)
+
+    Runs in a savepoint so a missing table does not abort the caller's transaction.
+    """
+    with db.begin_nested():
+        row = db.execute(
+            select(DatasetGeneration.generation, DatasetGeneration.bumped_at).where(DatasetGeneration.id == 1)
+        ).first()
+    return (int(row[0]), row[1]) if row else (0, None)
+
+
+def current_dataset_generation(db) -> Optional[int]:
+    """Dataset generation for scripts, or None when it cannot be read"""
+    try:
+        return read_dataset_version(db)[0]
+    except Exception as e:
+        print(f"Dataset generation read error: {e}")
+        return None
+
+
+class ResultCache:
+    """LRU of method results with a TTL, valid for one dataset generation
+
+    Keys include the database identity and its generation, so an ingest makes
+    every older entry unreachable and results of different databases never
+    mix; stale entries then age out through the LRU bound or the TTL.
+    Generations are tracked per database.
+    An optional shared store sits behind the LRU so worker processes on the
+    same host reuse each other's results.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+                 generation_check_seconds: float = RESULT_CACHE_GENERATION_CHECK_SECONDS,
+                 shared: Optional[SharedResultStore] = None):
+        self.max_entries = max_entries
+        self.shared = shared
+        self.ttl_seconds = ttl_seconds
+        self.generation_check_seconds = generation_check_seconds
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        # database identity -> (version, monotonic time it was read)
+        self._versions: Dict[str, Tuple[DatasetVersion, float]] = {}
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def fresh_version(self, database: str = APP_DATABASE) -> Optional[DatasetVersion]:
+        """The last dataset version read for a database, if it is still within generation_check_seconds"""
+        with self._lock:
+            entry = self._versions.get(database)
+            if entry is not None and time.monotonic() - entry[1] < self.generation_check_seconds:
+                return entry[0]
+        return None
+
+    def version(self, db) -> Optional[DatasetVersion]:
+        """Dataset version of the session's database, re-read at most every generation_check_seconds
+
+        None if unavailable.
+        """
+        database = session_database(db)
+        version = self.fresh_version(database)
+        if version is not None:
+            return version
+        try:
+            version = read_dataset_version(db)
+        except Exception as e:
+            print(f"Dataset generation read error: {e}")
+            return None
+        with self._lock:
+            self._versions[database] = (version, time.monotonic())
+        return version
+
+    def generation(self, db) -> Optional[int]:
+        version = self.version(db)
+        return version[0] if version else None
+
+    def mark_stale(self):
+        """Force the next lookup to re-read the generation (e.g. after an ingest job in this process)"""
+        with self._lock:
+            self._versions.clear()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, copy.deepcopy(entry[1])
+
+        if self.shared is not None:
+            # Another worker may already have computed it
+            found, value = self.shared.get(key, self.ttl_seconds)
+            if found:
+                self._store(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return True, copy.deepcopy(value)
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def _store(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key: str, value: Any, generation: int = 0, database: str = APP_DATABASE):
+        """Store a result computed from database at generation locally and publish it to the other workers"""
+        self._store(key, copy.deepcopy(value))
+        if self.shared is not None:
+            self.shared.put(key, generation, value, database)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            version = self._versions.get(APP_DATABASE)
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'generation': version[0][0] if version else None,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                'shared': self.shared is not None and not self.shared.disabled,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+result_cache = ResultCache(shared=SharedResultStore())
+
+
+def cached_result(method: Callable) -> Callable:
+    """Serve a DatabaseService method from result_cache for the current dataset generation
+
+    The wrapped methods return a fallback value on query errors and count them
+    in DatabaseService.query_errors; such results are returned but not stored.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not result_cache.enabled:
+            return method(self, *args, **kwargs)
+        generation = result_cache.generation(self.db)
+        if generation is None:
+            return method(self, *args, **kwargs)
+
+        database = session_database(self.db)
+        key = repr((database, method.__name__, args, sorted(kwargs.items()), generation))
+        hit, value = result_cache.get(key)
+        if hit:
+            return value
+        errors = self.query_errors
+        value = method(self, *args, **kwargs)
+        if self.query_errors == errors:
+            result_cache.put(key, value, generation, database)
+        return value
+
+    return wrapper
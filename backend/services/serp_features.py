@@ -0,0 +1,148 @@
+"""
+SERP feature bitmask: parsed once at ingest, aggregated in a single pass
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from backend.models.keyword import Keyword
+
+# Bit i of keywords.serp_features_mask is SERP_FEATURES[i]. Append only:
+# reordering or removing entries changes the meaning of stored masks.
+SERP_FEATURES = [
+    'Sitelinks',
+    'People also ask',
+    'Local pack',
+    'Thumbnail',
+    'Video preview',
+    'Knowledge panel',
+    'AI Overview',
+    'Shopping',
+    'Local teaser',
+    'Knowledge card',
+    'Top ads',
+    'Bottom ads',
+    'Top stories',
+    'Paid sitelinks',
+    'Discussions and forums',
+    'Featured snippet',
+    'Videos',
+    'Image pack',
+]
+
+# Set when a row lists any feature missing from SERP_FEATURES, so those rows are
+# still counted (under one name) rather than dropped. Kept clear of the list's bits;
+# serp_features_mask is a 32-bit integer.
+OTHER_SERP_FEATURES = 'Other'
+OTHER_SERP_FEATURES_BIT = 1 << 30
+
+SERP_FEATURE_BITS = {feature: 1 << bit for bit, feature in enumerate(SERP_FEATURES)}
+SERP_FEATURE_BITS[OTHER_SERP_FEATURES] = OTHER_SERP_FEATURES_BIT
+
+# Every name the aggregates report, in output order
+REPORTED_SERP_FEATURES = SERP_FEATURES + [OTHER_SERP_FEATURES]
+
+
+def serp_feature_mask(features: pd.Series) -> pd.Series:
+    """Parse comma-separated SERP feature strings into integer bitmasks"""
+    dummies = features.fillna('').astype(str).str.get_dummies(sep=',')
+    dummies.columns = dummies.columns.str.strip()
+    mask = pd.Series(0, index=features.index, dtype=np.int64)
+    for feature, bit in SERP_FEATURE_BITS.items():
+        if feature in dummies.columns:
+            present = dummies.loc[:, dummies.columns == feature].any(axis=1)
+            mask = mask | (present.astype(np.int64) * bit)
+    unknown = (dummies.columns != '') & ~dummies.columns.isin(list(SERP_FEATURE_BITS))
+    if unknown.any():
+        present = dummies.loc[:, unknown].any(axis=1)
+        mask = mask | (present.astype(np.int64) * OTHER_SERP_FEATURES_BIT)
+    return mask
+
+
+def has_serp_feature(feature: str):
+    """Filter on keywords having a SERP feature, via bitwise AND on the mask"""
+    return Keyword.serp_features_mask.op('&')(SERP_FEATURE_BITS[feature]) != 0
+
+
+def _build_feature_stats(rows: Dict[str, Dict], total_keywords: int, features: List[str]) -> Dict[str, Dict]:
+    """Shape per-feature aggregates identically for the database and pandas paths"""
+    stats = {}
+    for feature in features:
+        row = rows.get(feature, {})
+        count = int(row.get('count') or 0)
+        stats[feature] = {
+            'count': count,
+            'percentage': count / total_keywords * 100 if total_keywords > 0 else 0,
+            'avg_volume': float(row.get('avg_volume') or 0),
+            'avg_position': float(row.get('avg_position') or 0),
+            'total_traffic': int(row.get('total_traffic') or 0),
+        }
+    return stats
+
+
+def serp_feature_stats_query(db, competitor_site: Optional[str] = None, all_sites: bool = False,
+                             features: List[str] = REPORTED_SERP_FEATURES) -> Dict[str, Dict]:
+    """Count, average volume/position and traffic for every feature in one table scan"""
+    columns = [func.count().label('total')]
+    for bit, feature in enumerate(features):
+        present = has_serp_feature(feature)
+        columns += [
+            func.count().filter(present).label(f'count_{bit}'),
+            func.avg(Keyword.volume).filter(present).label(f'avg_volume_{bit}'),
+            func.avg(Keyword.current_position).filter(present).label(f'avg_position_{bit}'),
+            func.sum(Keyword.organic_traffic).filter(present).label(f'total_traffic_{bit}'),
+        ]
+
+    query = select(*columns)
+    if competitor_site:
+        query = query.where(Keyword.competitor_site == competitor_site)
+    elif not all_sites:
+        query = query.where(Keyword.competitor_site.is_(None))
+    result = db.execute(query).one()._asdict()
+
+    rows = {
+        feature: {
+            'count': result[f'count_{bit}'],
+            'avg_volume': result[f'avg_volume_{bit}'],
+            'avg_position': result[f'avg_position_{bit}'],
+            'total_traffic': result[f'total_traffic_{bit}'],
+        }
+        for bit, feature in enumerate(features)
+    }
+    return _build_feature_stats(rows, result['total'], features)
+
+
+def _feature_averages(values: np.ndarray, weights: np.ndarray) -> List[Optional[float]]:
+    """Per-feature mean of the non-NaN values, None where there are none (like SQL AVG over NULLs)"""
+    known = ~np.isnan(values)
+    sums = np.where(known, values, 0.0) @ weights
+    counts = known.astype(np.float64) @ weights
+    return [float(total / count) if count else None for total, count in zip(sums, counts)]
+
+
+def serp_feature_stats_frame(df: pd.DataFrame, features: List[str] = REPORTED_SERP_FEATURES,
+                             mask_column: str = 'SERP features mask', volume_column: str = 'Volume',
+                             position_column: str = 'Current position',
+                             traffic_column: str = 'Organic traffic') -> Dict[str, Dict]:
+    """The same aggregate over an in-memory export, as one matrix pass"""
+    bits = np.array([SERP_FEATURE_BITS[feature] for feature in features], dtype=np.int64)
+    present = (df[mask_column].to_numpy(dtype=np.int64)[:, None] & bits) != 0
+
+    counts = present.sum(axis=0)
+    weights = present.astype(np.float64)
+    avg_volume = _feature_averages(df[volume_column].to_numpy(dtype=np.float64), weights)
+    avg_position = _feature_averages(df[position_column].to_numpy(dtype=np.float64), weights)
+    total_traffic = np.nan_to_num(df[traffic_column].to_numpy(dtype=np.float64)) @ weights
+
+    rows = {
+        feature: {
+            'count': counts[i],
+            'avg_volume': avg_volume[i],
+            'avg_position': avg_position[i],
+            'total_traffic': total_traffic[i],
+        }
+        for i, feature in enumerate(features)
+    }
+    return _build_feature_stats(rows, len(df), features)
@@ -0,0 +1,137 @@
+"""
+SQLite-backed result store shared by every worker process on one host
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Empty disables the shared tier (each worker keeps only its own LRU); relative paths are under the project root
+RESULT_CACHE_SHARED_PATH = os.getenv("RESULT_CACHE_SHARED_PATH", "data/cache/result_cache.sqlite3")
+# Rows allowed in the shared file before the oldest are pruned
+RESULT_CACHE_SHARED_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_SHARED_MAX_ENTRIES", "2048"))
+# Prune once every this many publishes
+PRUNE_EVERY = 64
+
+# Bumped when the table changes; a file with an older layout is recreated (it only holds cache entries)
+SCHEMA_VERSION = 2
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS results (
+        key TEXT PRIMARY KEY,
+        database TEXT NOT NULL,
+        generation INTEGER NOT NULL,
+        stored_at REAL NOT NULL,
+        value BLOB NOT NULL
+    )
+"""
+
+
+class SharedResultStore:
+    """Versioned key -> pickled value store in a WAL-mode SQLite file
+
+    Workers read each other's results instead of recomputing them: a lookup
+    that misses the in-process LRU checks here, and every computed result is
+    published here. Keys already carry the database identity and its dataset
+    generation; the database and generation columns let a publish for a newer
+    generation drop that database's older rows. Failures disable the store for
+    this process rather than failing requests; an entry that cannot be read
+    back counts as a miss and is deleted.
+    """
+
+    def __init__(self, path: str = RESULT_CACHE_SHARED_PATH, max_entries: int = RESULT_CACHE_SHARED_MAX_ENTRIES):
+        self.path = PROJECT_ROOT / path if path else None
+        self.max_entries = max_entries
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._publishes = 0
+        self._newest_generations: Dict[str, int] = {}
+        self.disabled = self.path is None
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection must not cross a fork; reopen in each worker
+        if self._connection is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                connection.execute("DROP TABLE IF EXISTS results")
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.execute(SCHEMA)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def _disable(self, error: Exception):
+        print(f"Shared result cache disabled: {error}")
+        self.disabled = True
+
+    def get(self, key: str, ttl_seconds: float) -> Tuple[bool, Any]:
+        if self.disabled:
+            return False, None
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT value FROM results WHERE key = ? AND stored_at > ?", (key, time.time() - ttl_seconds)
+                ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            self._disable(e)
+            return False, None
+        if row is None:
+            return False, None
+        try:
+            return True, pickle.loads(row[0])
+        except Exception as e:
+            # Truncated, or pickled by code that has since changed (EOFError, AttributeError, ImportError, ...)
+            print(f"Shared result cache entry dropped: {e!r}")
+            self._delete(key)
+            return False, None
+
+    def _delete(self, key: str):
+        try:
+            with self._lock:
+                self._connect().execute("DELETE FROM results WHERE key = ?", (key,))
+        except (sqlite3.Error, OSError) as e:
+            self._disable(e)
+
+    def put(self, key: str, generation: int, value: Any, database: str = ""):
+        """Publish a result computed from database at generation"""
+        if self.disabled:
+            return
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO results (key, database, generation, stored_at, value) VALUES (?, ?, ?, ?, ?)",
+                    (key, database, generation, time.time(), blob)
+                )
+                self._publishes += 1
+                newest = self._newest_generations.get(database, -1)
+                if generation > newest or self._publishes % PRUNE_EVERY == 0:
+                    self._newest_generations[database] = max(generation, newest)
+                    self._prune(connection, database, generation)
+        except (sqlite3.Error, OSError, pickle.PicklingError) as e:
+            self._disable(e)
+
+    def _prune(self, connection: sqlite3.Connection, database: str, generation: int):
+        """Drop this database's rows of older generations and keep at most max_entries of the newest"""
+        connection.execute("DELETE FROM results WHERE database = ? AND generation < ?", (database, generation))
+        connection.execute(
+            "DELETE FROM results WHERE key NOT IN (SELECT key FROM results ORDER BY stored_at DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        if self.disabled:
+            return
+        try:
+            with self._lock:
+                self._connect().execute("DELETE FROM results")
+        except (sqlite3.Error, OSError) as e:
+            self._disable(e)
@@ -0,0 +1,322 @@
+"""
+Chunked, resumable CSV ingestion with a bounded memory footprint
+"""
+import hashlib
+import io
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, or_, select
+from sqlalchemy.orm import Session
+
+from backend.models.keyword import Keyword
+from backend.services.bulk_loader import (
+    KEYWORD_COLUMNS, clean_keywords_frame, copy_keywords, delete_keywords, keyword_stage_table,
+    plan_keyword_delta, site_filter, summarize_keywords_frame, upsert_keywords
+)
+from backend.services.result_cache import bump_dataset_generation
+
+# Progress files for interrupted runs live here
+INGEST_STATE_PATH = Path(os.getenv("INGEST_STATE_DIR", "data/ingest_state"))
+
+# Memory budget for one chunk's working set (raw chunk, cleaned frame, write buffers)
+DEFAULT_MEMORY_LIMIT_MB = int(os.getenv("INGEST_MEMORY_LIMIT_MB", "256"))
+
+FIRST_CHUNK_ROWS = 2000
+MIN_CHUNK_ROWS = 1000
+MAX_CHUNK_ROWS = 200000
+# Working set of a chunk relative to the in-memory size of the raw rows
+WORKING_SET_FACTOR = 4
+STALE_SCAN_ROWS = 50000
+
+
+class IngestProgress:
+    """Per-file chunk progress, persisted after every committed chunk"""
+
+    def __init__(self, csv_path: Path, competitor_site: Optional[str], mode: str):
+        stem = f"{csv_path.name}.{competitor_site or 'tokyoweekender'}.{mode}"
+        self.path = INGEST_STATE_PATH / f"{stem}.progress.json"
+        # Ids of stored rows matched by delta chunks, appended as raw int64
+        self.seen_path = INGEST_STATE_PATH / f"{stem}.seen"
+        # Replace runs build the site's rows here and swap them in after the last chunk
+        self.stage_name = f"keywords_stage_{hashlib.blake2b(stem.encode('utf-8'), digest_size=6).hexdigest()}"
+
+        stat = csv_path.stat()
+        self.source = {
+            'path': str(csv_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'competitor_site': competitor_site,
+            'mode': mode,
+        }
+        self.started_at: Optional[datetime] = None
+        self.rows_done = 0
+        # File offset just past the last committed row, where a resumed run seeks to
+        self.byte_offset = 0
+        self.chunks_done = 0
+        self.totals: Dict[str, float] = {}
+
+    def load(self) -> bool:
+        """Restore progress of an earlier run over the same, unchanged file"""
+        if not self.path.exists():
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get('source') != self.source or 'byte_offset' not in state:
+            return False
+
+        self.started_at = datetime.fromisoformat(state['started_at'])
+        self.rows_done = state['rows_done']
+        self.byte_offset = state['byte_offset']
+        self.chunks_done = state['chunks_done']
+        self.totals = state['totals']
+        return True
+
+    def start(self):
+        """Begin a fresh run"""
+        self.started_at = datetime.utcnow()
+        self.rows_done = 0
+        self.byte_offset = 0
+        self.chunks_done = 0
+        self.totals = {}
+        self.seen_path.unlink(missing_ok=True)
+        self.save()
+
+    def save(self):
+        INGEST_STATE_PATH.mkdir(parents=True, exist_ok=True)
+        state = {
+            'source': self.source,
+            'started_at': self.started_at.isoformat(),
+            'rows_done': self.rows_done,
+            'byte_offset': self.byte_offset,
+            'chunks_done': self.chunks_done,
+            'totals': self.totals,
+        }
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        temp_path.replace(self.path)
+
+    def record_seen(self, ids: np.ndarray):
+        """Append matched ids durably; called before the chunk commits so a crash can only over-record"""
+        INGEST_STATE_PATH.mkdir(parents=True, exist_ok=True)
+        with open(self.seen_path, 'ab') as f:
+            np.asarray(ids, dtype=np.int64).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def seen_ids(self) -> np.ndarray:
+        if not self.seen_path.exists():
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.fromfile(self.seen_path, dtype=np.int64))
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+        self.seen_path.unlink(missing_ok=True)
+
+
+def _read_rows(handle, rows: int) -> Tuple[bytes, int]:
+    """Raw bytes of the next `rows` CSV records and how many were read
+
+    A line ends a record only when the quotes seen so far are balanced, so
+    quoted fields containing newlines stay in one record. Reading stops on a
+    record boundary, which keeps handle.tell() a valid resume offset.
+    """
+    lines = []
+    count = 0
+    quotes = 0
+    while count < rows:
+        line = handle.readline()
+        if not line:
+            break
+        lines.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            count += 1
+            quotes = 0
+    return b''.join(lines), count
+
+
+def _next_chunk_rows(chunk: pd.DataFrame, memory_limit_bytes: int) -> int:
+    """Size the next chunk so its working set stays under the memory limit"""
+    row_bytes = chunk.memory_usage(deep=True).sum() / max(len(chunk), 1)
+    rows = int(memory_limit_bytes / (row_bytes * WORKING_SET_FACTOR))
+    return max(MIN_CHUNK_ROWS, min(MAX_CHUNK_ROWS, rows))
+
+
+def _add_totals(totals: Dict[str, float], counts: Dict[str, Any]):
+    for key, value in counts.items():
+        totals[key] = totals.get(key, 0) + value
+
+
+def _delete_stale_rows(db: Session, progress: IngestProgress, competitor_site: Optional[str]) -> int:
+    """After a delta run, delete stored rows that no chunk matched and that this run did not insert"""
+    table = Keyword.__table__
+    seen = progress.seen_ids()
+    result = db.connection().execute(
+        select(table.c.id).where(
+            site_filter(table, competitor_site),
+            or_(table.c.created_at < progress.started_at, table.c.created_at.is_(None)),
+        ).execution_options(yield_per=STALE_SCAN_ROWS)
+    )
+
+    stale = []
+    for partition in result.partitions():
+        ids = np.fromiter((row[0] for row in partition), dtype=np.int64)
+        stale.extend(ids[~np.isin(ids, seen)].tolist())
+
+    delete_keywords(db.connection(), stale)
+    return len(stale)
+
+
+def _swap_in_stage(db: Session, stage, competitor_site: Optional[str]):
+    """Replace the site's keywords with the staged rows in one transaction
+
+    Readers keep seeing the previous rows until the commit. Repeating the swap
+    (a crash before the progress file was cleared) writes the same rows again.
+    """
+    table = Keyword.__table__
+    columns = ', '.join(KEYWORD_COLUMNS)
+    connection = db.connection()
+    connection.execute(table.delete().where(site_filter(table, competitor_site)))
+    connection.exec_driver_sql(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {stage.name}")
+    bump_dataset_generation(connection)
+    db.commit()
+
+
+def stream_csv_to_keywords(db: Session,
+                           csv_path,
+                           competitor_site: Optional[str] = None,
+                           mode: str = 'replace',
+                           memory_limit_mb: Optional[int] = None,
+                           chunk_rows: Optional[int] = None,
+                           resume: bool = True,
+                           on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Read, clean, write and commit an export chunk by chunk
+
+    mode='replace' appends every chunk to a staging table and swaps it in for
+    the site's rows after the last one, so readers never see a partly loaded
+    site; mode='delta' upserts changed rows per chunk and deletes vanished keys
+    at the end. An interrupted run resumes after its last committed chunk.
+    """
+    csv_path = Path(csv_path)
+    memory_limit_bytes = (memory_limit_mb or DEFAULT_MEMORY_LIMIT_MB) * 1024 * 1024
+    adaptive = chunk_rows is None
+    chunk_rows = chunk_rows or FIRST_CHUNK_ROWS
+
+    progress = IngestProgress(csv_path, competitor_site, mode)
+    stage = keyword_stage_table(progress.stage_name) if mode == 'replace' else None
+    resumed = resume and progress.load()
+    if resumed and stage is not None and not inspect(db.connection()).has_table(stage.name):
+        resumed = False
+    if not resumed:
+        if stage is not None:
+            stage.drop(db.connection(), checkfirst=True)
+            stage.create(db.connection())
+            db.commit()
+        progress.start()
+
+    start = time.perf_counter()
+    rows_this_run = 0
+    size = max(progress.source['size'], 1)
+
+    try:
+        with open(csv_path, 'rb') as handle:
+            header = handle.readline()
+            # Seek past committed rows instead of having the parser skip them one by one
+            handle.seek(max(progress.byte_offset, handle.tell()))
+            while True:
+                block, read_rows = _read_rows(handle, chunk_rows)
+                if not read_rows:
+                    break
+                chunk = pd.read_csv(io.BytesIO(header + block))
+                del block
+
+                frame = clean_keywords_frame(chunk, competitor_site)
+                connection = db.connection()
+                counts = {'rows': len(frame)}
+                if mode == 'delta':
+                    delta = plan_keyword_delta(connection, frame, competitor_site, delete_missing=False)
+                    delete_keywords(connection, delta['deleted_ids'])
+                    upsert_keywords(connection, delta['inserts'], delta['updates'])
+                    counts.update({
+                        'inserted': len(delta['inserts']),
+                        'updated': len(delta['updates']),
+                        'deleted': len(delta['deleted_ids']),
+                        'unchanged': delta['unchanged'],
+                    })
+                    bump_dataset_generation(connection)
+                else:
+                    copy_keywords(connection, frame, skip_existing=True, table=stage)
+                if mode == 'delta':
+                    # Before the commit: a crash in between must not leave committed rows unrecorded,
+                    # or the final stale-row sweep would delete them
+                    progress.record_seen(delta['matched_ids'])
+                db.commit()
+
+                summary = summarize_keywords_frame(frame)
+                counts.update({
+                    'total_traffic': summary['total_traffic'],
+                    'total_volume': summary['total_volume'],
+                    'ranking_keywords': summary['ranking_keywords'],
+                    'position_sum': summary['avg_position'] * summary['ranking_keywords'],
+                })
+                _add_totals(progress.totals, counts)
+                progress.rows_done += len(chunk)
+                progress.byte_offset = handle.tell()
+                progress.chunks_done += 1
+                progress.save()
+                rows_this_run += len(chunk)
+
+                if on_chunk:
+                    on_chunk({
+                        'chunk': progress.chunks_done,
+                        'rows': len(chunk),
+                        'rows_done': progress.rows_done,
+                        'percent': min(handle.tell() / size * 100, 100.0),
+                    })
+                if adaptive:
+                    chunk_rows = _next_chunk_rows(chunk, memory_limit_bytes)
+                del chunk, frame
+
+        if mode == 'delta':
+            _add_totals(progress.totals, {'deleted': _delete_stale_rows(db, progress, competitor_site)})
+            bump_dataset_generation(db.connection())
+            db.commit()
+        else:
+            _swap_in_stage(db, stage, competitor_site)
+    except Exception:
+        db.rollback()
+        raise
+
+    progress.clear()
+    if stage is not None:
+        stage.drop(db.connection())
+        db.commit()
+    elapsed = time.perf_counter() - start
+    totals = progress.totals
+    ranking = totals.get('ranking_keywords', 0)
+    return {
+        'rows': int(totals.get('rows', 0)),
+        'chunks': progress.chunks_done,
+        'resumed': resumed,
+        'inserted': int(totals.get('inserted', 0)),
+        'updated': int(totals.get('updated', 0)),
+        'deleted': int(totals.get('deleted', 0)),
+        'unchanged': int(totals.get('unchanged', 0)),
+        'total_traffic': int(totals.get('total_traffic', 0)),
+        'total_volume': int(totals.get('total_volume', 0)),
+        'avg_position': totals.get('position_sum', 0) / ranking if ranking else 0.0,
+        'seconds': elapsed,
+        'rows_per_second': rows_this_run / elapsed if elapsed > 0 else 0.0,
+        'method': mode,
+    }
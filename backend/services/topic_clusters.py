@@ -0,0 +1,136 @@
+"""
+Rule-based topic clusters, assigned once per ingest into keyword_clusters
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import delete, insert, select
+
+from backend.models.keyword import Keyword, KeywordCluster, TopicClusterStat
+
+# A JSON file with the same shape as DEFAULT_CLUSTER_RULES replaces the built-in rules
+CLUSTER_RULES_FILE = os.getenv("TOPIC_CLUSTER_RULES_FILE", "")
+# Only keywords above this volume count towards the cluster aggregates
+CLUSTER_MIN_VOLUME = 100
+SUPPORTING_KEYWORDS = 5
+
+# Rules are tried in order and the first match wins. A keyword matches when it
+# contains every term in 'all' and, if given, at least one term in 'any'
+# (case-insensitive). primary_keyword / supporting_keywords are optional; the
+# cluster's own highest-volume keywords are used when they are left out.
+ClusterRule = Dict[str, Any]
+
+DEFAULT_CLUSTER_RULES: List[ClusterRule] = [
+    {
+        'name': 'Tokyo Food & Dining',
+        'all': ['tokyo', 'food'],
+        'primary_keyword': 'tokyo food',
+        'supporting_keywords': ['tokyo ramen', 'tokyo sushi', 'tokyo street food', 'tokyo izakaya', 'tokyo dessert'],
+    },
+    {
+        'name': 'Tokyo Transportation',
+        'all': ['tokyo', 'transport'],
+        'primary_keyword': 'tokyo transportation',
+        'supporting_keywords': ['tokyo metro', 'tokyo train', 'tokyo bus', 'tokyo taxi', 'tokyo airport transfer'],
+    },
+    {
+        'name': 'Tokyo Accommodation',
+        'all': ['tokyo', 'hotel'],
+        'primary_keyword': 'tokyo hotels',
+        'supporting_keywords': ['tokyo ryokan', 'tokyo capsule hotel', 'tokyo budget accommodation',
+                                'tokyo luxury hotels', 'tokyo business hotels'],
+    },
+    {
+        'name': 'Tokyo Shopping',
+        'all': ['tokyo', 'shopping'],
+        'primary_keyword': 'tokyo shopping',
+        'supporting_keywords': ['tokyo shopping districts', 'tokyo department stores', 'tokyo markets',
+                                'tokyo souvenirs', 'tokyo fashion'],
+    },
+    {
+        'name': 'Tokyo Nightlife',
+        'all': ['tokyo', 'nightlife'],
+        'primary_keyword': 'tokyo nightlife',
+        'supporting_keywords': ['tokyo bars', 'tokyo clubs', 'tokyo izakaya', 'tokyo karaoke', 'tokyo entertainment'],
+    },
+]
+
+
+def load_cluster_rules(path: str = CLUSTER_RULES_FILE) -> List[ClusterRule]:
+    """The configured rule set, or the built-in one"""
+    if not path:
+        return DEFAULT_CLUSTER_RULES
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def assign_clusters(keywords: pd.Series, rules: List[ClusterRule]) -> pd.Series:
+    """Cluster name per keyword (None when no rule matches)"""
+    text = keywords.fillna('').astype(str).str.casefold()
+    clusters = pd.Series(None, index=keywords.index, dtype=object)
+
+    for rule in rules:
+        matches = clusters.isna()
+        for term in rule.get('all', []):
+            matches &= text.str.contains(term.casefold(), regex=False)
+        if rule.get('any'):
+            matches &= pd.concat(
+                [text.str.contains(term.casefold(), regex=False) for term in rule['any']], axis=1
+            ).any(axis=1)
+        clusters[matches] = rule['name']
+    return clusters
+
+
+def summarize_clusters(members: pd.DataFrame, rules: List[ClusterRule]) -> List[Dict[str, Any]]:
+    """Aggregate rows for topic_cluster_stats from the assigned keywords"""
+    now = datetime.utcnow()
+    counted = members[members['volume'] > CLUSTER_MIN_VOLUME]
+    stats = []
+    for rule in rules:
+        cluster = counted[counted['cluster_name'] == rule['name']].sort_values('volume', ascending=False)
+        if cluster.empty:
+            continue
+        top_keywords = cluster['keyword'].tolist()
+        primary_keyword = rule.get('primary_keyword') or top_keywords[0]
+        supporting_keywords = rule.get('supporting_keywords') or [
+            keyword for keyword in top_keywords if keyword != primary_keyword
+        ][:SUPPORTING_KEYWORDS]
+        stats.append({
+            'cluster_name': rule['name'],
+            'primary_keyword': primary_keyword,
+            'supporting_keywords': json.dumps(supporting_keywords, ensure_ascii=False),
+            'keyword_count': len(cluster),
+            'total_volume': int(cluster['volume'].sum()),
+            'avg_position': float(cluster['current_position'].mean()),
+            'total_traffic': int(cluster['organic_traffic'].fillna(0).sum()),
+            'refreshed_at': now,
+        })
+    return stats
+
+
+def refresh_topic_clusters(connection, rules: Optional[List[ClusterRule]] = None) -> int:
+    """Reassign every Tokyo Weekender keyword and rebuild the cluster aggregates; returns clusters stored"""
+    rules = rules if rules is not None else load_cluster_rules()
+    result = connection.execute(
+        select(Keyword.id, Keyword.keyword, Keyword.volume, Keyword.current_position, Keyword.organic_traffic)
+        .where(Keyword.competitor_site.is_(None))
+    )
+    keywords = pd.DataFrame(result.fetchall(), columns=['id', 'keyword', 'volume', 'current_position', 'organic_traffic'])
+    keywords['volume'] = keywords['volume'].fillna(0)
+    keywords['cluster_name'] = assign_clusters(keywords['keyword'], rules)
+    members = keywords[keywords['cluster_name'].notna()]
+
+    stats = summarize_clusters(members, rules)
+    connection.execute(delete(KeywordCluster))
+    connection.execute(delete(TopicClusterStat))
+    if len(members):
+        connection.execute(insert(KeywordCluster), [
+            {'keyword_id': int(row_id), 'cluster_name': name}
+            for row_id, name in zip(members['id'], members['cluster_name'])
+        ])
+    if stats:
+        connection.execute(insert(TopicClusterStat), stats)
+    return len(stats)
@@ -36,13 +36,16 @@ const SERPFeaturesChart: React.FC = () => {
             'rgba(34, 197, 94, 0.8)',    // Emerald
           ]
 
+          // 機能数が色数より多い場合は色を繰り返す
+          const featureColors = features.map((_, index) => colors[index % colors.length])
+
           setChartData({
             labels: features,
             datasets: [
               {
                 data: counts,
-                backgroundColor: colors.slice(0, features.length),
-                borderColor: colors.slice(0, features.length).map(color => color.replace('0.8', '1')),
+                backgroundColor: featureColors,
+                borderColor: featureColors.map(color => color.replace('0.8', '1')),
                 borderWidth: 2,
               },
             ],
@@ -0,0 +1,57 @@
+"""Flag unlisted SERP features in the mask
+
+Revision ID: 0b5d2e7a9c31
+Revises: f1c8a4e2b903
+Create Date: 2026-10-18 11:02:15.840271
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0b5d2e7a9c31'
+down_revision = 'f1c8a4e2b903'
+branch_labels = None
+depends_on = None
+
+# Names with their own bit at the time of this revision (backend/services/serp_features.py)
+KNOWN_FEATURES = [
+    'Sitelinks',
+    'People also ask',
+    'Local pack',
+    'Thumbnail',
+    'Video preview',
+    'Knowledge panel',
+    'AI Overview',
+    'Shopping',
+    'Local teaser',
+    'Knowledge card',
+    'Top ads',
+    'Bottom ads',
+    'Top stories',
+    'Paid sitelinks',
+    'Discussions and forums',
+    'Featured snippet',
+    'Videos',
+    'Image pack',
+    'Other',
+]
+OTHER_SERP_FEATURES_BIT = 1 << 30
+
+
+def upgrade() -> None:
+    # Rows listing any feature without a bit of its own get the Other bit
+    known = ", ".join("'" + feature.replace("'", "''") + "'" for feature in KNOWN_FEATURES)
+    op.execute(f"""
+        UPDATE keywords
+        SET serp_features_mask = COALESCE(serp_features_mask, 0) | {OTHER_SERP_FEATURES_BIT}
+        WHERE EXISTS (
+            SELECT 1
+            FROM unnest(string_to_array(serp_features, ',')) AS item
+            WHERE btrim(item) <> '' AND btrim(item) NOT IN ({known})
+        )
+    """)
+
+
+def downgrade() -> None:
+    op.execute(f"UPDATE keywords SET serp_features_mask = serp_features_mask & ~{OTHER_SERP_FEATURES_BIT}")
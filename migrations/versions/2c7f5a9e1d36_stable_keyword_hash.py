@@ -0,0 +1,61 @@
+"""Recompute keyword_hash with a version-independent digest
+
+Revision ID: 2c7f5a9e1d36
+Revises: 9d4f6b1e8a27
+Create Date: 2026-10-18 13:05:21.447310
+
+"""
+import hashlib
+
+from alembic import op
+import pandas as pd
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2c7f5a9e1d36'
+down_revision = '9d4f6b1e8a27'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_ROWS = 10000
+
+# Dependency order (competitor_opportunities is built from competitor_tw_keywords)
+ROLLUP_VIEWS = ['competitor_tw_keywords', 'competitor_opportunities']
+
+
+def _keyword_hash(key: str) -> int:
+    # Same as bulk_loader.stable_hash
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def upgrade() -> None:
+    # Rows backfilled or ingested before this revision carry pandas' hash_pandas_object
+    # value, which a pandas upgrade may change; rehash every row so old and new rows join
+    bind = op.get_bind()
+    frame = pd.DataFrame(
+        bind.execute(sa.text("SELECT id, keyword_key FROM keywords WHERE keyword_key IS NOT NULL")).fetchall(),
+        columns=['id', 'keyword_key'],
+    )
+    if len(frame):
+        frame['keyword_hash'] = frame['keyword_key'].map(_keyword_hash)
+        op.execute("CREATE TEMP TABLE keyword_join_hashes (id INTEGER PRIMARY KEY, keyword_hash BIGINT)")
+        stage = sa.table('keyword_join_hashes', sa.column('id'), sa.column('keyword_hash'))
+        for start in range(0, len(frame), BACKFILL_BATCH_ROWS):
+            batch = frame.iloc[start:start + BACKFILL_BATCH_ROWS]
+            bind.execute(stage.insert(), [
+                {'id': int(row_id), 'keyword_hash': int(key_hash)}
+                for row_id, key_hash in zip(batch['id'], batch['keyword_hash'])
+            ])
+        op.execute(
+            "UPDATE keywords k SET keyword_hash = s.keyword_hash "
+            "FROM keyword_join_hashes s WHERE s.id = k.id"
+        )
+        op.execute("DROP TABLE keyword_join_hashes")
+
+    for view in ROLLUP_VIEWS:
+        op.execute(f"REFRESH MATERIALIZED VIEW {view}")
+
+
+def downgrade() -> None:
+    # The new hashes join exactly like the old ones; there is nothing to restore
+    pass
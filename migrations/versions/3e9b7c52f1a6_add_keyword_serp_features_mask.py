@@ -0,0 +1,52 @@
+"""Add keyword SERP features mask
+
+Revision ID: 3e9b7c52f1a6
+Revises: 8c2f61d0a9b4
+Create Date: 2026-10-17 14:03:52.207519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3e9b7c52f1a6'
+down_revision = '8c2f61d0a9b4'
+branch_labels = None
+depends_on = None
+
+# Bit order at the time of this revision (backend/services/serp_features.py)
+SERP_FEATURES = [
+    'Sitelinks',
+    'People also ask',
+    'Local pack',
+    'Thumbnail',
+    'Video preview',
+    'Knowledge panel',
+    'AI Overview',
+    'Shopping',
+    'Local teaser',
+    'Knowledge card',
+    'Top ads',
+    'Bottom ads',
+    'Top stories',
+    'Paid sitelinks',
+    'Discussions and forums',
+    'Featured snippet',
+    'Videos',
+    'Image pack',
+]
+
+
+def upgrade() -> None:
+    op.add_column('keywords', sa.Column('serp_features_mask', sa.Integer(), nullable=True))
+
+    # Backfill existing rows in one pass; features are matched as whole list items
+    bits = " + ".join(
+        f"CASE WHEN ', ' || serp_features || ', ' LIKE '%, {feature}, %' THEN {1 << bit} ELSE 0 END"
+        for bit, feature in enumerate(SERP_FEATURES)
+    )
+    op.execute(f"UPDATE keywords SET serp_features_mask = COALESCE({bits}, 0)")
+
+
+def downgrade() -> None:
+    op.drop_column('keywords', 'serp_features_mask')
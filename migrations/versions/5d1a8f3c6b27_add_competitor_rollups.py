@@ -0,0 +1,106 @@
+"""Add materialized competitor rollups
+
+Revision ID: 5d1a8f3c6b27
+Revises: 3e9b7c52f1a6
+Create Date: 2026-10-17 16:21:08.734295
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5d1a8f3c6b27'
+down_revision = '3e9b7c52f1a6'
+branch_labels = None
+depends_on = None
+
+# Per-site totals behind /api/competitors/summary
+COMPETITOR_SITE_TOTALS_SQL = """
+    SELECT
+        competitor_site,
+        COUNT(*) AS total_keywords,
+        SUM(organic_traffic) AS total_traffic,
+        AVG(CASE WHEN current_position < 999 THEN current_position END) AS avg_position,
+        SUM(volume) AS total_volume
+    FROM keywords
+    WHERE competitor_site IS NOT NULL
+    GROUP BY competitor_site
+"""
+
+# Every competitor keyword joined to Tokyo Weekender's row for the same keyword
+COMPETITOR_TW_KEYWORDS_SQL = """
+    SELECT
+        c.id AS competitor_keyword_id,
+        COALESCE(t.id, 0) AS tw_keyword_id,
+        c.competitor_site,
+        c.keyword,
+        c.volume,
+        c.current_position AS competitor_position,
+        c.organic_traffic AS competitor_traffic,
+        c.current_url AS competitor_url,
+        c.keyword_difficulty,
+        c.cpc,
+        c.serp_features,
+        c.informational,
+        c.commercial,
+        c.transactional,
+        c.navigational,
+        c.branded,
+        c.local,
+        COALESCE(t.current_position, 999) AS tw_position,
+        COALESCE(t.organic_traffic, 0) AS tw_traffic,
+        t.current_url AS tw_url
+    FROM keywords c
+    LEFT JOIN keywords t ON t.keyword = c.keyword AND t.competitor_site IS NULL
+    WHERE c.competitor_site IS NOT NULL
+"""
+
+# Keywords where a competitor is in the top 20 and Tokyo Weekender is not
+COMPETITOR_OPPORTUNITIES_SQL = """
+    SELECT
+        competitor_keyword_id,
+        tw_keyword_id,
+        keyword,
+        competitor_site,
+        volume,
+        competitor_position,
+        competitor_traffic,
+        competitor_url,
+        tw_position,
+        tw_traffic
+    FROM competitor_tw_keywords
+    WHERE competitor_position <= 20
+    AND tw_position > 20
+"""
+
+# (view, definition, indexes); listed in dependency order. REFRESH ... CONCURRENTLY
+# needs a unique index on each view, so readers are never blocked by a refresh.
+ROLLUP_VIEWS = [
+    ('competitor_site_totals', COMPETITOR_SITE_TOTALS_SQL, [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_site_totals_site "
+        "ON competitor_site_totals (competitor_site)",
+    ]),
+    ('competitor_tw_keywords', COMPETITOR_TW_KEYWORDS_SQL, [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_tw_keywords_ids "
+        "ON competitor_tw_keywords (competitor_keyword_id, tw_keyword_id)",
+        "CREATE INDEX IF NOT EXISTS ix_competitor_tw_keywords_site_traffic "
+        "ON competitor_tw_keywords (competitor_site, competitor_traffic DESC, volume DESC)",
+    ]),
+    ('competitor_opportunities', COMPETITOR_OPPORTUNITIES_SQL, [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_opportunities_ids "
+        "ON competitor_opportunities (competitor_keyword_id, tw_keyword_id)",
+        "CREATE INDEX IF NOT EXISTS ix_competitor_opportunities_volume "
+        "ON competitor_opportunities (volume DESC, competitor_traffic DESC)",
+    ]),
+]
+
+
+def upgrade() -> None:
+    for view, definition, indexes in ROLLUP_VIEWS:
+        op.execute(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS {definition}")
+        for index in indexes:
+            op.execute(index)
+
+
+def downgrade() -> None:
+    for view, _, _ in reversed(ROLLUP_VIEWS):
+        op.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view}")
@@ -0,0 +1,109 @@
+"""Join competitor rollups on the keyword key, one Tokyo Weekender row per key
+
+Revision ID: 7e2a9d4c1f58
+Revises: 0b5d2e7a9c31
+Create Date: 2026-10-18 11:40:52.319064
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '7e2a9d4c1f58'
+down_revision = '0b5d2e7a9c31'
+branch_labels = None
+depends_on = None
+
+# Rollup definitions at the time of this revision (backend/services/competitor_rollups.py)
+TW_BEST_KEYWORDS_SQL = """
+    SELECT id, keyword_hash, keyword_key, current_position, organic_traffic, current_url
+    FROM (
+        SELECT
+            id, keyword_hash, keyword_key, current_position, organic_traffic, current_url,
+            ROW_NUMBER() OVER (
+                PARTITION BY keyword_hash, keyword_key
+                ORDER BY current_position ASC, organic_traffic DESC, id ASC
+            ) AS key_rank
+        FROM keywords
+        WHERE competitor_site IS NULL
+    ) ranked
+    WHERE key_rank = 1
+"""
+
+COMPETITOR_TW_KEYWORDS_SQL = """
+    SELECT
+        c.id AS competitor_keyword_id,
+        COALESCE(t.id, 0) AS tw_keyword_id,
+        c.competitor_site,
+        c.keyword,
+        c.volume,
+        c.current_position AS competitor_position,
+        c.organic_traffic AS competitor_traffic,
+        c.current_url AS competitor_url,
+        c.keyword_difficulty,
+        c.cpc,
+        c.serp_features,
+        c.informational,
+        c.commercial,
+        c.transactional,
+        c.navigational,
+        c.branded,
+        c.local,
+        COALESCE(t.current_position, 999) AS tw_position,
+        COALESCE(t.organic_traffic, 0) AS tw_traffic,
+        t.current_url AS tw_url
+    FROM keywords c
+    LEFT JOIN {tw} t ON {join}
+    WHERE c.competitor_site IS NOT NULL
+"""
+
+# Before this revision: every Tokyo Weekender row with the same hash
+HASH_JOIN = ("keywords", "t.keyword_hash = c.keyword_hash AND t.competitor_site IS NULL")
+KEY_JOIN = (f"({TW_BEST_KEYWORDS_SQL})", "t.keyword_hash = c.keyword_hash AND t.keyword_key = c.keyword_key")
+
+COMPETITOR_OPPORTUNITIES_SQL = """
+    SELECT
+        competitor_keyword_id,
+        tw_keyword_id,
+        keyword,
+        competitor_site,
+        volume,
+        competitor_position,
+        competitor_traffic,
+        competitor_url,
+        tw_position,
+        tw_traffic
+    FROM competitor_tw_keywords
+    WHERE competitor_position <= 20
+    AND tw_position > 20
+"""
+
+ROLLUP_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_tw_keywords_ids "
+    "ON competitor_tw_keywords (competitor_keyword_id, tw_keyword_id)",
+    "CREATE INDEX IF NOT EXISTS ix_competitor_tw_keywords_site_traffic "
+    "ON competitor_tw_keywords (competitor_site, competitor_traffic DESC, volume DESC)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_opportunities_ids "
+    "ON competitor_opportunities (competitor_keyword_id, tw_keyword_id)",
+    "CREATE INDEX IF NOT EXISTS ix_competitor_opportunities_volume "
+    "ON competitor_opportunities (volume DESC, competitor_traffic DESC)",
+]
+
+
+def _recreate_rollups(tw: str, join: str) -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS competitor_opportunities")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS competitor_tw_keywords")
+    op.execute(
+        "CREATE MATERIALIZED VIEW competitor_tw_keywords AS "
+        + COMPETITOR_TW_KEYWORDS_SQL.format(tw=tw, join=join)
+    )
+    op.execute(f"CREATE MATERIALIZED VIEW competitor_opportunities AS {COMPETITOR_OPPORTUNITIES_SQL}")
+    for index in ROLLUP_INDEXES:
+        op.execute(index)
+
+
+def upgrade() -> None:
+    _recreate_rollups(*KEY_JOIN)
+
+
+def downgrade() -> None:
+    _recreate_rollups(*HASH_JOIN)
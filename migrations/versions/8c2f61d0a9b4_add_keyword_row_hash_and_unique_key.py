@@ -0,0 +1,42 @@
+"""Add keyword row hash and unique key
+
+Revision ID: 8c2f61d0a9b4
+Revises: 47d4d434520d
+Create Date: 2026-10-17 09:12:31.482113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8c2f61d0a9b4'
+down_revision = '47d4d434520d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('keywords', sa.Column('row_hash', sa.BigInteger(), nullable=True))
+
+    # Remove duplicate keyword rows per site before the unique key is created
+    op.execute("""
+        DELETE FROM keywords k
+        USING keywords d
+        WHERE k.competitor_site IS NOT DISTINCT FROM d.competitor_site
+        AND k.keyword = d.keyword
+        AND k.country_code = d.country_code
+        AND k.id > d.id
+    """)
+
+    op.create_index(
+        'uq_keywords_site_keyword_country',
+        'keywords',
+        ['competitor_site', 'keyword', 'country_code'],
+        unique=True,
+        postgresql_nulls_not_distinct=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_keywords_site_keyword_country', table_name='keywords')
+    op.drop_column('keywords', 'row_hash')
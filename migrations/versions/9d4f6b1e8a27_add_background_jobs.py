@@ -0,0 +1,44 @@
+"""Add background jobs table
+
+Revision ID: 9d4f6b1e8a27
+Revises: 7e2a9d4c1f58
+Create Date: 2026-10-18 12:16:48.902553
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9d4f6b1e8a27'
+down_revision = '7e2a9d4c1f58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('background_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('progress', sa.Float(), nullable=True),
+    sa.Column('returncode', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('logs', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # At most one queued/running job per kind across all API workers
+    op.create_index(
+        'uq_background_jobs_active_kind', 'background_jobs', ['kind'], unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+    op.create_index('ix_background_jobs_created', 'background_jobs', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_background_jobs_created', table_name='background_jobs')
+    op.drop_index('uq_background_jobs_active_kind', table_name='background_jobs')
+    op.drop_table('background_jobs')
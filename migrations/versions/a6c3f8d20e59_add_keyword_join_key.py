@@ -0,0 +1,140 @@
+"""Add normalized keyword join key
+
+Revision ID: a6c3f8d20e59
+Revises: d82f5b1e9c47
+Create Date: 2026-10-17 22:31:17.604382
+
+"""
+import hashlib
+import unicodedata
+
+from alembic import op
+import pandas as pd
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a6c3f8d20e59'
+down_revision = 'd82f5b1e9c47'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_ROWS = 50000
+
+# Rollup definitions at the time of this revision (backend/services/competitor_rollups.py)
+COMPETITOR_TW_KEYWORDS_SQL = """
+    SELECT
+        c.id AS competitor_keyword_id,
+        COALESCE(t.id, 0) AS tw_keyword_id,
+        c.competitor_site,
+        c.keyword,
+        c.volume,
+        c.current_position AS competitor_position,
+        c.organic_traffic AS competitor_traffic,
+        c.current_url AS competitor_url,
+        c.keyword_difficulty,
+        c.cpc,
+        c.serp_features,
+        c.informational,
+        c.commercial,
+        c.transactional,
+        c.navigational,
+        c.branded,
+        c.local,
+        COALESCE(t.current_position, 999) AS tw_position,
+        COALESCE(t.organic_traffic, 0) AS tw_traffic,
+        t.current_url AS tw_url
+    FROM keywords c
+    LEFT JOIN keywords t ON t.{join} = c.{join} AND t.competitor_site IS NULL
+    WHERE c.competitor_site IS NOT NULL
+"""
+
+COMPETITOR_OPPORTUNITIES_SQL = """
+    SELECT
+        competitor_keyword_id,
+        tw_keyword_id,
+        keyword,
+        competitor_site,
+        volume,
+        competitor_position,
+        competitor_traffic,
+        competitor_url,
+        tw_position,
+        tw_traffic
+    FROM competitor_tw_keywords
+    WHERE competitor_position <= 20
+    AND tw_position > 20
+"""
+
+ROLLUP_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_tw_keywords_ids "
+    "ON competitor_tw_keywords (competitor_keyword_id, tw_keyword_id)",
+    "CREATE INDEX IF NOT EXISTS ix_competitor_tw_keywords_site_traffic "
+    "ON competitor_tw_keywords (competitor_site, competitor_traffic DESC, volume DESC)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_opportunities_ids "
+    "ON competitor_opportunities (competitor_keyword_id, tw_keyword_id)",
+    "CREATE INDEX IF NOT EXISTS ix_competitor_opportunities_volume "
+    "ON competitor_opportunities (volume DESC, competitor_traffic DESC)",
+]
+
+
+def _normalize_keyword(keyword: str) -> str:
+    # Same as bulk_loader.normalize_keyword at the time of this revision
+    return ''.join(unicodedata.normalize('NFKC', str(keyword)).casefold().split())
+
+
+def _keyword_hash(key: str) -> int:
+    # Same as bulk_loader.stable_hash
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def _recreate_rollups(join: str) -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS competitor_opportunities")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS competitor_tw_keywords")
+    op.execute(f"CREATE MATERIALIZED VIEW competitor_tw_keywords AS {COMPETITOR_TW_KEYWORDS_SQL.format(join=join)}")
+    op.execute(f"CREATE MATERIALIZED VIEW competitor_opportunities AS {COMPETITOR_OPPORTUNITIES_SQL}")
+    for index in ROLLUP_INDEXES:
+        op.execute(index)
+
+
+def upgrade() -> None:
+    op.add_column('keywords', sa.Column('keyword_key', sa.Text(), nullable=True))
+    op.add_column('keywords', sa.Column('keyword_hash', sa.BigInteger(), nullable=True))
+
+    # Backfill through a staging table and one UPDATE ... FROM instead of an UPDATE per row
+    bind = op.get_bind()
+    frame = pd.DataFrame(bind.execute(sa.text("SELECT id, keyword FROM keywords")).fetchall(), columns=['id', 'keyword'])
+    if len(frame):
+        frame['keyword_key'] = frame['keyword'].fillna('').map(_normalize_keyword)
+        frame['keyword_hash'] = frame['keyword_key'].map(_keyword_hash)
+        op.execute("CREATE TEMP TABLE keyword_join_keys (id INTEGER PRIMARY KEY, keyword_key TEXT, keyword_hash BIGINT)")
+        stage = sa.table('keyword_join_keys', sa.column('id'), sa.column('keyword_key'), sa.column('keyword_hash'))
+        for start in range(0, len(frame), BACKFILL_BATCH_ROWS):
+            batch = frame.iloc[start:start + BACKFILL_BATCH_ROWS]
+            bind.execute(stage.insert(), [
+                {'id': int(row_id), 'keyword_key': key, 'keyword_hash': int(key_hash)}
+                for row_id, key, key_hash in zip(batch['id'], batch['keyword_key'], batch['keyword_hash'])
+            ])
+        op.execute(
+            "UPDATE keywords k SET keyword_key = s.keyword_key, keyword_hash = s.keyword_hash "
+            "FROM keyword_join_keys s WHERE s.id = k.id"
+        )
+        op.execute("DROP TABLE keyword_join_keys")
+
+    op.create_index(
+        'ix_keywords_tw_keyword_hash', 'keywords', ['keyword_hash'],
+        postgresql_where=sa.text('competitor_site IS NULL'),
+        postgresql_include=['current_position', 'organic_traffic'],
+    )
+    op.drop_index('ix_keywords_tw_keyword', table_name='keywords')
+    _recreate_rollups('keyword_hash')
+
+
+def downgrade() -> None:
+    _recreate_rollups('keyword')
+    op.create_index(
+        'ix_keywords_tw_keyword', 'keywords', ['keyword'],
+        postgresql_where=sa.text('competitor_site IS NULL'),
+    )
+    op.drop_index('ix_keywords_tw_keyword_hash', table_name='keywords')
+    op.drop_column('keywords', 'keyword_hash')
+    op.drop_column('keywords', 'keyword_key')
@@ -0,0 +1,28 @@
+"""Add keyword listing index
+
+Revision ID: b7e4c09a2d13
+Revises: 5d1a8f3c6b27
+Create Date: 2026-10-17 18:40:12.519866
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4c09a2d13'
+down_revision = '5d1a8f3c6b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Matches the keyset pagination order: organic_traffic DESC, current_position, id
+    op.create_index(
+        'ix_keywords_traffic_position_id',
+        'keywords',
+        [sa.text('organic_traffic DESC'), 'current_position', 'id'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_keywords_traffic_position_id', table_name='keywords')
@@ -0,0 +1,65 @@
+"""Add query shape indexes
+
+Revision ID: c4a9e2f7b815
+Revises: b7e4c09a2d13
+Create Date: 2026-10-17 20:05:44.180342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9e2f7b815'
+down_revision = 'b7e4c09a2d13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Tokyo Weekender rows joined to competitor rows on keyword
+    op.create_index(
+        'ix_keywords_tw_keyword', 'keywords', ['keyword'],
+        postgresql_where=sa.text('competitor_site IS NULL'),
+    )
+    # Tokyo Weekender position filters (improvement recommendations)
+    op.create_index(
+        'ix_keywords_tw_position_volume', 'keywords', ['current_position', 'volume'],
+        postgresql_where=sa.text('competitor_site IS NULL'),
+    )
+    # Per-site listings sorted by traffic
+    op.create_index(
+        'ix_keywords_site_traffic_volume', 'keywords',
+        ['competitor_site', sa.text('organic_traffic DESC'), sa.text('volume DESC')],
+    )
+    # Competitor rows by volume (new content recommendations)
+    op.create_index(
+        'ix_keywords_competitor_volume', 'keywords',
+        [sa.text('volume DESC'), 'keyword_difficulty'],
+        postgresql_where=sa.text('competitor_site IS NOT NULL'),
+    )
+    # Narrow covering indexes for whole-table aggregates
+    op.create_index(
+        'ix_keywords_serp_aggregates', 'keywords', ['competitor_site', 'serp_features_mask'],
+        postgresql_include=['volume', 'current_position', 'organic_traffic'],
+    )
+    op.create_index(
+        'ix_keywords_location_traffic', 'keywords', ['location'],
+        postgresql_include=['organic_traffic', 'id'],
+    )
+    # Competitor list sorted by traffic
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_competitor_site_totals_traffic "
+        "ON competitor_site_totals (total_traffic DESC)"
+    )
+
+
+def downgrade() -> None:
+    # Trigram index created by an earlier version of this revision (dropped by f1c8a4e2b903)
+    op.execute("DROP INDEX IF EXISTS ix_keywords_tw_keyword_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_competitor_site_totals_traffic")
+    op.drop_index('ix_keywords_location_traffic', table_name='keywords')
+    op.drop_index('ix_keywords_serp_aggregates', table_name='keywords')
+    op.drop_index('ix_keywords_competitor_volume', table_name='keywords')
+    op.drop_index('ix_keywords_site_traffic_volume', table_name='keywords')
+    op.drop_index('ix_keywords_tw_position_volume', table_name='keywords')
+    op.drop_index('ix_keywords_tw_keyword', table_name='keywords')
@@ -0,0 +1,45 @@
+"""Add topic cluster tables
+
+Revision ID: d82f5b1e9c47
+Revises: c4a9e2f7b815
+Create Date: 2026-10-17 21:05:43.218640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd82f5b1e9c47'
+down_revision = 'c4a9e2f7b815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('keyword_clusters',
+    sa.Column('keyword_id', sa.Integer(), nullable=False),
+    sa.Column('cluster_name', sa.String(length=100), nullable=False),
+    sa.ForeignKeyConstraint(['keyword_id'], ['keywords.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('keyword_id')
+    )
+    op.create_index('ix_keyword_clusters_cluster_name', 'keyword_clusters', ['cluster_name'], unique=False)
+
+    op.create_table('topic_cluster_stats',
+    sa.Column('cluster_name', sa.String(length=100), nullable=False),
+    sa.Column('primary_keyword', sa.String(length=255), nullable=True),
+    sa.Column('supporting_keywords', sa.Text(), nullable=True),
+    sa.Column('keyword_count', sa.Integer(), nullable=True),
+    sa.Column('total_volume', sa.BigInteger(), nullable=True),
+    sa.Column('avg_position', sa.Float(), nullable=True),
+    sa.Column('total_traffic', sa.BigInteger(), nullable=True),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('cluster_name')
+    )
+    op.create_index('ix_topic_cluster_stats_volume', 'topic_cluster_stats', [sa.text('total_volume DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_topic_cluster_stats_volume', table_name='topic_cluster_stats')
+    op.drop_table('topic_cluster_stats')
+    op.drop_index('ix_keyword_clusters_cluster_name', table_name='keyword_clusters')
+    op.drop_table('keyword_clusters')
@@ -0,0 +1,29 @@
+"""Add dataset generation counter
+
+Revision ID: e3b7d91c4f60
+Revises: a6c3f8d20e59
+Create Date: 2026-10-17 23:12:08.504317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e3b7d91c4f60'
+down_revision = 'a6c3f8d20e59'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('dataset_generation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('generation', sa.BigInteger(), nullable=False),
+    sa.Column('bumped_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO dataset_generation (id, generation, bumped_at) VALUES (1, 1, timezone('utc', now()))")
+
+
+def downgrade() -> None:
+    op.drop_table('dataset_generation')
@@ -0,0 +1,28 @@
+"""Drop the unused keyword trigram index
+
+Revision ID: f1c8a4e2b903
+Revises: e3b7d91c4f60
+Create Date: 2026-10-18 10:24:37.615092
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f1c8a4e2b903'
+down_revision = 'e3b7d91c4f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Topic clusters now come from the topic_cluster tables, so no query does ILIKE on
+    # keyword any more; the GIN index only slowed down every keyword write.
+    # Only databases upgraded while c4a9e2f7b815 still created it (which needed the
+    # pg_trgm extension) have it, hence IF EXISTS.
+    op.execute("DROP INDEX IF EXISTS ix_keywords_tw_keyword_trgm")
+
+
+def downgrade() -> None:
+    # c4a9e2f7b815 no longer creates the index, so there is nothing to restore
+    pass
@@ -0,0 +1,13 @@
+"""
+Shared test setup: the backend is imported without a reachable database
+"""
+import os
+import sys
+from pathlib import Path
+
+# Engines connect lazily, so a placeholder URL is enough to import the backend
+os.environ.setdefault("DATABASE_URL", "postgresql://test@localhost/tokyo_weekender_test")
+# Keep tests from publishing into the shared result cache file
+os.environ["RESULT_CACHE_SHARED_PATH"] = ""
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
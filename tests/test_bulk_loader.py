@@ -0,0 +1,43 @@
+"""
+Stored hashes of the bulk loader, pinned so a library upgrade cannot change them
+"""
+import pandas as pd
+
+from backend.services.bulk_loader import clean_keywords_frame, keyword_join_keys, stable_hash
+
+# keyword_hash values already stored in the keywords table; changing them breaks the cross-site join
+PINNED_HASHES = {
+    '': -5426141060434712860,
+    'tokyotower': -9459362987945659,
+    '東京観光': 5170035588888898135,
+}
+
+
+def test_stable_hash_is_pinned():
+    assert {key: stable_hash(key) for key in PINNED_HASHES} == PINNED_HASHES
+
+
+def test_join_keys_match_across_spellings():
+    keys, hashes = keyword_join_keys(pd.Series(['Tokyo Tower', 'ＴＯＫＹＯ　tower', '東京 観光']))
+    assert keys.tolist() == ['tokyotower', 'tokyotower', '東京観光']
+    assert hashes.dtype == 'int64'
+    assert hashes.tolist() == [PINNED_HASHES['tokyotower'], PINNED_HASHES['tokyotower'], PINNED_HASHES['東京観光']]
+
+
+def export_row(**overrides):
+    row = {'Keyword': 'tokyo tower', 'Country code': 'JP', 'Volume': 1000, 'Current position': 3, 'CPC': 1.5,
+           'Organic traffic': 120, 'Informational': 'true', 'SERP features': 'Sitelinks'}
+    row.update(overrides)
+    return pd.DataFrame([row])
+
+
+def test_row_hash_is_pinned():
+    # row_hash values already stored; changing them makes the next delta ingest rewrite every row
+    assert clean_keywords_frame(export_row())['row_hash'].tolist() == [2466604828907715943]
+
+
+def test_row_hash_follows_content_not_crawl_time():
+    base = clean_keywords_frame(export_row(Updated='2025-09-01'))['row_hash'][0]
+    assert clean_keywords_frame(export_row(Updated='2025-09-20'))['row_hash'][0] == base
+    assert clean_keywords_frame(export_row(CPC=1.6))['row_hash'][0] != base
+    assert clean_keywords_frame(export_row(Informational='false'))['row_hash'][0] != base
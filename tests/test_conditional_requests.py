@@ -0,0 +1,176 @@
+"""
+ETag / Last-Modified validators and the conditional_get middleware
+"""
+import asyncio
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+
+import backend.main as main
+from backend.models.database import get_async_db
+from backend.services.analysis_file import AnalysisFileCache
+from backend.services.conditional_requests import (
+    ERROR_CACHE_CONTROL, LIST_CACHE_CONTROL, SUMMARY_CACHE_CONTROL, cache_policy, dataset_etag, is_not_modified, last_modified,
+    validator_headers
+)
+from backend.services.database_service import DatabaseService
+from backend.services.result_cache import result_cache
+
+VERSION = (7, datetime(2026, 10, 17, 9, 30, 15, 123456))
+SUMMARY = {'total_keywords': 3, 'total_volume': 1200}
+
+
+def test_etag_changes_with_generation_and_query():
+    etag = dataset_etag(VERSION, '/api/keywords', 'limit=10')
+    assert etag.startswith('W/"7-')
+    assert etag == dataset_etag(VERSION, '/api/keywords', 'limit=10')
+    assert etag != dataset_etag((8, VERSION[1]), '/api/keywords', 'limit=10')
+    assert etag != dataset_etag(VERSION, '/api/keywords', 'limit=20')
+
+
+def test_last_modified_is_an_http_date():
+    assert last_modified(VERSION) == 'Sat, 17 Oct 2026 09:30:15 GMT'
+    assert last_modified((0, None)) is None
+
+
+def test_cache_policy():
+    assert cache_policy('/api/analysis/summary') == SUMMARY_CACHE_CONTROL
+    assert cache_policy('/api/keywords') == LIST_CACHE_CONTROL
+    assert cache_policy('/api/competitors/www.gotokyo.org/keywords') == LIST_CACHE_CONTROL
+    assert cache_policy('/api/analysis/content-gaps') is None
+    assert cache_policy('/api/jobs/abc') is None
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    ('W/"7-{digest}"', True),
+    ('"7-{digest}"', True),
+    ('"other", W/"7-{digest}"', True),
+    ('*', True),
+    ('W/"6-{digest}"', False),
+])
+def test_if_none_match(if_none_match, expected):
+    headers = validator_headers(VERSION, '/api/keywords', '', LIST_CACHE_CONTROL)
+    digest = headers['ETag'].split('-', 1)[1].rstrip('"')
+    assert is_not_modified({'if-none-match': if_none_match.format(digest=digest)}, headers) is expected
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    headers = validator_headers(VERSION, '/api/keywords', '', LIST_CACHE_CONTROL)
+    request = {'if-none-match': '"stale"', 'if-modified-since': headers['Last-Modified']}
+    assert not is_not_modified(request, headers)
+
+
+@pytest.mark.parametrize("since, expected", [
+    ('Sat, 17 Oct 2026 09:30:15 GMT', True),
+    ('Sun, 18 Oct 2026 00:00:00 GMT', True),
+    ('Sat, 17 Oct 2026 09:30:14 GMT', False),
+    ('not a date', False),
+])
+def test_if_modified_since(since, expected):
+    headers = validator_headers(VERSION, '/api/analysis/summary', '', SUMMARY_CACHE_CONTROL)
+    assert is_not_modified({'if-modified-since': since}, headers) is expected
+
+
+class FakeSession:
+    """Stands in for AsyncSession: runs the synchronous service call directly"""
+
+    async def run_sync(self, fn):
+        return fn(None)
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    """The API with a fixed dataset version and a stubbed database summary"""
+    calls = {'database': 0}
+
+    async def session():
+        yield FakeSession()
+
+    def summary(self):
+        calls['database'] += 1
+        if calls.get('fail'):
+            raise RuntimeError('database unavailable')
+        if calls.get('query_error'):
+            # What the real method does when its query fails
+            self.query_errors += 1
+            return {'total_keywords': 0, 'total_volume': 0}
+        return SUMMARY
+
+    analysis = tmp_path / 'analysis.json'
+    analysis.write_text(json.dumps({'summary_stats': {'total_keywords': 2}}), encoding='utf-8')
+
+    monkeypatch.setattr(result_cache, 'fresh_version', lambda *args: VERSION)
+    monkeypatch.setattr(DatabaseService, 'get_keywords_summary', summary)
+    monkeypatch.setattr(main, 'analysis_file', AnalysisFileCache(analysis))
+    main.app.dependency_overrides[get_async_db] = session
+    yield calls
+    main.app.dependency_overrides.clear()
+
+
+def get(path: str, **headers) -> httpx.Response:
+    async def request():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.get(path, headers=headers)
+    return asyncio.run(request())
+
+
+def test_database_response_carries_validators(app):
+    response = get('/api/analysis/summary')
+    assert response.status_code == 200
+    assert response.json() == SUMMARY
+    assert response.headers['etag'] == dataset_etag(VERSION, '/api/analysis/summary', '')
+    assert response.headers['last-modified'] == last_modified(VERSION)
+    assert response.headers['cache-control'] == SUMMARY_CACHE_CONTROL
+
+
+def test_matching_etag_is_answered_without_the_handler(app):
+    etag = get('/api/analysis/summary').headers['etag']
+    response = get('/api/analysis/summary', **{'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == etag
+    assert app['database'] == 1
+
+
+def test_if_modified_since_is_answered_with_304(app):
+    response = get('/api/analysis/summary', **{'If-Modified-Since': last_modified(VERSION)})
+    assert response.status_code == 304
+
+
+def test_new_generation_misses_the_old_etag(app, monkeypatch):
+    etag = get('/api/analysis/summary').headers['etag']
+    monkeypatch.setattr(result_cache, 'fresh_version', lambda *args: (VERSION[0] + 1, VERSION[1]))
+    response = get('/api/analysis/summary', **{'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['etag'] != etag
+
+
+def test_fallback_response_has_no_validators(app):
+    app['fail'] = True
+    response = get('/api/analysis/summary')
+    assert response.status_code == 200
+    assert response.json() == {'total_keywords': 2}
+    assert 'etag' not in response.headers
+    assert 'last-modified' not in response.headers
+
+
+def test_query_error_fallback_is_not_stored(app):
+    app['query_error'] = True
+    response = get('/api/analysis/summary')
+    assert response.status_code == 200
+    assert response.json() == {'total_keywords': 0, 'total_volume': 0}
+    assert 'etag' not in response.headers
+    assert response.headers['cache-control'] == ERROR_CACHE_CONTROL
+
+    # Once the database answers again, the client gets the real summary
+    app['query_error'] = False
+    assert get('/api/analysis/summary').json() == SUMMARY
+
+
+def test_unversioned_path_has_no_validators(app):
+    response = get('/api/health')
+    assert response.status_code == 200
+    assert 'etag' not in response.headers
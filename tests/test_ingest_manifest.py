@@ -0,0 +1,89 @@
+"""
+IngestManifest skip decisions and the unchanged-input skip of data_processor
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+import backend.services.ingest_manifest as ingest_manifest
+from backend.services.ingest_manifest import IngestManifest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "analysis" / "scripts"))
+
+import data_processor  # noqa: E402
+
+DATA_FILE = "data/raw/www.tokyoweekender.com-organic-keywords-sub_2025-09-26_06-49-18.csv"
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text("Keyword,Volume\nkeyword 1,100\n", encoding="utf-8")
+    return path
+
+
+def test_file_output_is_unchanged_without_a_generation(tmp_path, export):
+    IngestManifest(tmp_path / "manifest.json").record(export, "analysis:out.json", 1)
+    assert IngestManifest(tmp_path / "manifest.json").is_unchanged(export, "analysis:out.json")
+
+
+def test_database_load_needs_the_current_generation(tmp_path, export):
+    manifest = IngestManifest(tmp_path / "manifest.json", database="postgresql://db:5432/seo")
+    manifest.record(export, "keywords", 1, generation=4)
+    assert manifest.is_unchanged(export, "keywords", 4)
+    assert manifest.is_unchanged(export, "keywords", 5)
+    assert not manifest.is_unchanged(export, "keywords", None)
+    assert not manifest.is_unchanged(export, "keywords", 3)  # database reset or restored
+    other = IngestManifest(tmp_path / "manifest.json", database="postgresql://other:5432/seo")
+    assert not other.is_unchanged(export, "keywords", 4)
+
+
+def test_changed_content_is_not_unchanged(tmp_path, export):
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    manifest.record(export, "analysis:out.json", 1)
+    export.write_text("Keyword,Volume\nkeyword 2,100\n", encoding="utf-8")
+    assert not manifest.is_unchanged(export, "analysis:out.json")
+
+
+def test_same_content_with_a_new_mtime_is_unchanged(tmp_path, export):
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    manifest.record(export, "analysis:out.json", 1)
+    stat = export.stat()
+    os.utime(export, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert manifest.is_unchanged(export, "analysis:out.json")
+
+
+class FakeProcessor:
+    runs = 0
+
+    def __init__(self, data_path):
+        self.data_path = data_path
+
+    def process_all(self):
+        FakeProcessor.runs += 1
+        return {'summary_stats': {'total_keywords': 1, 'total_volume': 100, 'total_traffic': 10,
+                                  'avg_position': 3.0, 'top_performing_keywords': 0}}
+
+    def save_processed_data(self, output_path):
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(output_path).write_text("{}", encoding="utf-8")
+
+
+def test_second_analysis_run_on_the_same_export_is_skipped(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest_manifest, "MANIFEST_PATH", tmp_path / "manifest.json")
+    monkeypatch.setattr(data_processor, "KeywordDataProcessor", FakeProcessor)
+    monkeypatch.setattr(sys, "argv", ["data_processor.py"])
+    monkeypatch.setattr(FakeProcessor, "runs", 0)
+    Path(DATA_FILE).parent.mkdir(parents=True)
+    Path(DATA_FILE).write_text("Keyword,Volume\nkeyword 1,100\n", encoding="utf-8")
+
+    data_processor.main()
+    data_processor.main()
+    assert FakeProcessor.runs == 1
+
+    monkeypatch.setattr(sys, "argv", ["data_processor.py", "--force"])
+    data_processor.main()
+    assert FakeProcessor.runs == 2
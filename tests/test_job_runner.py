@@ -0,0 +1,60 @@
+"""
+JobRunner shutdown: queued and running jobs release their kind lock
+"""
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.keyword import BackgroundJob
+from backend.services.job_runner import FAILED, RUNNING, JobRunner
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    BackgroundJob.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def sleeper(tmp_path):
+    script = tmp_path / 'sleeper.py'
+    script.write_text("import time\nprint('started', flush=True)\ntime.sleep(60)\n", encoding='utf-8')
+    return script
+
+
+def wait_for(condition, seconds=10):
+    deadline = time.monotonic() + seconds
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_shutdown_fails_queued_jobs_and_terminates_running_ones(session_factory, sleeper):
+    runner = JobRunner(workers=1, session_factory=session_factory)
+    running, _ = runner.submit_script('migrate', sleeper)
+    queued, _ = runner.submit_script('refresh', sleeper)
+    wait_for(lambda: runner.jobs[running['job_id']].process is not None and runner.get(running['job_id'])['logs'])
+    process = runner.jobs[running['job_id']].process
+
+    started = time.monotonic()
+    runner.shutdown()
+    assert time.monotonic() - started < 10
+    assert process.poll() is not None
+
+    with session_factory() as db:
+        rows = {row.id: row for row in db.query(BackgroundJob).all()}
+    assert rows[running['job_id']].status == FAILED
+    assert rows[running['job_id']].error == "terminated at shutdown"
+    assert rows[queued['job_id']].status == FAILED
+    assert rows[queued['job_id']].error == "cancelled at shutdown"
+
+    # Both kind locks are free for the next worker right away
+    successor = JobRunner(workers=1, session_factory=session_factory)
+    job, created = successor.submit_script('migrate', sleeper)
+    assert created
+    wait_for(lambda: successor.get(job['job_id'])['status'] == RUNNING)
+    successor.shutdown()
@@ -0,0 +1,86 @@
+"""
+plan_keyword_delta against keywords rows stored in SQLite
+"""
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, select
+
+from backend.models.keyword import Keyword
+from backend.services.bulk_loader import clean_keywords_frame, copy_keywords, plan_keyword_delta
+
+COMPETITOR = 'www.gotokyo.org'
+
+
+def export(*rows) -> pd.DataFrame:
+    """Ahrefs-style export of (keyword, volume, traffic, position) rows"""
+    frame = pd.DataFrame(rows, columns=['Keyword', 'Volume', 'Organic traffic', 'Current position'])
+    frame['Country code'] = 'jp'
+    return frame
+
+
+@pytest.fixture
+def connection():
+    engine = create_engine('sqlite://')
+    Keyword.__table__.create(engine)
+    with engine.begin() as connection:
+        copy_keywords(connection, clean_keywords_frame(export(
+            ('tokyo tower', 1000, 300, 2),
+            ('shibuya crossing', 800, 100, 6),
+            ('harajuku crepes', 200, 10, 14),
+        )))
+        # Same keyword for a competitor: never part of Tokyo Weekender's delta
+        copy_keywords(connection, clean_keywords_frame(export(('tokyo tower', 1000, 500, 1)), COMPETITOR))
+        yield connection
+
+
+def stored_ids(connection, competitor_site=None):
+    table = Keyword.__table__
+    site = table.c.competitor_site == competitor_site if competitor_site else table.c.competitor_site.is_(None)
+    return dict(connection.execute(select(table.c.keyword, table.c.id).where(site)).fetchall())
+
+
+def test_identical_export_has_no_changes(connection):
+    plan = plan_keyword_delta(connection, clean_keywords_frame(export(
+        ('tokyo tower', 1000, 300, 2),
+        ('shibuya crossing', 800, 100, 6),
+        ('harajuku crepes', 200, 10, 14),
+    )))
+    assert plan['inserts'].empty
+    assert plan['updates'].empty
+    assert plan['deleted_ids'] == []
+    assert plan['unchanged'] == 3
+
+
+def test_delta_splits_inserts_updates_and_deletes(connection):
+    ids = stored_ids(connection)
+    plan = plan_keyword_delta(connection, clean_keywords_frame(export(
+        ('tokyo tower', 1000, 300, 2),
+        ('shibuya crossing', 900, 140, 4),
+        ('asakusa temple', 600, 40, 9),
+    )))
+    assert plan['inserts']['keyword'].tolist() == ['asakusa temple']
+    assert plan['updates']['keyword'].tolist() == ['shibuya crossing']
+    assert plan['updates']['id'].tolist() == [ids['shibuya crossing']]
+    assert plan['deleted_ids'] == [ids['harajuku crepes']]
+    assert plan['unchanged'] == 1
+
+
+def test_chunk_delta_keeps_rows_outside_the_chunk(connection):
+    plan = plan_keyword_delta(connection, clean_keywords_frame(export(
+        ('shibuya crossing', 900, 140, 4),
+    )), delete_missing=False)
+    assert plan['updates']['keyword'].tolist() == ['shibuya crossing']
+    assert plan['deleted_ids'] == []
+    assert plan['unchanged'] == 0
+
+
+def test_competitor_delta_only_sees_its_own_rows(connection):
+    ids = stored_ids(connection, COMPETITOR)
+    plan = plan_keyword_delta(connection, clean_keywords_frame(export(
+        ('tokyo tower', 1000, 500, 1),
+        ('shibuya crossing', 800, 100, 6),
+    ), COMPETITOR), COMPETITOR)
+    assert plan['inserts']['keyword'].tolist() == ['shibuya crossing']
+    assert plan['updates'].empty
+    assert plan['matched_ids'].tolist() == [ids['tokyo tower']]
+    assert plan['deleted_ids'] == []
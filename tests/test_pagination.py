@@ -0,0 +1,129 @@
+"""
+Keyset cursors: encoding, source checks and page walks over the database and the CSV fallback
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.keyword import Keyword
+from backend.services.bulk_loader import clean_keywords_frame, copy_keywords
+from backend.services.database_service import DatabaseService
+from backend.services.fallback_engine import FallbackKeywordEngine
+from backend.services.pagination import DATABASE_CURSOR, FILE_CURSOR, decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize("source", [DATABASE_CURSOR, FILE_CURSOR])
+def test_cursor_round_trip(source):
+    cursor = encode_cursor(source, 1520, 3, 98765)
+    assert decode_cursor(cursor, source) == (1520, 3, 98765)
+
+
+def test_cursor_accepts_numpy_values():
+    cursor = encode_cursor(FILE_CURSOR, np.float64(42.0), np.float64(999.0), np.int64(7))
+    assert decode_cursor(cursor, FILE_CURSOR) == (42, 999, 7)
+
+
+def test_cursor_from_other_source_is_rejected():
+    with pytest.raises(ValueError, match="issued by the csv listing"):
+        decode_cursor(encode_cursor(FILE_CURSOR, 10, 5, 1), DATABASE_CURSOR)
+    with pytest.raises(ValueError, match="issued by the db listing"):
+        decode_cursor(encode_cursor(DATABASE_CURSOR, 10, 5, 1), FILE_CURSOR)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "W10", "WzEsMiwzXQ"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, DATABASE_CURSOR)
+
+
+@pytest.fixture
+def export_engine(tmp_path):
+    # Ties on traffic and position so the row id decides the order
+    export = pd.DataFrame({
+        'Keyword': [f'keyword {i}' for i in range(9)],
+        'Location': ['Japan'] * 6 + ['United States'] * 3,
+        'SERP features': ['Sitelinks'] * 9,
+        'Volume': [100, 200, 300, 400, 500, 600, 700, 800, 900],
+        'Organic traffic': [50, 50, 50, 10, 10, 0, 0, 80, None],
+        'Current position': [2, 2, 1, 5, 5, 9, None, 1, 3],
+        'Informational': [True, False] * 4 + [True],
+    })
+    path = tmp_path / 'export.csv'
+    export.to_csv(path, index=False)
+    return FallbackKeywordEngine([path])
+
+
+def walk(engine, limit, **filters):
+    keywords, cursor = [], None
+    while True:
+        page = engine.list_keywords(limit=limit, cursor=cursor, **filters)
+        keywords += [row['Keyword'] for row in page['keywords']]
+        if page['next_cursor'] is None:
+            return keywords
+        cursor = decode_cursor(page['next_cursor'], FILE_CURSOR)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4])
+def test_cursor_walk_matches_single_page(export_engine, limit):
+    full = [row['Keyword'] for row in export_engine.list_keywords(limit=100)['keywords']]
+    assert full[:3] == ['keyword 7', 'keyword 2', 'keyword 0']
+    assert len(full) == 9
+    assert walk(export_engine, limit) == full
+
+
+def test_cursor_walk_with_filters(export_engine):
+    filters = {'min_volume': 200, 'intent': 'Informational'}
+    full = [row['Keyword'] for row in export_engine.list_keywords(limit=100, **filters)['keywords']]
+    assert full == ['keyword 2', 'keyword 4', 'keyword 8', 'keyword 6']
+    assert walk(export_engine, 1, **filters) == full
+
+
+def test_first_page_cursor_is_a_file_cursor(export_engine):
+    page = export_engine.list_keywords(limit=2)
+    assert page['total'] == 9
+    with pytest.raises(ValueError):
+        decode_cursor(page['next_cursor'], DATABASE_CURSOR)
+
+
+@pytest.fixture
+def database():
+    engine = create_engine('sqlite://')
+    Keyword.__table__.create(engine)
+    export = pd.DataFrame({
+        'Keyword': [f'keyword {number}' for number in range(6)],
+        'Country code': 'jp',
+        'Volume': [100, 200, 300, 400, 500, 600],
+        'Organic traffic': [50, 40, 40, 30, 20, 10],
+        'Current position': [1, 2, 3, 4, 5, 6],
+    })
+    with engine.begin() as connection:
+        copy_keywords(connection, clean_keywords_frame(export.iloc[:4]))
+        copy_keywords(connection, clean_keywords_frame(export.iloc[4:], 'www.gotokyo.org'))
+    session = sessionmaker(bind=engine)()
+    yield DatabaseService(session)
+    session.close()
+
+
+def test_database_listing_keeps_every_site_and_the_record_shape(database):
+    page = database.get_keywords_with_filters(limit=10)
+    assert page['total'] == 6
+    assert [row['Keyword'] for row in page['keywords']] == [f'keyword {number}' for number in range(6)]
+    assert list(page['keywords'][0]) == [
+        'Keyword', 'Volume', 'Organic traffic', 'Current position', 'Current URL', 'KD',
+        'Navigational', 'Informational', 'Commercial', 'Transactional', 'Branded', 'Local'
+    ]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4])
+def test_database_cursor_walk_matches_a_single_page(database, limit):
+    expected = [row['Keyword'] for row in database.get_keywords_with_filters(limit=10)['keywords']]
+    walked, cursor = [], None
+    while True:
+        page = database.get_keywords_with_filters(limit=limit, cursor=cursor)
+        walked += [row['Keyword'] for row in page['keywords']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert walked == expected
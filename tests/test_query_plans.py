@@ -0,0 +1,50 @@
+"""
+EXPLAIN regression check of DatabaseService queries (see analysis/scripts/check_query_plans.py)
+
+Needs a scratch PostgreSQL database, which is dropped and re-seeded:
+
+    QUERY_PLAN_DATABASE_URL=postgresql://postgres@localhost/seo_explain python -m pytest tests/test_query_plans.py
+
+Skipped when QUERY_PLAN_DATABASE_URL is not set.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+QUERY_PLAN_DATABASE_URL = os.getenv("QUERY_PLAN_DATABASE_URL", "")
+
+pytestmark = pytest.mark.skipif(not QUERY_PLAN_DATABASE_URL, reason="QUERY_PLAN_DATABASE_URL is not set")
+
+# check_query_plans imports its sibling scripts as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "analysis" / "scripts"))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+import check_query_plans  # noqa: E402
+from backend.services.result_cache import result_cache  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine(QUERY_PLAN_DATABASE_URL)
+    check_query_plans.seed_database(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def uncached(monkeypatch):
+    # Every method must reach the database, not a result cached by an earlier test
+    monkeypatch.setattr(result_cache, "max_entries", 0)
+
+
+@pytest.mark.parametrize(
+    "method, args, kwargs", check_query_plans.QUERIES, ids=[query[0] for query in check_query_plans.QUERIES]
+)
+def test_query_is_served_by_indexes(engine, method, args, kwargs):
+    statements = check_query_plans.capture_selects(engine, method, args, kwargs)
+    assert statements, f"{method} issued no SELECT"
+    for statement, scans in check_query_plans.explain_statements(engine, statements):
+        assert not scans, f"sequential scan on {', '.join(sorted(set(scans)))}: {' '.join(statement.split())[:200]}"
@@ -0,0 +1,29 @@
+"""
+SERP feature statistics over an in-memory export
+"""
+import numpy as np
+import pandas as pd
+
+from backend.services.serp_features import serp_feature_mask, serp_feature_stats_frame
+
+
+def stats(**columns):
+    df = pd.DataFrame(columns)
+    df['SERP features mask'] = serp_feature_mask(df['SERP features'])
+    return serp_feature_stats_frame(df)
+
+
+def test_missing_values_are_left_out_of_the_averages():
+    result = stats(**{
+        'SERP features': ['Sitelinks', 'Sitelinks', 'Sitelinks', 'Videos'],
+        'Volume': [100, np.nan, 300, 50],
+        'Current position': [4, np.nan, 8, np.nan],
+        'Organic traffic': [10, 5, np.nan, 1],
+    })
+    assert result['Sitelinks']['count'] == 3
+    assert result['Sitelinks']['avg_volume'] == 200.0
+    assert result['Sitelinks']['avg_position'] == 6.0
+    assert result['Sitelinks']['total_traffic'] == 15
+    # Only unranked keywords: reported like SQL AVG over NULLs, not averaged as rank 0
+    assert result['Videos']['avg_position'] == 0.0
+    assert result['Videos']['count'] == 1
@@ -0,0 +1,48 @@
+"""
+SharedResultStore pruning and unreadable entries
+"""
+import sqlite3
+
+from backend.services.shared_cache import SharedResultStore
+
+TTL = 3600
+
+
+def test_newer_generation_prunes_only_its_own_database(tmp_path):
+    store = SharedResultStore(str(tmp_path / "cache.sqlite3"))
+    store.put("a:1", 1, "a at 1", database="postgresql://a:5432/seo")
+    store.put("b:5", 5, "b at 5", database="postgresql://b:5432/seo")
+    store.put("a:2", 2, "a at 2", database="postgresql://a:5432/seo")
+    store.put("a:9", 9, "a at 9", database="postgresql://a:5432/seo")
+
+    assert store.get("a:1", TTL) == (False, None)
+    assert store.get("a:2", TTL) == (False, None)
+    assert store.get("a:9", TTL) == (True, "a at 9")
+    assert store.get("b:5", TTL) == (True, "b at 5")
+
+
+def test_unreadable_entry_is_a_miss_and_is_deleted(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    store = SharedResultStore(str(path))
+    store.put("good", 1, {"total": 3})
+    store.put("bad", 1, {"total": 4})
+    with sqlite3.connect(str(path)) as connection:
+        connection.execute("UPDATE results SET value = ? WHERE key = 'bad'", (b"\x80\x05\x95",))
+
+    assert store.get("bad", TTL) == (False, None)
+    assert not store.disabled
+    assert store.get("good", TTL) == (True, {"total": 3})
+    with sqlite3.connect(str(path)) as connection:
+        assert connection.execute("SELECT count(*) FROM results WHERE key = 'bad'").fetchone()[0] == 0
+
+
+def test_file_with_an_older_layout_is_recreated(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    with sqlite3.connect(str(path)) as connection:
+        connection.execute(
+            "CREATE TABLE results (key TEXT PRIMARY KEY, generation INTEGER NOT NULL, "
+            "stored_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+    store = SharedResultStore(str(path))
+    store.put("key", 1, "value", database="postgresql://a:5432/seo")
+    assert store.get("key", TTL) == (True, "value")
@@ -0,0 +1,74 @@
+"""
+Replace-mode streaming ingest: the site is swapped in only after the last chunk
+"""
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.orm import sessionmaker
+
+import backend.services.streaming_ingest as streaming_ingest
+from backend.models.keyword import DatasetGeneration, Keyword
+from backend.services.bulk_loader import clean_keywords_frame, copy_keywords
+from backend.services.streaming_ingest import IngestProgress, stream_csv_to_keywords
+
+COMPETITOR = 'www.gotokyo.org'
+
+
+def export(keywords) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Keyword': keywords,
+        'Country code': 'jp',
+        'Volume': 100,
+        'Organic traffic': 10,
+        'Current position': 5,
+    })
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(streaming_ingest, 'INGEST_STATE_PATH', tmp_path / 'ingest_state')
+    engine = create_engine(f"sqlite:///{tmp_path / 'keywords.db'}")
+    Keyword.__table__.create(engine)
+    DatasetGeneration.__table__.create(engine)
+    with engine.begin() as connection:
+        copy_keywords(connection, clean_keywords_frame(export(['old 1', 'old 2'])))
+        copy_keywords(connection, clean_keywords_frame(export(['competitor 1']), COMPETITOR))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'export.csv'
+    export([f'new {number}' for number in range(1, 8)] + ['new 1']).to_csv(path, index=False)
+    return path
+
+
+def keywords(session, competitor_site=None):
+    table = Keyword.__table__
+    site = table.c.competitor_site == competitor_site if competitor_site else table.c.competitor_site.is_(None)
+    return sorted(session.execute(select(table.c.keyword).where(site)).scalars())
+
+
+def test_replace_swaps_the_site_and_drops_the_stage(session, csv_path):
+    stats = stream_csv_to_keywords(session, csv_path, chunk_rows=3)
+    assert stats['chunks'] == 3
+    assert keywords(session) == [f'new {number}' for number in range(1, 8)]
+    assert keywords(session, COMPETITOR) == ['competitor 1']
+    stage = IngestProgress(csv_path, None, 'replace').stage_name
+    assert not inspect(session.connection()).has_table(stage)
+
+
+def test_interrupted_replace_keeps_the_old_rows_until_the_resumed_run_finishes(session, csv_path):
+    def fail_after_second_chunk(progress):
+        if progress['chunk'] == 2:
+            raise RuntimeError('connection lost')
+
+    with pytest.raises(RuntimeError):
+        stream_csv_to_keywords(session, csv_path, chunk_rows=3, on_chunk=fail_after_second_chunk)
+    assert keywords(session) == ['old 1', 'old 2']
+
+    stats = stream_csv_to_keywords(session, csv_path, chunk_rows=3)
+    assert stats['resumed']
+    assert keywords(session) == [f'new {number}' for number in range(1, 8)]